@@ -1,7 +1,9 @@
 # api/v1/rankings/urls.py
 from django.urls import path
-from .views import LeaderboardView
+from .views import LeaderboardView, MyRankView, RankAroundView
 
 urlpatterns = [
     path("leaderboard/", LeaderboardView.as_view(), name="leaderboard"),
+    path("me/", MyRankView.as_view(), name="rankings-me"),
+    path("around/", RankAroundView.as_view(), name="rankings-around"),
 ]
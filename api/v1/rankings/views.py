@@ -1,12 +1,17 @@
 # api/v1/rankings/views.py
 
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from rankings.constants import REAL_LAYERS, CYBER_LAYERS
 from rankings.models import LayerRankingEntry
 from rankings.serializers import LayerRankingEntrySerializer
+from rankings.services import get_user_rankings, with_layer_names
+
+MAX_RANK_RADIUS = 50
 
 
 @extend_schema_view(
@@ -82,8 +87,97 @@ class LeaderboardView(generics.ListAPIView):
         elif cyber_layer:
             filters["layer_type"] = cyber_layer
 
-        return (
+        return with_layer_names(
             LayerRankingEntry.objects
             .filter(**filters)
-            .order_by("-xp")[:top]
-        )
+            .order_by("-xp")
+        )[:top]
+
+
+def _season_param(request):
+    try:
+        return int(request.query_params.get("season"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _board_summary(board):
+    """Reduziert einen Rang-Kontext auf den Eintrag des Users"""
+    if board is None:
+        return None
+    return {"layer": board["layer"], "total": board["total"], **board["me"]}
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="season",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description="ID der Season",
+            ),
+        ]
+    )
+)
+class MyRankView(APIView):
+    """
+    GET /api/v1/rankings/me/?season=<id>
+    Liefert Rang, Perzentil und XP des eingeloggten Users in seinem
+    Real- und Cyber-Board (RANK()/PERCENT_RANK() OVER in der Datenbank).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        season_id = _season_param(request)
+        if season_id is None:
+            return Response({"detail": "Parameter 'season' fehlt."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rankings = get_user_rankings(season_id, request.user)
+        return Response({
+            "season": season_id,
+            "real": _board_summary(rankings["real"]),
+            "cyber": _board_summary(rankings["cyber"]),
+        })
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="season",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description="ID der Season",
+            ),
+            OpenApiParameter(
+                name="radius",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description=f"Anzahl Nachbarn ober- und unterhalb (Standard: 5, max. {MAX_RANK_RADIUS})",
+            ),
+        ]
+    )
+)
+class RankAroundView(APIView):
+    """
+    GET /api/v1/rankings/around/?season=<id>&radius=K
+    Liefert den eingeloggten User mit bis zu K Nachbarn ober- und unterhalb
+    in seinem Real- und Cyber-Board, statt des kompletten Leaderboards.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        season_id = _season_param(request)
+        if season_id is None:
+            return Response({"detail": "Parameter 'season' fehlt."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            radius = int(request.query_params.get("radius", 5))
+        except (TypeError, ValueError):
+            radius = 5
+        radius = min(max(radius, 0), MAX_RANK_RADIUS)
+
+        return Response(get_user_rankings(season_id, request.user, radius=radius))
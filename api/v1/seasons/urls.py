@@ -1,5 +1,8 @@
 from django.urls import path, include
-from .views import ActiveSeasonView, SeasonRankingView, SeasonListView, SeasonXpListView, SeasonViewSet
+from .views import (
+    ActiveSeasonView, SeasonRankingView, SeasonRankMeView, SeasonRankAroundView,
+    SeasonListView, SeasonXpListView, SeasonViewSet
+)
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -9,5 +12,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('active/', ActiveSeasonView.as_view(), name='active-season'),
     path('<int:season_id>/ranking/<str:layer_type>/', SeasonRankingView.as_view(), name='season-ranking'),
+    path('<int:season_id>/ranking/<str:layer_type>/me/', SeasonRankMeView.as_view(), name='season-ranking-me'),
+    path('<int:season_id>/ranking/<str:layer_type>/around/', SeasonRankAroundView.as_view(), name='season-ranking-around'),
     path('<int:season_id>/xp/', SeasonXpListView.as_view(), name='season-xp-list'),
 ]
@@ -1,33 +1,99 @@
+from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from seasons.models import Season, SeasonXp
+from seasons.models import LAYER_TYPE_CHOICES, Season, SeasonXp
+from seasons.services import get_active_season
+from rankings.leaderboard import get_season_leaderboard
 from .serializers import SeasonSerializer, SeasonXpSerializer
 from rest_framework import generics
 from rest_framework import viewsets, permissions
 
+User = get_user_model()
+
+MAX_RANKING_PAGE = 500
+MAX_RANKING_RADIUS = 50
+
 class ActiveSeasonView(APIView):
     """
     Gibt die aktuell aktive Season zurück.
     """
     def get(self, request):
-        season = Season.objects.filter(is_active=True).first()
+        season = get_active_season()
         if season:
             serializer = SeasonSerializer(season)
             return Response(serializer.data)
         return Response({"detail": "No active season."}, status=status.HTTP_404_NOT_FOUND)
 
+def _int_param(request, name, default, minimum=0, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum is not None else value
+
+def _unknown_layer(layer_type):
+    """400-Antwort für unbekannte Layer-Typen, sonst None"""
+    if layer_type not in dict(LAYER_TYPE_CHOICES):
+        return Response({"detail": f"Unbekannter Layer-Typ: {layer_type}"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+def _with_users(entries, layer_type):
+    """Ergänzt Leaderboard-Einträge um die Anzeige-Namen (eine Query)"""
+    users = User.objects.in_bulk([entry['user_id'] for entry in entries])
+    return [
+        {**entry, 'user': str(users.get(entry['user_id'], entry['user_id'])), 'layer_type': layer_type}
+        for entry in entries
+    ]
+
 class SeasonRankingView(APIView):
     """
-    Gibt das Ranking einer Season + Layer zurück.
+    Gibt das Ranking einer Season + Layer zurück (Sorted-Set-Leaderboard bzw. SeasonXp).
+    Einträge wie bisher im Format von SeasonXpSerializer (user, xp, layer_type);
+    Rang und User-ID liefern die Endpunkte me/ und around/.
+    Query-Parameter: top (Standard 100, max. 500), offset (Standard 0)
+    """
+    def get(self, request, season_id, layer_type):
+        error = _unknown_layer(layer_type)
+        if error:
+            return error
+        top = _int_param(request, 'top', 100, minimum=1, maximum=MAX_RANKING_PAGE)
+        offset = _int_param(request, 'offset', 0)
+        leaderboard = get_season_leaderboard()
+        entries = leaderboard.top(season_id, layer_type, limit=top, offset=offset)
+        fields = SeasonXpSerializer.Meta.fields
+        return Response([{field: entry[field] for field in fields} for entry in _with_users(entries, layer_type)])
+
+class SeasonRankMeView(APIView):
+    """
+    GET /api/v1/seasons/<id>/ranking/<layer_type>/me/ → Rang des eingeloggten Users
+    """
+    def get(self, request, season_id, layer_type):
+        error = _unknown_layer(layer_type)
+        if error:
+            return error
+        entry = get_season_leaderboard().rank_of(season_id, layer_type, request.user.pk)
+        if entry is None:
+            return Response({"detail": "Kein Ranking-Eintrag für diese Season."}, status=status.HTTP_404_NOT_FOUND)
+        # Wie PERCENT_RANK(): 0.0 = Platz 1, 1.0 = letzter Platz
+        entry['percent_rank'] = (entry['rank'] - 1) / (entry['total'] - 1) if entry['total'] > 1 else 0.0
+        return Response(_with_users([entry], layer_type)[0])
+
+class SeasonRankAroundView(APIView):
+    """
+    GET /api/v1/seasons/<id>/ranking/<layer_type>/around/?radius=K
+    → der eingeloggte User mit bis zu K Nachbarn ober- und unterhalb
     """
     def get(self, request, season_id, layer_type):
-        season_xps = SeasonXp.objects.filter(
-            season_id=season_id,
-            layer_type=layer_type
-        ).order_by('-xp')
-        serializer = SeasonXpSerializer(season_xps, many=True)
-        return Response(serializer.data)
+        error = _unknown_layer(layer_type)
+        if error:
+            return error
+        radius = _int_param(request, 'radius', 5, maximum=MAX_RANKING_RADIUS)
+        entries = get_season_leaderboard().around(season_id, layer_type, request.user.pk, radius=radius)
+        if not entries:
+            return Response({"detail": "Kein Ranking-Eintrag für diese Season."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_with_users(entries, layer_type))
 
 class SeasonListView(generics.ListAPIView):
     queryset = Season.objects.all().order_by('-start')
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import XpTypeListView, AddXpView, XpHistoryView
+from .views import XpTypeListView, AddXpView, AddXpBatchView, XpHistoryView
 
 urlpatterns = [
     path('types/',   XpTypeListView.as_view(),  name='xp-types'),
     path('add/',     AddXpView.as_view(),       name='xp-add'),
+    path('add/batch/', AddXpBatchView.as_view(), name='xp-add-batch'),
     path('history/', XpHistoryView.as_view(),   name='xp-history'),
 ]
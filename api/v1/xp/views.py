@@ -2,8 +2,8 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from xp.models import XpType, XpEvent
-from xp.services import add_xp_to_user, get_xp_stats, xp_for_level
-from xp.serializers import XpTypeSerializer, XpEventSerializer, AddXpSerializer
+from xp.services import add_xp_to_user, add_xp_batch, get_xp_stats, xp_for_level
+from xp.serializers import XpTypeSerializer, XpEventSerializer, AddXpSerializer, AddXpBatchSerializer
 
 class XpTypeListView(generics.ListAPIView):
     """
@@ -49,6 +49,39 @@ class AddXpView(generics.GenericAPIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class AddXpBatchView(generics.GenericAPIView):
+    """
+    POST /api/v1/xp/add/batch/ → Mehrere XP-Einträge in einer Transaktion vergeben
+    Für Wearable- und Discord-Bot-Syncs mit vielen Samples pro User.
+    Antwort enthält die vergebenen XP pro Eintrag und den finalen Level-Stand.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = AddXpBatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        try:
+            result = add_xp_batch(
+                user=request.user,
+                items=ser.validated_data['items'],
+            )
+        except XpType.DoesNotExist as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = {
+            'items':             result['items'],
+            'awarded_xp':        result['awarded_xp'],
+            'total_xp':          result['total_xp'],
+            'level':             result['level'],
+            'next_level':        result['next_level'],
+            'next_level_xp':     result['next_level_xp'],
+            'xp_to_next':        result['xp_to_next'],
+            'leveled_up':        result['leveled_up'],
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class XpStatsView(generics.GenericAPIView):
     """
     GET /api/v1/xp/stats/ → Aktuelle XP- und Level-Statistiken
@@ -1,25 +1,32 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from layers.models import Layer, UserLayerProgress
+from layers.models import Layer
+from layers.services import BACKFILL_CHUNK_SIZE, backfill_user_layer_progress
 
 class Command(BaseCommand):
     help = "Initialisiert UserLayerProgress für alle User, die noch keinen haben (RL0 und CL0)."
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE)
+
     def handle(self, *args, **options):
-        User = get_user_model()
         try:
             base_real = Layer.objects.get(code='RL0')
             base_cyber = Layer.objects.get(code='CL0')
         except Layer.DoesNotExist:
             self.stderr.write(self.style.ERROR('RL0 oder CL0 Layer fehlt!'))
             return
-        created = 0
-        for user in User.objects.all():
-            if not UserLayerProgress.objects.filter(user=user).exists():
-                UserLayerProgress.objects.create(
-                    user=user,
-                    real_layer=base_real,
-                    cyber_layer=base_cyber
-                )
-                created += 1
-        self.stdout.write(self.style.SUCCESS(f"{created} UserLayerProgress-Einträge erstellt.")) 
\ No newline at end of file
+
+        started = time.monotonic()
+
+        def report(done):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{done} User verarbeitet ({done / elapsed if elapsed else 0:.0f}/s)")
+
+        created = backfill_user_layer_progress(base_real, base_cyber, chunk_size=options['chunk_size'], progress=report)
+        elapsed = time.monotonic() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} UserLayerProgress-Einträge erstellt in {elapsed:.2f}s ({rate:.0f} User/s)."
+        ))
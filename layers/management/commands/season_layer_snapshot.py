@@ -1,45 +1,59 @@
+from collections import Counter
+
 from django.core.management.base import BaseCommand
-from rankings.models import LayerRankingEntry
-from layers.models import Layer, UserLayerProgress
+
+from layers.models import LayerSnapshotCheckpoint
+from layers.services import SNAPSHOT_CHUNK_SIZE, apply_layer_snapshot, iter_planned_moves
 from seasons.models import Season
 
 class Command(BaseCommand):
-    help = "Führt den Layer-Snapshot am Saisonende durch (Auf-/Abstieg auf Basis LayerRankingEntry)."
+    help = (
+        "Führt den Layer-Snapshot am Saisonende durch (Auf-/Abstieg auf Basis LayerRankingEntry). "
+        "Arbeitet in Chunks mit Checkpoint; ein abgebrochener Lauf setzt beim nächsten Start fort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, help='Season-ID (Standard: zuletzt beendete Season)')
+        parser.add_argument('--chunk-size', type=int, default=SNAPSHOT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Nur geplante Auf-/Abstiege ausgeben, nichts ändern')
 
     def handle(self, *args, **options):
-        # Letzte (abgeschlossene) Season finden
-        season = Season.objects.filter(is_active=False).order_by('-end').first()
+        if options['season']:
+            season = Season.objects.filter(pk=options['season']).first()
+        else:
+            # Letzte (abgeschlossene) Season finden
+            season = Season.objects.filter(is_active=False).order_by('-end').first()
         if not season:
             self.stderr.write("Keine abgeschlossene Season gefunden.")
             return
 
-        for layer_type in ['real', 'cyber']:
-            layers = list(Layer.objects.filter(type=layer_type).order_by('order'))
-            for i, layer in enumerate(layers):
-                entries = LayerRankingEntry.objects.filter(season=season, layer_type=layer.code).order_by('-xp')
-                total = entries.count()
-                if total == 0:
-                    continue
-                top_cut = int(total * 0.1)
-                bottom_cut = int(total * 0.1)
-                # Aufsteiger
-                if i < len(layers) - 1:
-                    next_layer = layers[i+1]
-                    for entry in entries[:top_cut]:
-                        progress = UserLayerProgress.objects.get(user=entry.user)
-                        if layer_type == 'real':
-                            progress.real_layer = next_layer
-                        else:
-                            progress.cyber_layer = next_layer
-                        progress.save()
-                # Absteiger
-                if i > 0:
-                    prev_layer = layers[i-1]
-                    for entry in entries[-bottom_cut:]:
-                        progress = UserLayerProgress.objects.get(user=entry.user)
-                        if layer_type == 'real':
-                            progress.real_layer = prev_layer
-                        else:
-                            progress.cyber_layer = prev_layer
-                        progress.save()
-        self.stdout.write(self.style.SUCCESS("Layer-Snapshot abgeschlossen.")) 
\ No newline at end of file
+        if options['dry_run']:
+            self._report(season, options['verbosity'])
+            return
+
+        if LayerSnapshotCheckpoint.objects.filter(season=season, completed_at__isnull=False).exists():
+            self.stdout.write(f"Layer-Snapshot für {season} bereits abgeschlossen.")
+            return
+
+        _, moved = apply_layer_snapshot(
+            season,
+            chunk_size=options['chunk_size'],
+            progress=lambda done: self.stdout.write(f"Checkpoint: {done} Zeilen verarbeitet"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Layer-Snapshot abgeschlossen: {moved} Layer-Wechsel."))
+
+    def _report(self, season, verbosity):
+        checkpoint = LayerSnapshotCheckpoint.objects.filter(season=season).first()
+        moves = Counter()
+        for _, user_id, field, code, target in iter_planned_moves(season):
+            target_code = target.code if target else code
+            moves[(field, code, target_code)] += 1
+            if verbosity >= 2:
+                self.stdout.write(f"  User {user_id}: {field} {code} → {target_code}")
+
+        self.stdout.write(f"Geplante Layer-Wechsel für {season} (Dry-Run):")
+        for (field, code, target_code), count in sorted(moves.items()):
+            self.stdout.write(f"  {field:<12} {code} → {target_code}: {count}")
+        if checkpoint:
+            state = 'abgeschlossen' if checkpoint.completed_at else f'{checkpoint.processed} Zeilen angewendet'
+            self.stdout.write(f"Checkpoint: {state}")
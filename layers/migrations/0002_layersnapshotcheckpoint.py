@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0001_initial'),
+        ('seasons', '0005_alter_seasonxp_layer_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LayerSnapshotCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='layer_snapshot_checkpoint', to='seasons.season')),
+            ],
+        ),
+    ]
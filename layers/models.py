@@ -33,3 +33,18 @@ class UserLayerProgress(models.Model):
 
     def __str__(self):
         return f"{self.user} RL:{self.real_layer} CL:{self.cyber_layer}"
+
+class LayerSnapshotCheckpoint(models.Model):
+    """
+    Fortschritt von season_layer_snapshot pro Season.
+    processed zählt die bereits angewendeten Zeilen des Bewegungsplans,
+    ein abgebrochener Lauf setzt dort wieder auf.
+    """
+    season = models.OneToOneField('seasons.Season', on_delete=models.CASCADE, related_name='layer_snapshot_checkpoint')
+    processed = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        state = 'fertig' if self.completed_at else f'{self.processed} verarbeitet'
+        return f"Layer-Snapshot {self.season_id}: {state}"
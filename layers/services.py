@@ -0,0 +1,161 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from rankings.models import LayerRankingEntry
+from .models import Layer, LayerSnapshotCheckpoint, UserLayerProgress
+
+# Oberste bzw. unterste 10 % (abgerundet) eines Boards wechseln den Layer
+SNAPSHOT_CUT_PERCENT = 10
+SNAPSHOT_CHUNK_SIZE = 1000
+BACKFILL_CHUNK_SIZE = 5000
+
+LAYER_FIELDS = {'real': 'real_layer', 'cyber': 'cyber_layer'}
+
+# Position und Boardgröße aller Einträge der Season in einer Window-Query;
+# nur Einträge im oberen bzw. unteren Schnitt werden ausgeliefert.
+# Die Sortierung ist stabil, der Checkpoint kann daher per OFFSET fortsetzen.
+_PLANNED_MOVES_SQL = """
+WITH ranked AS (
+    SELECT user_id, layer_type,
+           ROW_NUMBER() OVER (PARTITION BY layer_type ORDER BY xp DESC, id) AS position,
+           COUNT(*) OVER (PARTITION BY layer_type) AS board_size
+    FROM {table}
+    WHERE season_id = %s AND layer_type IN ({codes})
+)
+SELECT user_id, layer_type, position, board_size FROM ranked
+WHERE position <= board_size * {cut} / 100
+   OR position > board_size - board_size * {cut} / 100
+ORDER BY layer_type, user_id
+LIMIT {all} OFFSET %s
+"""
+
+
+def _layer_steps():
+    """code -> (Layer-Feld, vorheriger Layer, nächster Layer)"""
+    steps = {}
+    for layer_type, field in LAYER_FIELDS.items():
+        layers = list(Layer.objects.filter(type=layer_type).order_by('order'))
+        for i, layer in enumerate(layers):
+            steps[layer.code] = (
+                field,
+                layers[i - 1] if i > 0 else None,
+                layers[i + 1] if i < len(layers) - 1 else None,
+            )
+    return steps
+
+
+def iter_planned_moves(season, offset=0, steps=None):
+    """
+    Streamt den Bewegungsplan als (position_im_plan, user_id, Layer-Feld, von, nach).
+    nach ist None, wenn der User am Rand der Layer-Leiter steht und bleibt.
+    """
+    steps = steps if steps is not None else _layer_steps()
+    if not steps:
+        return
+    sql = _PLANNED_MOVES_SQL.format(
+        table=LayerRankingEntry._meta.db_table,
+        codes=', '.join(['%s'] * len(steps)),
+        cut=SNAPSHOT_CUT_PERCENT,
+        # SQLite verlangt zu OFFSET ein LIMIT, -1 steht dort für "alle"
+        all='ALL' if connection.vendor == 'postgresql' else '-1',
+    )
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, [season.pk, *steps, offset])
+        index = offset
+        while True:
+            rows = cursor.fetchmany(SNAPSHOT_CHUNK_SIZE)
+            if not rows:
+                break
+            for user_id, code, position, board_size in rows:
+                field, prev, nxt = steps[code]
+                target = nxt if position <= board_size * SNAPSHOT_CUT_PERCENT // 100 else prev
+                yield index, user_id, field, code, target
+                index += 1
+
+
+def _apply_chunk(checkpoint, chunk):
+    targets = {}
+    for _, user_id, field, _, target in chunk:
+        if target is not None:
+            targets.setdefault((field, target.pk), []).append(user_id)
+    now = timezone.now()
+    with transaction.atomic():
+        for (field, layer_id), user_ids in targets.items():
+            UserLayerProgress.objects.filter(user_id__in=user_ids).update(**{f'{field}_id': layer_id, 'updated_at': now})
+        LayerSnapshotCheckpoint.objects.filter(pk=checkpoint.pk).update(processed=F('processed') + len(chunk))
+    checkpoint.processed += len(chunk)
+    return sum(len(user_ids) for user_ids in targets.values())
+
+
+def apply_layer_snapshot(season, chunk_size=SNAPSHOT_CHUNK_SIZE, progress=None):
+    """
+    Wendet Auf- und Abstiege der Season per Bulk-UPDATE in Chunks an.
+    Nach jedem Chunk wird der Checkpoint fortgeschrieben; ein erneuter Aufruf
+    nach einem Abbruch setzt hinter dem letzten vollständigen Chunk fort.
+    Gibt (angewendete Zeilen, geänderte Layer) zurück.
+    """
+    checkpoint, _ = LayerSnapshotCheckpoint.objects.get_or_create(season=season)
+    if checkpoint.completed_at:
+        return 0, 0
+
+    processed = moved = 0
+    chunk = []
+    for move in iter_planned_moves(season, offset=checkpoint.processed):
+        chunk.append(move)
+        if len(chunk) >= chunk_size:
+            moved += _apply_chunk(checkpoint, chunk)
+            processed += len(chunk)
+            chunk = []
+            if progress:
+                progress(checkpoint.processed)
+    if chunk:
+        moved += _apply_chunk(checkpoint, chunk)
+        processed += len(chunk)
+        if progress:
+            progress(checkpoint.processed)
+
+    checkpoint.completed_at = timezone.now()
+    checkpoint.save(update_fields=['completed_at', 'updated_at'])
+    return processed, moved
+
+
+def users_without_progress():
+    """User ohne UserLayerProgress, ermittelt per NOT EXISTS in einer Query"""
+    User = get_user_model()
+    return User.objects.filter(~Exists(UserLayerProgress.objects.filter(user=OuterRef('pk'))))
+
+
+def backfill_user_layer_progress(real_layer, cyber_layer, chunk_size=BACKFILL_CHUNK_SIZE, progress=None):
+    """
+    Legt für alle User ohne Fortschritt einen Eintrag auf den Start-Layern an.
+    User-IDs werden per iterator() gestreamt und in Chunks per
+    bulk_create(ignore_conflicts=True) eingefügt; parallel angelegte Einträge
+    (z. B. durch das post_save-Signal) führen so nicht zum Abbruch.
+    Gibt die Anzahl verarbeiteter User zurück.
+    """
+    user_ids = users_without_progress().order_by().values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    processed = 0
+    chunk = []
+
+    def flush():
+        UserLayerProgress.objects.bulk_create(
+            [UserLayerProgress(user_id=user_id, real_layer=real_layer, cyber_layer=cyber_layer) for user_id in chunk],
+            ignore_conflicts=True,
+        )
+
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) >= chunk_size:
+            flush()
+            processed += len(chunk)
+            chunk = []
+            if progress:
+                progress(processed)
+    if chunk:
+        flush()
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+    return processed
@@ -1,3 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from rankings.models import LayerRankingEntry
+from seasons.models import Season
+from .models import Layer, LayerSnapshotCheckpoint, UserLayerProgress
+from .services import apply_layer_snapshot, backfill_user_layer_progress, users_without_progress
+
+User = get_user_model()
+
+
+class SeasonLayerSnapshotTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.season = Season.objects.create(name='Closed', start=today - timedelta(days=90), end=today)
+        self.rl0 = Layer.objects.create(code='RL0', name='Base', type='real', order=0)
+        self.rl1 = Layer.objects.create(code='RL1', name='Emotion', type='real', order=1)
+        self.rl2 = Layer.objects.create(code='RL2', name='Flow', type='real', order=2)
+        self.cl0 = Layer.objects.create(code='CL0', name='Surface-Web', type='cyber', order=0)
+        # 20 User auf RL1: oberste zwei steigen auf, unterste zwei ab; 10 User auf RL0
+        self.rl1_users = self._board(self.rl1, 20)
+        self.rl0_users = self._board(self.rl0, 10)
+
+    def _board(self, layer, size):
+        users = []
+        for i in range(size):
+            user = User.objects.create_user(username=f'{layer.code.lower()}_{i}')
+            # Das post_save-Signal legt den Fortschritt auf RL0/CL0 an
+            UserLayerProgress.objects.filter(user=user).update(real_layer=layer)
+            LayerRankingEntry.objects.create(season=self.season, user=user, layer_type=layer.code, xp=1000 - i)
+            users.append(user)
+        return users
+
+    def _real_layers(self, users):
+        progress = dict(UserLayerProgress.objects.filter(user__in=users).values_list('user_id', 'real_layer__code'))
+        return [progress[user.pk] for user in users]
+
+    def _expected(self):
+        return (
+            ['RL2'] * 2 + ['RL1'] * 16 + ['RL0'] * 2,
+            ['RL1'] + ['RL0'] * 9,
+        )
+
+    def test_applies_promotions_and_demotions(self):
+        processed, moved = apply_layer_snapshot(self.season, chunk_size=2)
+        # RL0: Aufsteiger + Unterster (bleibt auf RL0), RL1: 2 + 2
+        self.assertEqual((processed, moved), (6, 5))
+        self.assertEqual((self._real_layers(self.rl1_users), self._real_layers(self.rl0_users)), self._expected())
+        self.assertIsNotNone(LayerSnapshotCheckpoint.objects.get(season=self.season).completed_at)
+
+    def test_resumes_from_checkpoint(self):
+        def crash(done):
+            raise RuntimeError('abgebrochen')
+
+        with self.assertRaises(RuntimeError):
+            apply_layer_snapshot(self.season, chunk_size=4, progress=crash)
+        self.assertEqual(LayerSnapshotCheckpoint.objects.get(season=self.season).processed, 4)
+
+        processed, _ = apply_layer_snapshot(self.season, chunk_size=4)
+        self.assertEqual(processed, 2)
+        self.assertEqual((self._real_layers(self.rl1_users), self._real_layers(self.rl0_users)), self._expected())
+        # Abgeschlossene Seasons werden nicht erneut angewendet
+        self.assertEqual(apply_layer_snapshot(self.season), (0, 0))
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('season_layer_snapshot', season=self.season.pk, dry_run=True, stdout=out)
+        self.assertIn('RL1 → RL2: 2', out.getvalue())
+        self.assertIn('RL1 → RL0: 2', out.getvalue())
+        self.assertEqual(set(self._real_layers(self.rl1_users)), {'RL1'})
+        self.assertFalse(LayerSnapshotCheckpoint.objects.exists())
+
+
+class InitUserLayerProgressTests(TestCase):
+    def setUp(self):
+        # Ohne Layer legt das post_save-Signal keinen Fortschritt an
+        self.users = [User.objects.create_user(username=f'backfill{i}') for i in range(7)]
+        self.rl0 = Layer.objects.create(code='RL0', name='Base', type='real', order=0)
+        self.cl0 = Layer.objects.create(code='CL0', name='Surface-Web', type='cyber', order=0)
+        self.existing = User.objects.create_user(username='has_progress')
+
+    def test_backfills_only_missing_users_in_chunks(self):
+        self.assertEqual(users_without_progress().count(), 7)
+        chunks = []
+        with self.assertNumQueries(4):
+            created = backfill_user_layer_progress(self.rl0, self.cl0, chunk_size=3, progress=chunks.append)
+        self.assertEqual(created, 7)
+        self.assertEqual(chunks, [3, 6, 7])
+        self.assertEqual(UserLayerProgress.objects.count(), 8)
+        self.assertFalse(users_without_progress().exists())
 
-# Create your tests here.
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('init_user_layer_progress', chunk_size=5, stdout=out)
+        self.assertIn('7 UserLayerProgress-Einträge erstellt', out.getvalue())
+        self.assertIn('User/s', out.getvalue())
+        call_command('init_user_layer_progress', stdout=out)
+        self.assertEqual(UserLayerProgress.objects.count(), 8)
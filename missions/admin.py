@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Season, Mission, MissionProgress
+from .models import Season, Mission, MissionProgress, MissionProgressArchive, MissionRotationState
 
 @admin.register(Season)
 class SeasonAdmin(admin.ModelAdmin):
@@ -60,14 +60,14 @@ class MissionAdmin(admin.ModelAdmin):
 
 @admin.register(MissionProgress)
 class MissionProgressAdmin(admin.ModelAdmin):
-    list_display = ['user', 'mission', 'current_value', 'target_value', 'progress_percentage', 'is_completed', 'updated_at']
+    list_display = ['user', 'mission', 'period_key', 'current_value', 'target_value', 'progress_percentage', 'is_completed', 'updated_at']
     list_filter = ['is_completed', 'mission__mission_type', 'created_at', 'updated_at']
-    search_fields = ['user__username', 'mission__title']
+    search_fields = ['user__username', 'mission__title', 'period_key']
     readonly_fields = ['created_at', 'updated_at', 'progress_percentage']
     
     fieldsets = (
         ('User & Mission', {
-            'fields': ('user', 'mission')
+            'fields': ('user', 'mission', 'period_key')
         }),
         ('Progress', {
             'fields': ('current_value', 'target_value', 'progress_percentage', 'is_completed', 'completed_at')
@@ -91,3 +91,24 @@ class MissionProgressAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Optimiert die Query mit select_related"""
         return super().get_queryset(request).select_related('user', 'mission')
+
+@admin.register(MissionProgressArchive)
+class MissionProgressArchiveAdmin(admin.ModelAdmin):
+    list_display = ['user', 'mission', 'period_key', 'current_value', 'is_completed', 'archived_at']
+    list_filter = ['is_completed', 'mission__mission_type', 'archived_at']
+    search_fields = ['user__username', 'mission__title', 'period_key']
+    readonly_fields = [
+        'user', 'mission', 'period_key', 'current_value', 'is_completed',
+        'completed_at', 'created_at', 'archived_at',
+    ]
+    
+    def get_queryset(self, request):
+        """Optimiert die Query mit select_related"""
+        return super().get_queryset(request).select_related('user', 'mission')
+
+@admin.register(MissionRotationState)
+class MissionRotationStateAdmin(admin.ModelAdmin):
+    list_display = ['timezone', 'mission_type', 'period_key', 'rotated_at']
+    list_filter = ['mission_type']
+    search_fields = ['timezone']
+    readonly_fields = ['rotated_at']
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from missions.models import Mission
+from missions.services import FAN_OUT_CHUNK_SIZE, fan_out_mission_progress
+
+
+class Command(BaseCommand):
+    help = (
+        "Legt MissionProgress für alle User vorab an. Optional: Fortschritt entsteht "
+        "sonst bei der ersten Aktivität bzw. beim ersten Lesen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('mission_id', type=int, help='ID der Mission')
+        parser.add_argument('--chunk-size', type=int, default=FAN_OUT_CHUNK_SIZE, help='User pro INSERT')
+
+    def handle(self, *args, **options):
+        try:
+            mission = Mission.objects.get(pk=options['mission_id'])
+        except Mission.DoesNotExist:
+            raise CommandError(f"Mission {options['mission_id']} nicht gefunden")
+
+        started = time.monotonic()
+
+        def report(done):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{done} User verarbeitet ({done / elapsed if elapsed else 0:.0f}/s)")
+
+        processed = fan_out_mission_progress(mission, chunk_size=options['chunk_size'], progress=report)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ MissionProgress für {processed} User angelegt ({elapsed:.2f}s)"
+        ))
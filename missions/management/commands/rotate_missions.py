@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from missions.periods import ROTATING_MISSION_TYPES
+from missions.rotation import ROTATION_CHUNK_SIZE, rotate_missions
+from missions.services import reset_expired_missions
+
+
+class Command(BaseCommand):
+    help = (
+        "Eröffnet neue Daily-/Weekly-Perioden in allen Zeitzonen, in denen seit dem letzten "
+        "Lauf Mitternacht war, archiviert die alten Perioden und deaktiviert abgelaufene "
+        "Missionen. Regelmäßig ausführen, z.B. alle 15 Minuten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', dest='mission_types', action='append', choices=ROTATING_MISSION_TYPES,
+            help='Nur diesen Missions-Typ rotieren (mehrfach angebbar)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=ROTATION_CHUNK_SIZE, help='Zeilen pro Transaktion')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        expired = reset_expired_missions()
+        if expired:
+            self.stdout.write(f"{expired} abgelaufene Missionen deaktiviert")
+
+        def report(tz_name, mission_type, key, archived, opened):
+            self.stdout.write(
+                f"{tz_name} {mission_type} → {key}: {archived} archiviert, {opened} User eröffnet"
+            )
+
+        totals = rotate_missions(
+            mission_types=tuple(options['mission_types'] or ROTATING_MISSION_TYPES),
+            chunk_size=options['chunk_size'],
+            progress=report,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totals['rotated']} Perioden rotiert, {totals['archived']} Einträge archiviert, "
+            f"{totals['opened']} User eröffnet ({elapsed:.2f}s)"
+        ))
@@ -0,0 +1,176 @@
+"""
+Zuordnung von Aktivitäten zu aktiven Missionen.
+
+Alle aktiven Missionen werden einmal pro Version nach unit gruppiert im
+Prozess gehalten (inklusive Zeitfenster und Season-Zeitraum). Zeitfenster
+werden bei jeder Aktivität im Speicher geprüft, Änderungen an Mission oder
+Season verwerfen den Index. Der Fortschritt aller passenden Missionen wird
+anschließend mit einem einzigen INSERT ... ON CONFLICT DO UPDATE erhöht.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from seasons.providers import VersionedProvider
+from .models import Mission, MissionProgress, Season
+from .periods import user_period_keys
+
+# Einheiten, für die zusätzlich alle saisonalen Missionen der aktiven Season zählen
+SEASONAL_ACTIVITY_UNITS = ('seasonal_quests', 'seasonal_activities')
+
+
+class MissionEntry:
+    """Für die Zuordnung nötige Daten einer Mission"""
+
+    __slots__ = ('mission_id', 'mission_type', 'unit', 'target_value', 'start_time', 'end_time', 'season_window')
+
+    def __init__(self, mission_id, mission_type, unit, target_value, start_time, end_time, season_window):
+        self.mission_id = mission_id
+        self.mission_type = mission_type
+        self.unit = unit
+        self.target_value = target_value
+        self.start_time = start_time
+        self.end_time = end_time
+        # (start, ende) der aktiven Season bei saisonalen Missionen, False wenn die Season
+        # nicht aktiv ist, None bei nicht-saisonalen Missionen
+        self.season_window = season_window
+
+    @classmethod
+    def from_mission(cls, mission):
+        season_window = None
+        if mission.mission_type == 'seasonal' and mission.season_id:
+            season = mission.season
+            season_window = (season.start_date, season.end_date) if season.is_active else False
+        return cls(
+            mission.pk, mission.mission_type, mission.unit, mission.target_value,
+            mission.start_time, mission.end_time, season_window,
+        )
+
+    def is_active_at(self, now):
+        """Entspricht Mission.is_currently_active() ohne weitere Queries"""
+        if self.start_time and now < self.start_time:
+            return False
+        if self.end_time and now > self.end_time:
+            return False
+        if self.season_window is not None:
+            return bool(self.season_window) and self.season_window[0] <= now <= self.season_window[1]
+        return True
+
+
+class ActiveMissionIndex:
+    """Aktive Missionen nach unit, dazu die saisonalen Missionen der aktiven Season"""
+
+    def __init__(self, entries, active_season_id):
+        self.entries = [entry for entry, _ in entries]
+        self.by_unit = {}
+        self.seasonal = []
+        for entry, season_id in entries:
+            self.by_unit.setdefault(entry.unit, []).append(entry)
+            if active_season_id is not None and season_id == active_season_id:
+                self.seasonal.append(entry)
+
+    @classmethod
+    def build(cls):
+        active_season = Season.get_active_season()
+        missions = Mission.objects.filter(is_active=True).select_related('season')
+        return cls(
+            [(MissionEntry.from_mission(mission), mission.season_id) for mission in missions],
+            active_season.pk if active_season else None,
+        )
+
+    def matching(self, unit, now=None):
+        """Aktuell aktive Missionen für eine Einheit, jede Mission höchstens einmal"""
+        now = now or timezone.now()
+        candidates = list(self.by_unit.get(unit, ()))
+        if unit in SEASONAL_ACTIVITY_UNITS:
+            candidates.extend(self.seasonal)
+        seen = set()
+        matches = []
+        for entry in candidates:
+            if entry.mission_id not in seen and entry.is_active_at(now):
+                seen.add(entry.mission_id)
+                matches.append(entry)
+        return matches
+
+    def active(self, now=None, mission_type=None):
+        """Alle aktuell aktiven Missionen, optional nach Typ gefiltert"""
+        now = now or timezone.now()
+        return [
+            entry for entry in self.entries
+            if (mission_type is None or entry.mission_type == mission_type) and entry.is_active_at(now)
+        ]
+
+
+class ActiveMissionIndexProvider(VersionedProvider):
+    """
+    Prozessweiter ActiveMissionIndex, bei Änderungen an Mission oder Season
+    verworfen.
+    """
+
+    version_key = "active_mission_index:version"
+    dispatch_uid = "active_mission_index"
+    senders = (Mission, Season)
+
+    def build(self):
+        return ActiveMissionIndex.build()
+
+
+active_mission_index = ActiveMissionIndexProvider()
+
+
+def apply_activity(user, unit, value=1, now=None):
+    """
+    Erhöht den Fortschritt aller passenden Missionen eines Users um value,
+    jeweils höchstens bis target_value. Fehlende MissionProgress-Zeilen werden
+    angelegt, abgeschlossene bleiben unverändert. is_completed/completed_at
+    werden im selben Statement gesetzt. Daily-/Weekly-Missionen zählen in die
+    laufende Periode in der Zeitzone des Users.
+    Neu angelegte oder abgeschlossene Zeilen verwerfen die gecachten
+    Mission-Statistiken des Users, erneut nach dem Commit.
+    Gibt {mission_id: (current_value, is_completed)} der geänderten Zeilen zurück.
+    """
+    from .services import invalidate_mission_statistics
+
+    if value <= 0:
+        return {}
+    now = now or timezone.now()
+    entries = active_mission_index.get().matching(unit, now)
+    if not entries:
+        return {}
+
+    table = connection.ops.quote_name(MissionProgress._meta.db_table)
+    missions = connection.ops.quote_name(Mission._meta.db_table)
+    # SQLite kennt LEAST nicht, dort übernimmt das skalare MIN()
+    least = 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+    target = f"(SELECT target_value FROM {missions} WHERE id = EXCLUDED.mission_id)"
+    timestamp = MissionProgress._meta.get_field('updated_at').get_db_prep_value(now, connection)
+    period_keys = user_period_keys(user, now)
+
+    rows = []
+    params = []
+    for entry in entries:
+        completed = value >= entry.target_value
+        rows.append("(%s, %s, %s, %s, %s, %s, %s, %s)")
+        params.extend([
+            user.pk, entry.mission_id, period_keys.get(entry.mission_type, ''), min(value, entry.target_value),
+            completed, timestamp if completed else None, timestamp, timestamp,
+        ])
+    sql = (
+        f"INSERT INTO {table} "
+        f"(user_id, mission_id, period_key, current_value, is_completed, completed_at, created_at, updated_at) "
+        f"VALUES {', '.join(rows)} "
+        f"ON CONFLICT (user_id, mission_id, period_key) DO UPDATE SET "
+        f"current_value = {least}({table}.current_value + %s, {target}), "
+        f"is_completed = {table}.current_value + %s >= {target}, "
+        f"completed_at = CASE WHEN {table}.current_value + %s >= {target} THEN EXCLUDED.updated_at END, "
+        f"updated_at = EXCLUDED.updated_at "
+        f"WHERE NOT {table}.is_completed "
+        # Neu eingefügt, wenn created_at = updated_at; ein Treffer zu viel kostet nur eine Invalidierung
+        f"RETURNING mission_id, current_value, is_completed, created_at = updated_at"
+    )
+    params.extend([value, value, value])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if any(is_completed or inserted for _, _, is_completed, inserted in rows):
+        invalidate_mission_statistics(user.pk)
+    return {mission_id: (current_value, bool(is_completed)) for mission_id, current_value, is_completed, _ in rows}
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 07:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('missions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='missionprogress',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='missionprogress',
+            name='period_key',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AlterUniqueTogether(
+            name='missionprogress',
+            unique_together={('user', 'mission', 'period_key')},
+        ),
+        migrations.CreateModel(
+            name='MissionRotationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(max_length=64)),
+                ('mission_type', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('seasonal', 'Seasonal')], max_length=20)),
+                ('period_key', models.CharField(max_length=10)),
+                ('rotated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Mission Rotation State',
+                'verbose_name_plural': 'Mission Rotation States',
+                'unique_together': {('timezone', 'mission_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MissionProgressArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_key', models.CharField(max_length=10)),
+                ('current_value', models.PositiveIntegerField(default=0)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_progress', to='missions.mission')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_mission_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Mission Progress',
+                'verbose_name_plural': 'Archived Mission Progress',
+                'ordering': ['-archived_at'],
+                'indexes': [models.Index(fields=['user', 'period_key'], name='mission_archive_user_idx')],
+            },
+        ),
+    ]
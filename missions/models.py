@@ -4,6 +4,8 @@ from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from seasons.providers import ActiveSeasonProvider
+
 # Mission-Typen
 MISSION_TYPE_CHOICES = [
     ('daily', 'Daily'),
@@ -73,14 +75,16 @@ class Season(models.Model):
     
     @classmethod
     def get_active_season(cls):
-        """Gibt die aktuell aktive Season zurück"""
-        return cls.objects.filter(is_active=True).first()
+        """Gibt die aktuell aktive Season zurück (prozessweit gecacht)"""
+        return ACTIVE_SEASON_PROVIDER.get_active()
     
     def is_currently_active(self):
         """Prüft, ob die Season aktuell läuft"""
         now = timezone.now()
         return self.is_active and self.start_date <= now <= self.end_date
 
+ACTIVE_SEASON_PROVIDER = ActiveSeasonProvider(Season)
+
 class Mission(models.Model):
     """
     Missionen für User (Daily, Weekly, Seasonal).
@@ -220,6 +224,8 @@ class MissionProgress(models.Model):
         on_delete=models.CASCADE,
         related_name='user_progress'
     )
+    # Periode des Fortschritts: lokales Datum (daily), ISO-Woche (weekly), leer (seasonal)
+    period_key = models.CharField(max_length=10, default='', blank=True)
     current_value = models.PositiveIntegerField(default=0)
     is_completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(blank=True, null=True)
@@ -227,7 +233,7 @@ class MissionProgress(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        unique_together = ['user', 'mission']
+        unique_together = ['user', 'mission', 'period_key']
         ordering = ['-updated_at']
         verbose_name = "Mission Progress"
         verbose_name_plural = "Mission Progress"
@@ -245,6 +251,12 @@ class MissionProgress(models.Model):
             raise ValidationError("Abgeschlossene Missionen müssen einen completed_at Zeitstempel haben.")
     
     def save(self, *args, **kwargs):
+        from .periods import user_period_key
+
+        # Neue Daily-/Weekly-Einträge gehören zur laufenden Periode des Users
+        if self._state.adding and not self.period_key:
+            self.period_key = user_period_key(self.user, self.mission.mission_type)
+        
         # Prüfe ob Mission abgeschlossen wurde
         if not self.is_completed and self.current_value >= self.mission.target_value:
             self.is_completed = True
@@ -283,9 +295,12 @@ class MissionProgress(models.Model):
     @classmethod
     def create_progress_for_user(cls, user, mission):
         """Erstellt einen neuen Fortschritt für einen User und eine Mission"""
+        from .periods import user_period_key
+
         progress, created = cls.objects.get_or_create(
             user=user,
             mission=mission,
+            period_key=user_period_key(user, mission.mission_type),
             defaults={'current_value': 0}
         )
         return progress
@@ -295,30 +310,64 @@ class MissionProgress(models.Model):
         """
         Aktualisiert den Fortschritt für alle passenden Missionen basierend auf einer Aktivität.
         Wird automatisch aufgerufen, wenn User Aktivitäten durchführen.
+        Passende Missionen kommen aus dem ActiveMissionIndex, der Fortschritt
+        wird mit einem einzigen Upsert erhöht (siehe missions.matcher).
         """
-        # Finde alle aktiven Missionen mit der passenden Einheit
-        active_missions = Mission.objects.filter(
-            unit=unit,
-            is_active=True
-        ).filter(
-            models.Q(start_time__isnull=True) | models.Q(start_time__lte=timezone.now())
-        ).filter(
-            models.Q(end_time__isnull=True) | models.Q(end_time__gte=timezone.now())
-        )
+        from .matcher import apply_activity
         
-        # Prüfe saisonale Missionen
-        if unit in ['seasonal_quests', 'seasonal_activities']:
-            active_season = Season.get_active_season()
-            if active_season:
-                seasonal_missions = Mission.objects.filter(
-                    mission_type='seasonal',
-                    season=active_season,
-                    is_active=True
-                )
-                active_missions = active_missions.union(seasonal_missions)
-        
-        # Aktualisiere Fortschritt für jede passende Mission
-        for mission in active_missions:
-            if mission.is_currently_active():
-                progress = cls.create_progress_for_user(user, mission)
-                progress.increment_progress(value)
+        # Der Upsert löst kein post_save aus und verwirft die Statistiken selbst
+        return apply_activity(user, unit, value)
+
+
+class MissionProgressArchive(models.Model):
+    """
+    Fortschritt abgelaufener Daily-/Weekly-Perioden.
+    Wird von der Rotation (missions.rotation) mengenbasiert aus
+    MissionProgress verschoben und danach nicht mehr verändert.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_mission_progress'
+    )
+    mission = models.ForeignKey(
+        Mission,
+        on_delete=models.CASCADE,
+        related_name='archived_progress'
+    )
+    period_key = models.CharField(max_length=10)
+    current_value = models.PositiveIntegerField(default=0)
+    is_completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-archived_at']
+        indexes = [
+            models.Index(fields=['user', 'period_key'], name='mission_archive_user_idx'),
+        ]
+        verbose_name = "Archived Mission Progress"
+        verbose_name_plural = "Archived Mission Progress"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.mission.title} ({self.period_key})"
+
+
+class MissionRotationState(models.Model):
+    """
+    Zuletzt geöffnete Periode pro Zeitzone und Missions-Typ.
+    Die Rotation bearbeitet nur Zeitzonen, deren lokale Periode sich seitdem geändert hat.
+    """
+    timezone = models.CharField(max_length=64)
+    mission_type = models.CharField(max_length=20, choices=MISSION_TYPE_CHOICES)
+    period_key = models.CharField(max_length=10)
+    rotated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['timezone', 'mission_type']
+        verbose_name = "Mission Rotation State"
+        verbose_name_plural = "Mission Rotation States"
+
+    def __str__(self):
+        return f"{self.timezone} {self.mission_type}: {self.period_key}"
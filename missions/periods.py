@@ -0,0 +1,83 @@
+"""
+Perioden für Daily- und Weekly-Missionen.
+
+Jeder MissionProgress gehört zu einer Periode: Daily-Missionen zum lokalen
+Kalendertag ('2026-10-18'), Weekly-Missionen zur lokalen ISO-Woche
+('2026-W42'), Seasonal-Missionen haben keine Periode (''). Lokal heißt in der
+Zeitzone des Users (User.timezone); der Tageswechsel findet also pro
+Zeitzone statt und nicht für alle User gleichzeitig um Mitternacht UTC.
+
+Ein Wechsel der Zeitzone darf keine abgeschlossene Periode wieder öffnen.
+Vor dem Wechsel werden die laufenden Perioden als User.mission_period_floor
+festgehalten; danach gilt je Typ die spätere von Untergrenze und lokaler
+Periode. Nach Westen bleibt der User so in der bisherigen Periode, bis die
+neue Zeitzone sie eingeholt hat. Die Schlüssel sind pro Typ lexikografisch
+sortierbar.
+"""
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import Q
+from django.utils import timezone
+
+DEFAULT_TIMEZONE = 'UTC'
+
+# Missions-Typen, deren Fortschritt pro Periode neu beginnt
+ROTATING_MISSION_TYPES = ('daily', 'weekly')
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """ZoneInfo zu einem IANA-Namen; unbekannte Namen fallen auf UTC zurück"""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def period_key(mission_type, local_time):
+    """Perioden-Schlüssel eines Missions-Typs für eine lokale Uhrzeit"""
+    if mission_type == 'daily':
+        return local_time.date().isoformat()
+    if mission_type == 'weekly':
+        year, week, _ = local_time.isocalendar()
+        return f"{year}-W{week:02d}"
+    return ''
+
+
+def period_keys_for_timezone(tz_name, now=None):
+    """{missions_typ: schlüssel} der laufenden Perioden einer Zeitzone"""
+    local_time = (now or timezone.now()).astimezone(get_zone(tz_name))
+    return {mission_type: period_key(mission_type, local_time) for mission_type in ROTATING_MISSION_TYPES}
+
+
+def user_period_keys(user, now=None):
+    """{missions_typ: schlüssel} der laufenden Perioden eines Users"""
+    keys = period_keys_for_timezone(getattr(user, 'timezone', DEFAULT_TIMEZONE), now)
+    floor = getattr(user, 'mission_period_floor', None) or {}
+    return {mission_type: max(key, floor.get(mission_type, '')) for mission_type, key in keys.items()}
+
+
+def change_user_timezone(user, tz_name, now=None):
+    """
+    Setzt die Zeitzone eines Users (ohne zu speichern) und hält die bis dahin
+    laufenden Perioden als Untergrenze fest.
+    """
+    if tz_name == user.timezone:
+        return
+    user.mission_period_floor = user_period_keys(user, now)
+    user.timezone = tz_name
+
+
+def user_period_key(user, mission_type, now=None):
+    """Schlüssel der laufenden Periode eines Users für einen Missions-Typ"""
+    return user_period_keys(user, now).get(mission_type, '')
+
+
+def current_period_q(user, now=None):
+    """Filter auf MissionProgress der laufenden Perioden eines Users"""
+    keys = user_period_keys(user, now)
+    q = Q(period_key='') & ~Q(mission__mission_type__in=list(keys))
+    for mission_type, key in keys.items():
+        q |= Q(mission__mission_type=mission_type, period_key=key)
+    return q
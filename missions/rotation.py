@@ -0,0 +1,126 @@
+"""
+Rotation der Daily- und Weekly-Missionen.
+
+Beginnt in einer Zeitzone eine neue Periode (lokaler Tag bzw. ISO-Woche),
+wird der Fortschritt der alten Perioden chunkweise per INSERT ... SELECT nach
+MissionProgressArchive verschoben und aus MissionProgress gelöscht. Für die
+User dieser Chunks wird die neue Periode direkt per bulk_create eröffnet;
+alle anderen erhalten ihren Fortschritt wie gehabt lazy.
+
+MissionRotationState merkt sich pro Zeitzone und Typ die zuletzt eröffnete
+Periode. Der Command rotate_missions läuft z.B. alle 15 Minuten und bearbeitet
+nur Zeitzonen, in denen seitdem Mitternacht war; die Last verteilt sich so
+über den Tag statt auf Mitternacht UTC. Archiviert werden nur ältere
+Perioden; nach einem Zeitzonen-Wechsel nach Westen bleibt die noch laufende
+Periode eines Users (siehe missions.periods) erhalten.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .matcher import active_mission_index
+from .models import MissionProgress, MissionProgressArchive, MissionRotationState
+from .periods import ROTATING_MISSION_TYPES, period_keys_for_timezone
+from .services import mission_statistics_cache_key
+
+ROTATION_CHUNK_SIZE = 5000
+
+_ARCHIVED_COLUMNS = 'user_id, mission_id, period_key, current_value, is_completed, completed_at, created_at'
+
+
+def _archive_rows(ids, now):
+    """Verschiebt die MissionProgress-Zeilen mit den IDs ins Archiv"""
+    table = connection.ops.quote_name(MissionProgress._meta.db_table)
+    archive = connection.ops.quote_name(MissionProgressArchive._meta.db_table)
+    archived_at = MissionProgressArchive._meta.get_field('archived_at').get_db_prep_value(now, connection)
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f"INSERT INTO {archive} ({_ARCHIVED_COLUMNS}, archived_at) "
+        f"SELECT {_ARCHIVED_COLUMNS}, %s FROM {table} WHERE id IN ({placeholders})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [archived_at, *ids])
+    MissionProgress.objects.filter(id__in=ids).delete()
+
+
+def rotate_period(tz_name, mission_type, key, mission_ids, now=None, chunk_size=ROTATION_CHUNK_SIZE):
+    """
+    Archiviert allen Fortschritt eines Missions-Typs in einer Zeitzone aus
+    Perioden vor key und eröffnet key für die betroffenen User.
+    Jeder Chunk läuft in einer eigenen Transaktion; ein Abbruch lässt sich
+    durch erneuten Aufruf fortsetzen. Gibt (archiviert, eröffnet) zurück.
+    """
+    now = now or timezone.now()
+    stale = (
+        MissionProgress.objects
+        .filter(user__timezone=tz_name, mission__mission_type=mission_type)
+        .filter(period_key__lt=key)
+        .order_by('id')
+    )
+    archived = 0
+    opened_users = set()
+    last_id = 0
+    while True:
+        chunk = list(stale.filter(id__gt=last_id).values_list('id', 'user_id')[:chunk_size])
+        if not chunk:
+            break
+        ids = [row_id for row_id, _ in chunk]
+        user_ids = sorted({user_id for _, user_id in chunk} - opened_users)
+        with transaction.atomic():
+            _archive_rows(ids, now)
+            MissionProgress.objects.bulk_create(
+                [
+                    MissionProgress(user_id=user_id, mission_id=mission_id, period_key=key)
+                    for user_id in user_ids
+                    for mission_id in mission_ids
+                ],
+                ignore_conflicts=True,
+            )
+        cache.delete_many([mission_statistics_cache_key(user_id) for user_id in user_ids])
+        archived += len(ids)
+        opened_users.update(user_ids)
+        last_id = ids[-1]
+    return archived, len(opened_users)
+
+
+def rotate_missions(now=None, mission_types=ROTATING_MISSION_TYPES, chunk_size=ROTATION_CHUNK_SIZE, progress=None):
+    """
+    Eröffnet in allen Zeitzonen mit neuer lokaler Periode die neue Periode.
+    progress wird pro rotierter Zeitzone mit
+    (zeitzone, typ, schlüssel, archiviert, eröffnet) aufgerufen.
+    Gibt die Summen als Dict zurück.
+    """
+    now = now or timezone.now()
+    timezones = (
+        get_user_model().objects.order_by('timezone')
+        .values_list('timezone', flat=True).distinct()
+    )
+    states = {
+        (state.timezone, state.mission_type): state.period_key
+        for state in MissionRotationState.objects.filter(mission_type__in=mission_types)
+    }
+    index = active_mission_index.get()
+    mission_ids = {
+        mission_type: [entry.mission_id for entry in index.active(now, mission_type)]
+        for mission_type in mission_types
+    }
+
+    totals = {'rotated': 0, 'archived': 0, 'opened': 0}
+    for tz_name in timezones:
+        keys = period_keys_for_timezone(tz_name, now)
+        for mission_type in mission_types:
+            key = keys[mission_type]
+            if states.get((tz_name, mission_type)) == key:
+                continue
+            archived, opened = rotate_period(tz_name, mission_type, key, mission_ids[mission_type], now, chunk_size)
+            MissionRotationState.objects.update_or_create(
+                timezone=tz_name, mission_type=mission_type,
+                defaults={'period_key': key, 'rotated_at': now},
+            )
+            totals['rotated'] += 1
+            totals['archived'] += archived
+            totals['opened'] += opened
+            if progress:
+                progress(tz_name, mission_type, key, archived, opened)
+    return totals
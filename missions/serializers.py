@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Season, Mission, MissionProgress
+from .periods import current_period_q
 
 class SeasonSerializer(serializers.ModelSerializer):
     """Serializer für Seasons"""
@@ -73,21 +74,27 @@ class ActiveMissionSerializer(serializers.ModelSerializer):
             'is_active', 'created_at'
         ]
     
-    def get_progress(self, obj):
+    def _user_progress(self, obj):
+        """
+        Fortschritt des anfragenden Users in der laufenden Periode. Nutzt den
+        per with_user_progress vorgeladenen Eintrag, sonst eine einzelne Query.
+        """
+        if hasattr(obj, 'request_user_progress'):
+            return obj.request_user_progress[0] if obj.request_user_progress else None
         user = self.context.get('request').user
-        try:
-            progress = obj.user_progress.get(user=user)
-            return MissionProgressSerializer(progress).data
-        except MissionProgress.DoesNotExist:
+        return obj.user_progress.filter(current_period_q(user), user=user).first()
+    
+    def get_progress(self, obj):
+        progress = self._user_progress(obj)
+        if progress is None:
             return None
+        return MissionProgressSerializer(progress).data
     
     def get_progress_percentage(self, obj):
-        user = self.context.get('request').user
-        try:
-            progress = obj.user_progress.get(user=user)
-            return progress.get_progress_percentage()
-        except MissionProgress.DoesNotExist:
+        progress = self._user_progress(obj)
+        if progress is None:
             return 0
+        return progress.get_progress_percentage()
 
 class CompletedMissionSerializer(serializers.ModelSerializer):
     """Serializer für abgeschlossene Missionen"""
@@ -1,6 +1,15 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
-from .models import Season, Mission, MissionProgress
+from django.db.models import Count, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
+from .matcher import active_mission_index
+from .models import Season, Mission, MissionProgress, MissionProgressArchive
+from .periods import current_period_q, period_keys_for_timezone, user_period_keys
+
+FAN_OUT_CHUNK_SIZE = 5000
 
 def get_active_season():
     """Gibt die aktuell aktive Season zurück"""
@@ -40,12 +49,26 @@ def get_active_missions_for_user(user, mission_type=None):
     
     return missions
 
+def with_user_progress(missions, user):
+    """
+    Lädt zu jeder Mission die Season mit und den Fortschritt des Users in der
+    laufenden Periode als obj.request_user_progress (Liste mit höchstens einem
+    Eintrag). Der ActiveMissionSerializer kommt damit ohne Queries pro Mission aus.
+    """
+    return missions.select_related('season').prefetch_related(
+        Prefetch(
+            'user_progress',
+            queryset=MissionProgress.objects.filter(current_period_q(user), user=user),
+            to_attr='request_user_progress',
+        )
+    )
+
 def get_user_mission_progress(user, mission_type=None):
     """
-    Gibt den Fortschritt eines Users für alle Missionen zurück.
-    Optional gefiltert nach Mission-Typ.
+    Gibt den Fortschritt eines Users für alle Missionen in der laufenden
+    Periode zurück. Optional gefiltert nach Mission-Typ.
     """
-    progress = MissionProgress.objects.filter(user=user)
+    progress = MissionProgress.objects.filter(current_period_q(user), user=user)
     
     if mission_type:
         progress = progress.filter(mission__mission_type=mission_type)
@@ -73,11 +96,84 @@ def create_mission_progress_for_user(user, mission):
     """
     return MissionProgress.create_progress_for_user(user, mission)
 
+def ensure_mission_progress(user, mission_type=None):
+    """
+    Legt fehlende MissionProgress-Einträge für alle aktuell aktiven Missionen
+    an (Lazy-Anlage beim ersten Lesen), bei Daily/Weekly für die laufende
+    Periode des Users. Im Normalfall eine lesende Query, nur bei fehlenden
+    Einträgen folgt ein bulk_create(ignore_conflicts=True).
+    """
+    now = timezone.now()
+    period_keys = user_period_keys(user, now)
+    wanted = {
+        (entry.mission_id, period_keys.get(entry.mission_type, ''))
+        for entry in active_mission_index.get().active(now, mission_type)
+    }
+    if not wanted:
+        return 0
+    existing = set(
+        MissionProgress.objects.filter(
+            user=user,
+            mission_id__in={mission_id for mission_id, _ in wanted},
+            period_key__in={key for _, key in wanted},
+        ).values_list('mission_id', 'period_key')
+    )
+    missing = wanted - existing
+    if missing:
+        MissionProgress.objects.bulk_create(
+            [
+                MissionProgress(user=user, mission_id=mission_id, period_key=key)
+                for mission_id, key in sorted(missing)
+            ],
+            ignore_conflicts=True,
+        )
+        invalidate_mission_statistics(user.pk)
+    return len(missing)
+
+def fan_out_mission_progress(mission, chunk_size=FAN_OUT_CHUNK_SIZE, progress=None):
+    """
+    Legt MissionProgress für alle User vorab an (optionaler Hintergrund-Job),
+    bei Daily/Weekly für die laufende Periode in der Zeitzone des Users.
+    User-IDs werden per iterator() gestreamt und in Chunks per
+    bulk_create(ignore_conflicts=True) eingefügt; bereits vorhandene Einträge
+    bleiben unverändert. Gibt die Anzahl verarbeiteter User zurück.
+    """
+    User = get_user_model()
+    users = User.objects.order_by().values_list('pk', 'timezone').iterator(chunk_size=chunk_size)
+    now = timezone.now()
+    keys = {}
+    processed = 0
+    chunk = []
+
+    def flush():
+        MissionProgress.objects.bulk_create(
+            [MissionProgress(user_id=user_id, mission=mission, period_key=key) for user_id, key in chunk],
+            ignore_conflicts=True,
+        )
+
+    for user_id, tz_name in users:
+        if tz_name not in keys:
+            keys[tz_name] = period_keys_for_timezone(tz_name, now).get(mission.mission_type, '')
+        chunk.append((user_id, keys[tz_name]))
+        if len(chunk) >= chunk_size:
+            flush()
+            processed += len(chunk)
+            chunk = []
+            if progress:
+                progress(processed)
+    if chunk:
+        flush()
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+    return processed
+
 def update_mission_progress_for_activity(user, unit, value=1):
     """
     Aktualisiert den Fortschritt für alle passenden Missionen basierend auf einer Aktivität.
+    Gibt {mission_id: (current_value, is_completed)} der geänderten Fortschritte zurück.
     """
-    MissionProgress.update_progress_for_activity(user, unit, value)
+    return MissionProgress.update_progress_for_activity(user, unit, value)
 
 def get_daily_missions():
     """Gibt alle aktiven Daily-Missionen zurück"""
@@ -91,85 +187,122 @@ def get_seasonal_missions():
     """Gibt alle aktiven Seasonal-Missionen zurück"""
     return Mission.get_seasonal_missions()
 
-def get_mission_statistics_for_user(user):
+def mission_statistics_cache_key(user_id):
+    return f"mission_statistics:{user_id}"
+
+def invalidate_mission_statistics(user_id):
     """
-    Gibt Statistiken über Missionen für einen User zurück.
+    Verwirft die gecachten Mission-Statistiken eines Users sofort und nach dem
+    Commit erneut, damit kein paralleler Request den alten Stand neu cacht.
     """
-    total_progress = MissionProgress.objects.filter(user=user)
-    completed_missions = total_progress.filter(is_completed=True)
-    
-    # Statistiken nach Mission-Typ
-    daily_stats = {
-        'total': total_progress.filter(mission__mission_type='daily').count(),
-        'completed': completed_missions.filter(mission__mission_type='daily').count(),
-    }
-    
-    weekly_stats = {
-        'total': total_progress.filter(mission__mission_type='weekly').count(),
-        'completed': completed_missions.filter(mission__mission_type='weekly').count(),
-    }
-    
-    seasonal_stats = {
-        'total': total_progress.filter(mission__mission_type='seasonal').count(),
-        'completed': completed_missions.filter(mission__mission_type='seasonal').count(),
+    key = mission_statistics_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+def _completed_reward_sums():
+    """Summen der Belohnungen abgeschlossener Missionen als Aggregat-Ausdrücke"""
+    completed = Q(is_completed=True)
+    return {
+        'xp': Coalesce(Sum('mission__xp_reward', filter=completed), 0),
+        'gold': Coalesce(Sum('mission__gold_reward', filter=completed), 0),
+        'ultra_points': Coalesce(Sum('mission__ultra_point_reward', filter=completed), 0),
     }
-    
-    # Belohnungen
-    total_rewards = {
-        'xp': sum(progress.mission.xp_reward for progress in completed_missions),
-        'gold': sum(progress.mission.gold_reward for progress in completed_missions),
-        'ultra_points': sum(progress.mission.ultra_point_reward for progress in completed_missions),
+
+def _add_totals(row, archived):
+    """Addiert die Aggregate aus dem Archiv zu denen aus MissionProgress"""
+    return {key: value + archived.get(key, 0) for key, value in row.items()}
+
+def get_mission_rewards_for_user(user):
+    """Gesamt-Belohnungen aller abgeschlossenen Missionen inklusive archivierter Perioden"""
+    sums = _completed_reward_sums()
+    return _add_totals(
+        MissionProgress.objects.filter(user=user).aggregate(**sums),
+        MissionProgressArchive.objects.filter(user=user).aggregate(**sums),
+    )
+
+def get_mission_statistics_for_user(user):
+    """
+    Gibt Statistiken über Missionen für einen User zurück, inklusive
+    archivierter Daily-/Weekly-Perioden. Die Zahlen kommen aus je einer Query
+    mit bedingter Aggregation auf MissionProgress und dem Archiv und werden
+    pro User gecacht; neue und abgeschlossene Fortschritte verwerfen den Cache.
+    """
+    key = mission_statistics_cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    completed = Q(is_completed=True)
+    aggregates = {
+        'total_missions': Count('id'),
+        'total_completed': Count('id', filter=completed),
     }
-    
-    return {
-        'daily': daily_stats,
-        'weekly': weekly_stats,
-        'seasonal': seasonal_stats,
-        'total_rewards': total_rewards,
-        'total_completed': completed_missions.count(),
-        'total_missions': total_progress.count(),
+    for mission_type in ('daily', 'weekly', 'seasonal'):
+        of_type = Q(mission__mission_type=mission_type)
+        aggregates[f'{mission_type}_total'] = Count('id', filter=of_type)
+        aggregates[f'{mission_type}_completed'] = Count('id', filter=of_type & completed)
+    aggregates.update(_completed_reward_sums())
+    row = _add_totals(
+        MissionProgress.objects.filter(user=user).aggregate(**aggregates),
+        MissionProgressArchive.objects.filter(user=user).aggregate(**aggregates),
+    )
+
+    stats = {
+        mission_type: {
+            'total': row[f'{mission_type}_total'],
+            'completed': row[f'{mission_type}_completed'],
+        }
+        for mission_type in ('daily', 'weekly', 'seasonal')
     }
+    stats.update({
+        'total_rewards': {
+            'xp': row['xp'],
+            'gold': row['gold'],
+            'ultra_points': row['ultra_points'],
+        },
+        'total_completed': row['total_completed'],
+        'total_missions': row['total_missions'],
+    })
+    cache.set(key, stats, getattr(settings, 'MISSION_STATISTICS_CACHE_TTL', 300))
+    return stats
 
-def check_and_create_daily_missions():
+def check_and_create_daily_missions(now=None):
     """
-    Prüft und erstellt neue Daily-Missionen für alle User.
-    Sollte täglich ausgeführt werden.
+    Eröffnet die neue Daily-Periode in allen Zeitzonen, in denen seit dem
+    letzten Lauf ein neuer Tag begonnen hat (siehe missions.rotation).
+    Sollte regelmäßig (z.B. alle 15 Minuten) ausgeführt werden.
     """
-    daily_missions = get_daily_missions()
-    
-    # Hier könnte Logik für das automatische Erstellen von Daily-Missionen stehen
-    # z.B. basierend auf User-Level, vorherigen Aktivitäten, etc.
-    
-    return daily_missions
+    from .rotation import rotate_missions
+
+    return rotate_missions(now, mission_types=('daily',))
 
-def check_and_create_weekly_missions():
+def check_and_create_weekly_missions(now=None):
     """
-    Prüft und erstellt neue Weekly-Missionen für alle User.
-    Sollte wöchentlich ausgeführt werden.
+    Eröffnet die neue Weekly-Periode in allen Zeitzonen, in denen seit dem
+    letzten Lauf eine neue ISO-Woche begonnen hat.
     """
-    weekly_missions = get_weekly_missions()
-    
-    # Hier könnte Logik für das automatische Erstellen von Weekly-Missionen stehen
-    
-    return weekly_missions
+    from .rotation import rotate_missions
+
+    return rotate_missions(now, mission_types=('weekly',))
 
 def reset_expired_missions():
     """
-    Setzt abgelaufene Missionen zurück.
-    Sollte regelmäßig ausgeführt werden.
+    Deaktiviert Missionen, deren end_time überschritten ist.
+    Sollte regelmäßig ausgeführt werden. Gibt die Anzahl zurück.
     """
     now = timezone.now()
     
-    # Finde abgelaufene Missionen
-    expired_missions = Mission.objects.filter(
+    # Finde und deaktiviere abgelaufene Missionen
+    expired = Mission.objects.filter(
         is_active=True,
         end_time__lt=now
-    )
+    ).update(is_active=False, updated_at=now)
     
-    # Deaktiviere abgelaufene Missionen
-    expired_missions.update(is_active=False)
+    # update() löst kein post_save aus
+    if expired:
+        active_mission_index.invalidate()
     
-    return expired_missions.count()
+    return expired
 
 def award_mission_rewards(user, mission_progress):
     """
@@ -1,19 +1,19 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth import get_user_model
-from .models import Mission, MissionProgress
-from .services import update_mission_progress_for_activity
+from skills.signals import skills_unlocked
+from .matcher import active_mission_index
+from .models import MissionProgress, ACTIVE_SEASON_PROVIDER
+from .services import invalidate_mission_statistics, update_mission_progress_for_activity
 
-User = get_user_model()
+# Cache der aktiven Season bei Änderungen invalidieren
+ACTIVE_SEASON_PROVIDER.connect_signals()
+# Index der aktiven Missionen bei Änderungen an Mission/Season verwerfen
+active_mission_index.connect_signals()
 
-@receiver(post_save, sender=Mission)
-def create_mission_progress_for_existing_users(sender, instance, created, **kwargs):
-    """
-    Erstellt Mission-Progress für alle existierenden User, wenn eine neue Mission erstellt wird.
-    """
-    if created and instance.is_active:
-        for user in User.objects.all():
-            MissionProgress.create_progress_for_user(user, instance)
+# MissionProgress wird nicht mehr beim Anlegen einer Mission für alle User
+# erzeugt, sondern bei der ersten Aktivität (Upsert in missions.matcher) bzw.
+# beim ersten Lesen (ensure_mission_progress). Für einen vorgezogenen
+# Fan-out siehe den Command fan_out_mission_progress.
 
 @receiver(post_save, sender=MissionProgress)
 def award_rewards_on_completion(sender, instance, created, **kwargs):
@@ -25,6 +25,15 @@ def award_rewards_on_completion(sender, instance, created, **kwargs):
         # award_mission_rewards(instance.user, instance)
         pass
 
+@receiver(post_save, sender=MissionProgress)
+def invalidate_statistics_on_completion(sender, instance, created, **kwargs):
+    """
+    Verwirft die gecachten Mission-Statistiken, wenn ein Fortschritt
+    abgeschlossen oder neu angelegt wird.
+    """
+    if created or instance.is_completed:
+        invalidate_mission_statistics(instance.user_id)
+
 # Signal für XP-Events (wenn XP-System verfügbar ist)
 @receiver(post_save, sender='xp.XPEvent')
 def update_missions_on_xp_gain(sender, instance, created, **kwargs):
@@ -51,6 +60,18 @@ def update_missions_on_skill_unlock(sender, instance, created, **kwargs):
             value=1
         )
 
+@receiver(skills_unlocked)
+def update_missions_on_skills_unlocked(sender, user, skill_ids, **kwargs):
+    """
+    Aktualisiert Mission-Fortschritt für per unlock_skills eingefügte Skills.
+    Der Raw-INSERT löst kein post_save aus, doppelte Zählung ist daher ausgeschlossen.
+    """
+    update_mission_progress_for_activity(
+        user=user,
+        unit='skills_unlocked',
+        value=len(skill_ids)
+    )
+
 # Signal für Layer-Events (wenn Layer-System verfügbar ist)
 @receiver(post_save, sender='layers.UserLayerProgress')
 def update_missions_on_layer_completion(sender, instance, created, **kwargs):
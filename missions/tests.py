@@ -1,3 +1,331 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .matcher import ActiveMissionIndexProvider, active_mission_index, apply_activity
+from .models import Mission, MissionProgress, MissionProgressArchive, MissionRotationState, Season
+from .periods import change_user_timezone, period_keys_for_timezone, user_period_keys
+from .rotation import rotate_missions
+from .serializers import ActiveMissionSerializer
+from .services import (
+    ensure_mission_progress, fan_out_mission_progress, get_mission_statistics_for_user,
+    update_mission_progress_for_activity,
+)
+
+User = get_user_model()
+
+
+def make_mission(title, **kwargs):
+    defaults = {
+        'description': title, 'mission_type': 'daily', 'unit': 'pushups',
+        'target_value': 10, 'xp_reward': 5,
+    }
+    defaults.update(kwargs)
+    return Mission.objects.create(title=title, **defaults)
+
+
+class MissionMatcherTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='runner')
+        self.pushups = make_mission('Pushups')
+        self.steps = make_mission('Steps', unit='steps', target_value=1000)
+
+    def progress(self, mission):
+        return MissionProgress.objects.get(user=self.user, mission=mission)
+
+    def test_increments_and_completes_in_one_statement(self):
+        active_mission_index.get()
+        with self.assertNumQueries(1):
+            result = update_mission_progress_for_activity(self.user, 'pushups', 4)
+        self.assertEqual(result, {self.pushups.pk: (4, False)})
+
+        result = update_mission_progress_for_activity(self.user, 'pushups', 20)
+        self.assertEqual(result, {self.pushups.pk: (10, True)})
+        progress = self.progress(self.pushups)
+        self.assertEqual((progress.current_value, progress.is_completed), (10, True))
+        self.assertIsNotNone(progress.completed_at)
+
+        # Abgeschlossene Missionen bleiben unverändert
+        self.assertEqual(update_mission_progress_for_activity(self.user, 'pushups', 1), {})
+        self.assertFalse(MissionProgress.objects.filter(user=self.user, mission=self.steps).exists())
+
+    def test_time_windows_and_seasons(self):
+        now = timezone.now()
+        future = make_mission('Later', start_time=now + timedelta(hours=1))
+        expired = make_mission('Earlier', end_time=now - timedelta(hours=1))
+        season = Season.objects.create(title='S1', start_date=now - timedelta(days=1), end_date=now + timedelta(days=1))
+        seasonal = make_mission('Seasonal', mission_type='seasonal', season=season)
+
+        result = update_mission_progress_for_activity(self.user, 'pushups', 1)
+        self.assertEqual(set(result), {self.pushups.pk})
+
+        # Aktivieren der Season verwirft den Index
+        season.is_active = True
+        season.save()
+        result = update_mission_progress_for_activity(self.user, 'pushups', 1)
+        self.assertEqual(set(result), {self.pushups.pk, seasonal.pk})
+        self.assertNotIn(future.pk, result)
+        self.assertNotIn(expired.pk, result)
+
+    def test_creates_missing_progress(self):
+        update_mission_progress_for_activity(self.user, 'steps', 1500)
+        progress = self.progress(self.steps)
+        self.assertEqual((progress.current_value, progress.is_completed), (1000, True))
+
+    def test_changes_without_shared_cache_expire_after_ttl(self):
+        provider = ActiveMissionIndexProvider(ttl=0)
+        now = timezone.now()
+        self.assertEqual(provider.get().matching('squats', now), [])
+
+        # Änderung ohne Signal, wie aus einem Worker mit eigenem Cache
+        Mission.objects.filter(pk=self.pushups.pk).update(unit='squats')
+        entries = provider.get().matching('squats', now)
+        self.assertEqual([entry.mission_id for entry in entries], [self.pushups.pk])
+
+
+class LazyMissionProgressTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'lazy{i}') for i in range(3)]
+
+    def test_creating_a_mission_does_not_fan_out(self):
+        with self.assertNumQueries(1):
+            mission = make_mission('Pushups')
+        self.assertFalse(MissionProgress.objects.filter(mission=mission).exists())
+
+    def test_progress_appears_on_first_read(self):
+        mission = make_mission('Pushups')
+        make_mission('Weekly', mission_type='weekly')
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.get(reverse('missions:mission-progress'), {'mission_type': 'daily'})
+        self.assertEqual([entry['mission']['id'] for entry in response.data], [mission.pk])
+        self.assertEqual(ensure_mission_progress(self.users[0]), 1)
+        self.assertEqual(ensure_mission_progress(self.users[0]), 0)
+
+    def test_fan_out(self):
+        mission = make_mission('Pushups')
+        MissionProgress.objects.create(user=self.users[0], mission=mission, current_value=3)
+        reported = []
+        self.assertEqual(fan_out_mission_progress(mission, chunk_size=2, progress=reported.append), 3)
+        self.assertEqual(reported, [2, 3])
+        self.assertEqual(MissionProgress.objects.filter(mission=mission).count(), 3)
+        self.assertEqual(MissionProgress.objects.get(user=self.users[0], mission=mission).current_value, 3)
+
+
+class MissionStatisticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='stats')
+        self.daily = make_mission('Daily', target_value=5, xp_reward=10, gold_reward=2)
+        self.weekly = make_mission('Weekly', mission_type='weekly', unit='steps', xp_reward=7, ultra_point_reward=1)
+        make_mission('Untouched', unit='steps')
+        ensure_mission_progress(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_aggregate_queries_and_cache(self):
+        # je eine Aggregat-Query auf MissionProgress und das Archiv
+        with self.assertNumQueries(2):
+            stats = get_mission_statistics_for_user(self.user)
+        self.assertEqual(stats['daily'], {'total': 2, 'completed': 0})
+        self.assertEqual(stats['total_rewards'], {'xp': 0, 'gold': 0, 'ultra_points': 0})
+        with self.assertNumQueries(0):
+            get_mission_statistics_for_user(self.user)
+
+        # Ein Abschluss über den Upsert verwirft den Cache
+        update_mission_progress_for_activity(self.user, 'pushups', 5)
+        stats = get_mission_statistics_for_user(self.user)
+        self.assertEqual(stats['daily'], {'total': 2, 'completed': 1})
+        self.assertEqual((stats['total_completed'], stats['total_missions']), (1, 3))
+        self.assertEqual(stats['total_rewards'], {'xp': 10, 'gold': 2, 'ultra_points': 0})
+
+        # ebenso ein per ORM abgeschlossener Fortschritt
+        progress = MissionProgress.objects.get(user=self.user, mission=self.weekly)
+        progress.increment_progress(10)
+        stats = get_mission_statistics_for_user(self.user)
+        self.assertEqual(stats['weekly'], {'total': 1, 'completed': 1})
+        self.assertEqual(stats['total_rewards'], {'xp': 17, 'gold': 2, 'ultra_points': 1})
+
+    def test_inserted_rows_invalidate_the_cache(self):
+        MissionProgress.objects.filter(user=self.user, mission=self.daily).delete()
+        self.assertEqual(get_mission_statistics_for_user(self.user)['total_missions'], 2)
+        with self.captureOnCommitCallbacks() as callbacks:
+            # Legt die Zeile per Upsert neu an, ohne sie abzuschließen
+            update_mission_progress_for_activity(self.user, 'pushups', 1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_mission_statistics_for_user(self.user)['total_missions'], 3)
+
+        # Reine Fortschritte ändern die Statistik nicht
+        with self.captureOnCommitCallbacks() as callbacks:
+            update_mission_progress_for_activity(self.user, 'pushups', 1)
+        self.assertEqual(callbacks, [])
+
+    def test_rewards_endpoint(self):
+        update_mission_progress_for_activity(self.user, 'pushups', 5)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('missions:mission-rewards'))
+        self.assertEqual(
+            response.data,
+            {'xp_reward': 10, 'gold_reward': 2, 'ultra_point_reward': 0, 'total_value': 12},
+        )
+
+
+class ActiveMissionSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer')
+        other = User.objects.create_user(username='other')
+        now = timezone.now()
+        self.season = Season.objects.create(
+            title='S1', start_date=now - timedelta(days=1), end_date=now + timedelta(days=1), is_active=True,
+        )
+        self.missions = [make_mission('Pushups')]
+        MissionProgress.objects.create(user=self.user, mission=self.missions[0], current_value=4)
+        MissionProgress.objects.create(user=other, mission=self.missions[0], current_value=9)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'missions:{name}'))
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_payload_and_query_count(self):
+        data, few = self.get('active-missions')
+        self.assertEqual(data[0]['progress']['current_value'], 4)
+        self.assertEqual(data[0]['progress_percentage'], 40.0)
+        self.assertFalse(data[0]['progress']['is_expired'])
+
+        for i in range(5):
+            mission = make_mission(f'Seasonal {i}', mission_type='seasonal', season=self.season)
+            MissionProgress.objects.create(user=self.user, mission=mission, current_value=i)
+        make_mission('Without progress', mission_type='weekly')
+        data, many = self.get('active-missions')
+        self.assertEqual(len(data), 7)
+        # Missionen (mit Season) und Fortschritt; die aktive Season kommt aus dem Prozess-Cache
+        self.assertLessEqual(many, few)
+        self.assertLessEqual(many, 2)
+        by_title = {entry['title']: entry for entry in data}
+        self.assertIsNone(by_title['Without progress']['progress'])
+        self.assertEqual(by_title['Without progress']['progress_percentage'], 0)
+        self.assertEqual(by_title['Seasonal 3']['progress']['mission']['season']['title'], 'S1')
+
+        for name, count in (('daily-missions', 1), ('weekly-missions', 1), ('seasonal-missions', 5)):
+            data, queries = self.get(name)
+            self.assertEqual(len(data), count)
+            self.assertLessEqual(queries, few)
+
+
+class MissionRotationTests(TestCase):
+    # Sonntag, 18.10.2026 12:00 UTC; in Kiritimati (UTC+14) bereits Montag 02:00
+    SUNDAY = datetime(2026, 10, 18, 12, 0, tzinfo=dt_timezone.utc)
+    MONDAY = datetime(2026, 10, 19, 9, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        cache.clear()
+        self.utc_user = User.objects.create_user(username='london')
+        self.east_user = User.objects.create_user(username='kiritimati', timezone='Pacific/Kiritimati')
+        self.daily = make_mission('Daily', target_value=5, xp_reward=10)
+        self.weekly = make_mission('Weekly', mission_type='weekly', target_value=50, xp_reward=20)
+
+    def keys(self, user):
+        return sorted(
+            MissionProgress.objects.filter(user=user).values_list('mission__mission_type', 'period_key')
+        )
+
+    def test_period_keys(self):
+        self.assertEqual(period_keys_for_timezone('UTC', self.SUNDAY), {'daily': '2026-10-18', 'weekly': '2026-W42'})
+        self.assertEqual(
+            period_keys_for_timezone('Pacific/Kiritimati', self.SUNDAY),
+            {'daily': '2026-10-19', 'weekly': '2026-W43'},
+        )
+        # Unbekannte Zeitzonen fallen auf UTC zurück
+        self.assertEqual(period_keys_for_timezone('Mars/Olympus', self.SUNDAY)['daily'], '2026-10-18')
+
+    def test_activity_counts_into_local_period(self):
+        apply_activity(self.utc_user, 'pushups', 5, self.SUNDAY)
+        apply_activity(self.east_user, 'pushups', 2, self.SUNDAY)
+        self.assertEqual(self.keys(self.utc_user), [('daily', '2026-10-18'), ('weekly', '2026-W42')])
+        self.assertEqual(self.keys(self.east_user), [('daily', '2026-10-19'), ('weekly', '2026-W43')])
+
+        # Abgeschlossene Daily-Mission beginnt am nächsten Tag neu
+        result = apply_activity(self.utc_user, 'pushups', 1, self.MONDAY)
+        self.assertEqual(result[self.daily.pk], (1, False))
+        self.assertEqual(MissionProgress.objects.filter(user=self.utc_user, mission=self.daily).count(), 2)
+
+    def test_rotation_per_timezone(self):
+        apply_activity(self.utc_user, 'pushups', 5, self.SUNDAY)
+        apply_activity(self.east_user, 'pushups', 2, self.SUNDAY)
+        # Erster Lauf merkt sich nur die laufenden Perioden
+        self.assertEqual(rotate_missions(self.SUNDAY)['archived'], 0)
+        self.assertEqual(MissionRotationState.objects.count(), 4)
+        self.assertEqual(rotate_missions(self.SUNDAY)['rotated'], 0)
+
+        totals = rotate_missions(self.MONDAY, chunk_size=1)
+        # Nur UTC hat seit dem letzten Lauf einen neuen Tag und eine neue Woche
+        self.assertEqual(totals, {'rotated': 2, 'archived': 2, 'opened': 2})
+        self.assertEqual(self.keys(self.utc_user), [('daily', '2026-10-19'), ('weekly', '2026-W43')])
+        self.assertFalse(
+            MissionProgress.objects.filter(user=self.utc_user, current_value__gt=0).exists()
+        )
+        self.assertEqual(self.keys(self.east_user), [('daily', '2026-10-19'), ('weekly', '2026-W43')])
+        archived = MissionProgressArchive.objects.get(user=self.utc_user, mission=self.daily)
+        self.assertEqual((archived.period_key, archived.current_value, archived.is_completed), ('2026-10-18', 5, True))
+        self.assertEqual(MissionProgressArchive.objects.filter(user=self.east_user).count(), 0)
+
+        # Archivierte Abschlüsse zählen weiter in die Statistik
+        stats = get_mission_statistics_for_user(self.utc_user)
+        self.assertEqual((stats['total_completed'], stats['total_missions']), (1, 4))
+        self.assertEqual(stats['total_rewards']['xp'], 10)
+
+    def test_timezone_change_does_not_reopen_periods(self):
+        # Montag in Kiritimati abschließen, dann nach UTC (noch Sonntag) wechseln
+        apply_activity(self.east_user, 'pushups', 5, self.SUNDAY)
+        change_user_timezone(self.east_user, 'UTC', self.SUNDAY)
+        self.east_user.save()
+        self.assertEqual(user_period_keys(self.east_user, self.SUNDAY), {'daily': '2026-10-19', 'weekly': '2026-W43'})
+
+        rotate_missions(self.SUNDAY)
+        result = apply_activity(self.east_user, 'pushups', 5, self.SUNDAY)
+        self.assertEqual(result, {self.weekly.pk: (10, False)})
+        self.assertEqual(apply_activity(self.east_user, 'pushups', 5, self.MONDAY), {self.weekly.pk: (15, False)})
+        self.assertEqual(self.keys(self.east_user), [('daily', '2026-10-19'), ('weekly', '2026-W43')])
+
+        # Erst der nächste Tag in UTC beginnt eine neue Periode
+        result = apply_activity(self.east_user, 'pushups', 1, self.MONDAY + timedelta(days=1))
+        self.assertEqual(result[self.daily.pk], (1, False))
+
+    def test_timezone_change_via_api(self):
+        client = APIClient()
+        client.force_authenticate(user=self.east_user)
+        response = client.patch(reverse('custom_me_view'), {'timezone': 'UTC'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.east_user.refresh_from_db()
+        self.assertEqual(self.east_user.timezone, 'UTC')
+        self.assertEqual(set(self.east_user.mission_period_floor), {'daily', 'weekly'})
+
+    def test_serializer_reads_current_period(self):
+        MissionProgress.objects.create(
+            user=self.utc_user, mission=self.daily, period_key='2000-01-01', current_value=5,
+        )
+        MissionProgress.objects.create(user=self.utc_user, mission=self.daily, current_value=2)
+        request = APIRequestFactory().get('/')
+        request.user = self.utc_user
+        data = ActiveMissionSerializer(self.daily, context={'request': request}).data
+        self.assertEqual(data['progress']['current_value'], 2)
 
-# Create your tests here.
+    def test_command(self):
+        apply_activity(self.utc_user, 'pushups', 1)
+        out = StringIO()
+        call_command('rotate_missions', '--type', 'daily', stdout=out)
+        self.assertIn('Perioden rotiert', out.getvalue())
+        self.assertEqual(set(MissionRotationState.objects.values_list('mission_type', flat=True)), {'daily'})
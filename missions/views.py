@@ -14,7 +14,8 @@ from .services import (
     get_active_season, get_active_missions_for_user, get_user_mission_progress,
     get_completed_missions_for_user, update_mission_progress_for_activity,
     get_mission_statistics_for_user, get_daily_missions, get_weekly_missions,
-    get_seasonal_missions
+    get_seasonal_missions, ensure_mission_progress, get_mission_rewards_for_user,
+    with_user_progress
 )
 
 class ActiveSeasonView(generics.RetrieveAPIView):
@@ -49,7 +50,8 @@ class ActiveMissionsView(generics.ListAPIView):
     
     def get_queryset(self):
         mission_type = self.request.query_params.get('mission_type')
-        return get_active_missions_for_user(self.request.user, mission_type)
+        missions = get_active_missions_for_user(self.request.user, mission_type)
+        return with_user_progress(missions, self.request.user)
 
 class MissionProgressView(generics.ListAPIView):
     """
@@ -60,6 +62,8 @@ class MissionProgressView(generics.ListAPIView):
     
     def get_queryset(self):
         mission_type = self.request.query_params.get('mission_type')
+        # Fortschritt wird lazy angelegt, fehlende Einträge beim ersten Lesen ergänzen
+        ensure_mission_progress(self.request.user, mission_type)
         return get_user_mission_progress(self.request.user, mission_type)
 
 class CompletedMissionsView(generics.ListAPIView):
@@ -81,7 +85,7 @@ class DailyMissionsView(generics.ListAPIView):
     serializer_class = ActiveMissionSerializer
     
     def get_queryset(self):
-        return get_daily_missions()
+        return with_user_progress(get_daily_missions(), self.request.user)
 
 class WeeklyMissionsView(generics.ListAPIView):
     """
@@ -91,7 +95,7 @@ class WeeklyMissionsView(generics.ListAPIView):
     serializer_class = ActiveMissionSerializer
     
     def get_queryset(self):
-        return get_weekly_missions()
+        return with_user_progress(get_weekly_missions(), self.request.user)
 
 class SeasonalMissionsView(generics.ListAPIView):
     """
@@ -101,7 +105,7 @@ class SeasonalMissionsView(generics.ListAPIView):
     serializer_class = ActiveMissionSerializer
     
     def get_queryset(self):
-        return get_seasonal_missions()
+        return with_user_progress(get_seasonal_missions(), self.request.user)
 
 class MissionDetailView(generics.RetrieveAPIView):
     """
@@ -165,12 +169,11 @@ class MissionRewardsView(generics.GenericAPIView):
     serializer_class = MissionRewardSerializer
     
     def get(self, request, *args, **kwargs):
-        completed_missions = get_completed_missions_for_user(request.user)
-        
+        rewards = get_mission_rewards_for_user(request.user)
         total_rewards = {
-            'xp': sum(progress.mission.xp_reward for progress in completed_missions),
-            'gold': sum(progress.mission.gold_reward for progress in completed_missions),
-            'ultra_points': sum(progress.mission.ultra_point_reward for progress in completed_missions),
+            'xp_reward': rewards['xp'],
+            'gold_reward': rewards['gold'],
+            'ultra_point_reward': rewards['ultra_points'],
         }
         
         serializer = self.get_serializer(total_rewards)
@@ -223,10 +226,5 @@ class UserMissionProgressDetailView(generics.RetrieveAPIView):
         mission_id = self.kwargs.get('mission_id')
         mission = get_object_or_404(Mission, id=mission_id)
         
-        progress, created = MissionProgress.objects.get_or_create(
-            user=self.request.user,
-            mission=mission,
-            defaults={'current_value': 0}
-        )
-        
-        return progress
+        # Fortschritt der laufenden Periode (bei Daily/Weekly in der Zeitzone des Users)
+        return MissionProgress.create_progress_for_user(self.request.user, mission)
@@ -0,0 +1,450 @@
+"""
+Echtzeit-Leaderboard für SeasonXp auf Basis von Sorted Sets.
+
+Pro (Season, Layer) existiert ein Sorted Set user_id → XP. Jeder XP-Grant
+erhöht den Score per ZINCRBY, Rang-, Top-N- und "um mich herum"-Abfragen
+laufen in O(log N). Fehlt ein Set (Kaltstart, Redis-Neustart, abgelaufene
+TTL), wird es beim nächsten Lesezugriff aus SeasonXp neu aufgebaut. Die TTL
+gleicht die Sets zugleich regelmäßig mit SeasonXp ab.
+
+Ohne REDIS_URL, während ein anderer Prozess ein Set aufbaut oder wenn Redis
+nicht erreichbar ist, beantwortet DatabaseLeaderboard dieselben Abfragen per
+Window-Query direkt aus SeasonXp.
+
+Alle Backends sortieren gleich: XP absteigend, bei Gleichstand die kleinere
+User-ID zuerst. In Redis steht dafür -XP als Score und die User-ID auf feste
+Breite aufgefüllt als Member; ZRANGE/ZRANK sortieren Gleichstände nach dem
+Member aufsteigend und damit numerisch nach User-ID.
+"""
+import logging
+import threading
+import uuid
+from bisect import bisect_left, insort
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+REBUILD_CHUNK_SIZE = 5000
+
+# Maximale Dauer eines Neuaufbaus; danach verfallen Sperre und temporäres Set
+REBUILD_LOCK_TIMEOUT_MS = 5 * 60 * 1000
+
+# Stellen der User-ID im Redis-Member (siehe _member)
+MEMBER_WIDTH = 12
+
+# ZINCRBY auf das Set (Scores sind -XP). Während eines Neuaufbaus enthält die
+# Sperre KEYS[2] den Namen eines Delta-Sets, in dem der Grant zusätzlich
+# landet; Grants, die während des Aufbaus committen, fehlen im
+# SeasonXp-Snapshot und werden beim Abschluss aus dem Delta-Set addiert.
+# Die XP werden wie SeasonXp.xp bei floor begrenzt, der Score also bei -floor.
+_INCR_SCRIPT = """
+local delta_key = redis.call('GET', KEYS[2])
+if delta_key then
+    redis.call('ZINCRBY', delta_key, ARGV[1], ARGV[2])
+    redis.call('PEXPIRE', delta_key, redis.call('PTTL', KEYS[2]))
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local score = tonumber(redis.call('ZINCRBY', KEYS[1], ARGV[1], ARGV[2]))
+local ceiling = tonumber(ARGV[3])
+if score > ceiling then
+    redis.call('ZADD', KEYS[1], ceiling, ARGV[2])
+    score = ceiling
+end
+return tostring(score)
+"""
+
+# Schließt einen Neuaufbau atomar ab: Set = Snapshot + Delta, TTL setzen,
+# Sperre freigeben und die temporären Keys entfernen
+_FINISH_SCRIPT = """
+redis.call('ZUNIONSTORE', KEYS[1], 2, KEYS[3], KEYS[4])
+if tonumber(ARGV[1]) > 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if redis.call('GET', KEYS[2]) == KEYS[4] then
+    redis.call('DEL', KEYS[2])
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+return 1
+"""
+
+# Sperre nur freigeben, wenn sie noch zum eigenen Neuaufbau gehört
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _building_key(key):
+    return f"{key}:building"
+
+
+def _member(user_id):
+    """Redis-Member einer User-ID; lexikografisch wie numerisch sortiert"""
+    return f"{int(user_id):0{MEMBER_WIDTH}d}"
+
+
+class InMemoryLeaderboardBackend:
+    """
+    Sorted-Set-Ersatz im Prozessspeicher für Tests.
+    Ränge werden per Binärsuche über eine sortierte Liste ermittelt;
+    Member sind User-IDs, Gleichstände sortieren aufsteigend nach ID.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._boards = {}  # key -> (scores: dict, order: list[(-score, member)])
+
+    def exists(self, key):
+        return key in self._boards
+
+    def incr(self, key, member, amount, floor=0):
+        member = int(member)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                return None
+            scores, order = board
+            old = scores.get(member)
+            if old is not None:
+                del order[bisect_left(order, (-old, member))]
+            new = max((old or 0) + amount, floor)
+            scores[member] = new
+            insort(order, (-new, member))
+            return new
+
+    def replace(self, key, mapping):
+        scores = {int(member): score for member, score in mapping}
+        order = sorted((-score, member) for member, score in scores.items())
+        with self._lock:
+            self._boards[key] = (scores, order)
+
+    def rebuild(self, key, load):
+        """Ersetzt das Set durch load(); Grants laufen unter derselben Sperre"""
+        with self._lock:
+            self.replace(key, load())
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._boards.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+    def size(self, key):
+        board = self._boards.get(key)
+        return len(board[0]) if board else 0
+
+    def score(self, key, member):
+        board = self._boards.get(key)
+        return board[0].get(int(member)) if board else None
+
+    def rank(self, key, member):
+        """0-basierter Rang (absteigend nach Score) oder None"""
+        member = int(member)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None or member not in board[0]:
+                return None
+            return bisect_left(board[1], (-board[0][member], member))
+
+    def range(self, key, offset, limit):
+        """Einträge [(member, score)] absteigend ab Position offset"""
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                return []
+            return [(member, -neg) for neg, member in board[1][offset:offset + limit]]
+
+
+class RedisLeaderboardBackend:
+    """
+    Sorted Sets in Redis (ZINCRBY, ZRANK, ZRANGE) mit -XP als Score.
+    Nach außen dieselbe Schnittstelle wie InMemoryLeaderboardBackend.
+    """
+
+    def __init__(self, client, ttl=None):
+        self.client = client
+        # Sekunden bis zum Abgleich mit SeasonXp (Neuaufbau beim nächsten Lesen)
+        self.ttl = ttl
+        self._incr = client.register_script(_INCR_SCRIPT)
+        self._finish = client.register_script(_FINISH_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def exists(self, key):
+        return bool(self.client.exists(key))
+
+    def incr(self, key, member, amount, floor=0):
+        result = self._incr(keys=[key, _building_key(key)], args=[-amount, _member(member), -floor])
+        return None if result is None else -float(result)
+
+    def rebuild(self, key, load):
+        """
+        Baut das Set aus load() in einem eindeutigen temporären Key auf und
+        ersetzt es atomar; Leser sehen nie ein halb aufgebautes Set.
+        Die Sperre key:building (SET NX PX) verweist auf ein Delta-Set, in das
+        _INCR_SCRIPT parallele Grants schreibt. Erst nach gesetzter Sperre wird
+        SeasonXp gelesen, spätere Grants fehlen im Snapshot und kommen aus dem
+        Delta-Set. Gibt False zurück, wenn bereits ein anderer Prozess aufbaut.
+        """
+        token = uuid.uuid4().hex
+        tmp_key = f"{key}:rebuild:{token}"
+        delta_key = f"{key}:delta:{token}"
+        building = _building_key(key)
+        if not self.client.set(building, delta_key, nx=True, px=REBUILD_LOCK_TIMEOUT_MS):
+            return False
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            chunk = {}
+            for member, score in load():
+                chunk[_member(member)] = -score
+                if len(chunk) >= REBUILD_CHUNK_SIZE:
+                    pipe.zadd(tmp_key, chunk)
+                    pipe.execute()
+                    chunk = {}
+            if chunk:
+                pipe.zadd(tmp_key, chunk)
+            pipe.pexpire(tmp_key, REBUILD_LOCK_TIMEOUT_MS)
+            pipe.execute()
+            self._finish(keys=[key, building, tmp_key, delta_key], args=[self.ttl or 0])
+        finally:
+            self._release(keys=[building], args=[delta_key])
+            self.client.delete(tmp_key, delta_key)
+        return True
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def size(self, key):
+        return self.client.zcard(key)
+
+    def score(self, key, member):
+        score = self.client.zscore(key, _member(member))
+        return None if score is None else -score
+
+    def rank(self, key, member):
+        return self.client.zrank(key, _member(member))
+
+    def range(self, key, offset, limit):
+        if limit <= 0:
+            return []
+        entries = self.client.zrange(key, offset, offset + limit - 1, withscores=True)
+        return [(int(member), -score) for member, score in entries]
+
+
+# Position und Gesamtzahl aller Einträge eines Boards, gefiltert auf ein
+# Fenster um die Position des Users (wie rankings.services._RANK_WINDOW_SQL)
+_SEASON_XP_WINDOW_SQL = """
+WITH ranked AS (
+    SELECT user_id, xp,
+           ROW_NUMBER() OVER (ORDER BY xp DESC, user_id) AS position,
+           COUNT(*) OVER () AS total
+    FROM {table}
+    WHERE season_id = %s AND layer_type = %s
+), me AS (
+    SELECT position FROM ranked WHERE user_id = %s
+)
+SELECT ranked.user_id, ranked.xp, ranked.position, ranked.total FROM ranked, me
+WHERE ranked.position BETWEEN me.position - %s AND me.position + %s
+ORDER BY ranked.position
+"""
+
+
+class DatabaseLeaderboard:
+    """
+    Dieselben Abfragen wie SeasonLeaderboard, direkt aus SeasonXp.
+    Ränge sind 1-basiert, bei Gleichstand entscheidet die kleinere User-ID.
+    """
+
+    def _queryset(self, season_id, layer_type):
+        from seasons.models import SeasonXp
+
+        return SeasonXp.objects.filter(season_id=season_id, layer_type=layer_type)
+
+    def _window(self, season_id, layer_type, user_id, radius):
+        from seasons.models import SeasonXp
+
+        table = connection.ops.quote_name(SeasonXp._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _SEASON_XP_WINDOW_SQL.format(table=table),
+                [season_id, layer_type, user_id, radius, radius],
+            )
+            return cursor.fetchall()
+
+    def record_xp(self, season_id, layer_type, user_id, amount, floor=0):
+        """SeasonXp ist bereits die Quelle, nichts zu tun"""
+
+    def record_xp_on_commit(self, season_id, layer_type, user_id, amount, floor=0):
+        """SeasonXp ist bereits die Quelle, nichts zu tun"""
+
+    def size(self, season_id, layer_type):
+        return self._queryset(season_id, layer_type).count()
+
+    def top(self, season_id, layer_type, limit=10, offset=0):
+        rows = (
+            self._queryset(season_id, layer_type)
+            .order_by('-xp', 'user_id')
+            .values_list('user_id', 'xp')[offset:offset + limit]
+        )
+        return [
+            {'rank': offset + 1 + i, 'user_id': user_id, 'xp': xp}
+            for i, (user_id, xp) in enumerate(rows)
+        ]
+
+    def rank_of(self, season_id, layer_type, user_id):
+        rows = self._window(season_id, layer_type, user_id, 0)
+        if not rows:
+            return None
+        _, xp, position, total = rows[0]
+        return {'rank': position, 'user_id': int(user_id), 'xp': xp, 'total': total}
+
+    def around(self, season_id, layer_type, user_id, radius=5):
+        return [
+            {'rank': position, 'user_id': member, 'xp': xp}
+            for member, xp, position, _ in self._window(season_id, layer_type, user_id, radius)
+        ]
+
+
+class SeasonLeaderboard:
+    """
+    Leaderboard pro (Season, Layer) über einem Sorted-Set-Backend.
+    Ränge sind 1-basiert, bei Gleichstand entscheidet die kleinere User-ID.
+    Ist das Set nicht verfügbar (Neuaufbau läuft anderswo, Backend-Fehler),
+    antwortet fallback aus SeasonXp.
+    """
+
+    def __init__(self, backend, fallback=None):
+        self.backend = backend
+        self.fallback = fallback or DatabaseLeaderboard()
+
+    @staticmethod
+    def key(season_id, layer_type):
+        # v2: Scores -XP, Member auf feste Breite aufgefüllt
+        return f"leaderboard:v2:season:{season_id}:{layer_type}"
+
+    def rebuild(self, season_id, layer_type):
+        """Baut das Set für (Season, Layer) aus SeasonXp neu auf; False, wenn es bereits aufgebaut wird"""
+        from seasons.models import SeasonXp
+
+        def load():
+            return (
+                SeasonXp.objects
+                .filter(season_id=season_id, layer_type=layer_type)
+                .values_list('user_id', 'xp')
+                .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+            )
+
+        return self.backend.rebuild(self.key(season_id, layer_type), load)
+
+    def ensure(self, season_id, layer_type):
+        """Key des aufgebauten Sets oder None, wenn gerade ein anderer Prozess aufbaut"""
+        key = self.key(season_id, layer_type)
+        if not self.backend.exists(key) and not self.rebuild(season_id, layer_type):
+            return None
+        return key
+
+    def _read(self, name, season_id, layer_type, *args):
+        try:
+            key = self.ensure(season_id, layer_type)
+            if key is not None:
+                return getattr(self, f'_{name}')(key, *args)
+        except Exception:
+            logger.exception("Leaderboard für Season %s/%s nicht verfügbar, lese aus SeasonXp", season_id, layer_type)
+        return getattr(self.fallback, name)(season_id, layer_type, *args)
+
+    def record_xp(self, season_id, layer_type, user_id, amount, floor=0):
+        """ZINCRBY für einen XP-Grant; kalte Sets werden beim Lesen aufgebaut"""
+        try:
+            self.backend.incr(self.key(season_id, layer_type), user_id, amount, floor)
+        except Exception:
+            # Das Leaderboard ist abgeleitet, ein Backend-Fehler darf den Grant nicht scheitern lassen.
+            # Das Set wird verworfen und beim nächsten Lesen aus SeasonXp neu aufgebaut.
+            logger.exception("Leaderboard-Update für Season %s/%s fehlgeschlagen", season_id, layer_type)
+            try:
+                self.backend.delete(self.key(season_id, layer_type))
+            except Exception:
+                pass
+
+    def record_xp_on_commit(self, season_id, layer_type, user_id, amount, floor=0):
+        """Wie record_xp, aber erst nach erfolgreichem Commit der XP-Transaktion"""
+        transaction.on_commit(partial(self.record_xp, season_id, layer_type, user_id, amount, floor))
+
+    def _entries(self, pairs, first_rank):
+        return [
+            {'rank': first_rank + i, 'user_id': int(member), 'xp': int(score)}
+            for i, (member, score) in enumerate(pairs)
+        ]
+
+    def size(self, season_id, layer_type):
+        return self._read('size', season_id, layer_type)
+
+    def _size(self, key):
+        return self.backend.size(key)
+
+    def top(self, season_id, layer_type, limit=10, offset=0):
+        return self._read('top', season_id, layer_type, limit, offset)
+
+    def _top(self, key, limit, offset):
+        return self._entries(self.backend.range(key, offset, limit), offset + 1)
+
+    def rank_of(self, season_id, layer_type, user_id):
+        """{'rank', 'user_id', 'xp', 'total'} des Users oder None"""
+        return self._read('rank_of', season_id, layer_type, user_id)
+
+    def _rank_of(self, key, user_id):
+        rank = self.backend.rank(key, user_id)
+        if rank is None:
+            return None
+        return {
+            'rank': rank + 1,
+            'user_id': int(user_id),
+            'xp': int(self.backend.score(key, user_id)),
+            'total': self.backend.size(key),
+        }
+
+    def around(self, season_id, layer_type, user_id, radius=5):
+        """Der User und bis zu radius Nachbarn ober- und unterhalb"""
+        return self._read('around', season_id, layer_type, user_id, radius)
+
+    def _around(self, key, user_id, radius):
+        rank = self.backend.rank(key, user_id)
+        if rank is None:
+            return []
+        start = max(0, rank - radius)
+        return self._entries(self.backend.range(key, start, rank - start + radius + 1), start + 1)
+
+
+def _create_backend():
+    url = getattr(settings, 'LEADERBOARD_REDIS_URL', None)
+    if url:
+        try:
+            import redis
+        except ImportError:
+            logger.warning("LEADERBOARD_REDIS_URL gesetzt, aber redis ist nicht installiert – lese aus SeasonXp")
+        else:
+            return RedisLeaderboardBackend(
+                redis.Redis.from_url(url), ttl=getattr(settings, 'LEADERBOARD_TTL', 3600),
+            )
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_season_leaderboard():
+    """
+    Gibt das prozessweite Leaderboard zurück: Sorted Sets in Redis oder,
+    ohne Redis, DatabaseLeaderboard. Prozesslokale Sets würden zwischen
+    Workern auseinanderlaufen.
+    """
+    backend = _create_backend()
+    if backend is None:
+        return DatabaseLeaderboard()
+    return SeasonLeaderboard(backend)
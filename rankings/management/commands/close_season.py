@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rankings.services import SEASON_END_CHUNK_SIZE, process_season_end
+from seasons.models import Season
+
+
+class Command(BaseCommand):
+    help = "Schließt eine Season ab (Ranking-Snapshot, Auf-/Abstieg, Folgeseason). Nach einem Abbruch einfach erneut starten."
+
+    def add_arguments(self, parser):
+        parser.add_argument('season_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=SEASON_END_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            result = process_season_end(options['season_id'], chunk_size=options['chunk_size'], progress=self._progress)
+        except Season.DoesNotExist:
+            raise CommandError(f"Season {options['season_id']} existiert nicht.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Season abgeschlossen: {result['entries']} Einträge, "
+            f"{result['promoted']} Aufstiege, {result['demoted']} Abstiege, "
+            f"neue Season: {result['next_season']}"
+        ))
+
+    def _progress(self, phase, done, total):
+        if phase == 'snapshot':
+            self.stdout.write(f"Snapshot: {done}/{total}")
+        elif phase.startswith('layers:'):
+            self.stdout.write(f"Layer-Wechsel {phase.split(':', 1)[1]}: {done}")
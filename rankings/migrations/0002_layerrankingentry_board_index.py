@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 06:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rankings', '0001_initial'),
+        ('seasons', '0005_alter_seasonxp_layer_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='layerrankingentry',
+            index=models.Index(fields=['season', 'layer_type', '-xp'], name='ranking_board_xp_idx'),
+        ),
+    ]
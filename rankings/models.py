@@ -22,6 +22,10 @@ class LayerRankingEntry(models.Model):
     class Meta:
         ordering = ["-xp"]
         unique_together = ("season", "user", "layer_type")
+        indexes = [
+            # Board-Sortierung für Leaderboard und Rang-Abfragen
+            models.Index(fields=["season", "layer_type", "-xp"], name="ranking_board_xp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} – {self.season.name} [{self.layer_type}]: {self.xp} XP"
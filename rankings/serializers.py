@@ -17,15 +17,9 @@ class LayerRankingEntrySerializer(serializers.ModelSerializer):
         fields = ["user", "xp", "real_layer", "cyber_layer"]
 
     def get_real_layer(self, obj):
-        """Gibt den aktuellen Real-Layer des Users zurück"""
-        try:
-            return obj.user.userlayerprogress.real_layer.name
-        except:
-            return "Base"
+        """Gibt den aktuellen Real-Layer des Users zurück (siehe with_layer_names)"""
+        return getattr(obj, "real_layer_name", None) or "Base"
 
     def get_cyber_layer(self, obj):
-        """Gibt den aktuellen Cyber-Layer des Users zurück"""
-        try:
-            return obj.user.userlayerprogress.cyber_layer.name
-        except:
-            return "Surface-Web"
+        """Gibt den aktuellen Cyber-Layer des Users zurück (siehe with_layer_names)"""
+        return getattr(obj, "cyber_layer_name", None) or "Surface-Web"
@@ -1,64 +1,207 @@
+from datetime import timedelta
+
 from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Window, prefetch_related_objects
+from django.db.models.functions import PercentRank
+from layers.models import UserLayerProgress
 from seasons.models import Season, SeasonXp
 from users.models import User
 from rankings.constants import REAL_LAYERS, CYBER_LAYERS
 from rankings.models import LayerRankingEntry
 
-def _adjust_layer(current: str, layers: list[str], percentile: float) -> str:
-    idx = layers.index(current) if current in layers else 0
-    # Aufstieg: Top 10%
-    if percentile < 0.10 and idx < len(layers) - 1:
-        return layers[idx + 1]
-    # Abstieg: untere 20%
-    if percentile >= 0.80 and idx > 0:
-        return layers[idx - 1]
-    return current
-
-@transaction.atomic
-def process_season_end(season_id: int):
+def with_layer_names(queryset):
+    """
+    Annotiert Ranking-Einträge mit den Namen des aktuellen Real- und Cyber-Layers
+    des Users (real_layer_name, cyber_layer_name) und lädt den User per JOIN mit.
+    Das Leaderboard kommt so mit einer einzigen Query aus.
+    """
+    progress = UserLayerProgress.objects.filter(user=OuterRef("user"))
+    return queryset.select_related("user").annotate(
+        real_layer_name=Subquery(progress.values("real_layer__name")[:1]),
+        cyber_layer_name=Subquery(progress.values("cyber_layer__name")[:1]),
+    )
+
+# Obere 10 % eines Boards steigen auf, untere 20 % steigen ab. Bezugsgröße ist
+# das Board (Season, Layer), nicht mehr eine globale Rangliste aller SeasonXp
+PROMOTION_PERCENTILE = 0.10
+DEMOTION_PERCENTILE = 0.80
+SEASON_END_CHUNK_SIZE = 2000
+
+# Dimension -> (SeasonXp.layer_type, Layer-Feld am User, Layer-Reihenfolge)
+SEASON_END_DIMENSIONS = {
+    "real": ("Real-Life", "real_layer", REAL_LAYERS),
+    "cyber": ("Cyber", "cyber_layer", CYBER_LAYERS),
+}
+
+def _snapshot_dimension(season, xp_layer_type, layer_field, layers, chunk_size, progress):
+    """
+    Schreibt den Ranking-Snapshot einer Dimension in Chunks per bulk_create.
+    Jeder Chunk committet einzeln; User mit vorhandenem Snapshot-Eintrag
+    werden übersprungen, ein abgebrochener Lauf setzt dadurch dort fort.
+    """
+    done = LayerRankingEntry.objects.filter(season=season, layer_type__in=layers).values("user_id")
+    rows = (
+        SeasonXp.objects
+        .filter(season=season, layer_type=xp_layer_type)
+        .exclude(user_id__in=done)
+        .order_by("user_id")
+        .values_list("user_id", "xp", f"user__{layer_field}")
+    )
+    total = rows.count()
+    written = 0
+    last_user_id = 0
+    while True:
+        chunk = list(rows.filter(user_id__gt=last_user_id)[:chunk_size])
+        if not chunk:
+            break
+        with transaction.atomic():
+            LayerRankingEntry.objects.bulk_create(
+                [
+                    LayerRankingEntry(season=season, user_id=user_id, layer_type=layer, xp=xp)
+                    for user_id, xp, layer in chunk
+                ],
+                ignore_conflicts=True,
+            )
+        last_user_id = chunk[-1][0]
+        written += len(chunk)
+        progress("snapshot", written, total)
+    return written
+
+def _apply_layer_changes(season, layer_field, layers):
+    """
+    Auf- und Abstiege per PERCENT_RANK() über den Snapshot jedes Boards.
+    Ein UPDATE pro Board und Richtung; das Ziel-Layer ergibt sich aus dem
+    Snapshot, nicht aus dem aktuellen User-Feld, Wiederholungen sind daher
+    idempotent.
+    """
+    promoted = demoted = 0
+    for idx, layer in enumerate(layers):
+        ranked = (
+            LayerRankingEntry.objects
+            .filter(season=season, layer_type=layer)
+            .annotate(percent_rank=Window(PercentRank(), order_by=F("xp").desc()))
+        )
+        if idx < len(layers) - 1:
+            promoted += User.objects.filter(
+                pk__in=ranked.filter(percent_rank__lt=PROMOTION_PERCENTILE).values("user_id")
+            ).update(**{layer_field: layers[idx + 1]})
+        if idx > 0:
+            demoted += User.objects.filter(
+                pk__in=ranked.filter(percent_rank__gte=DEMOTION_PERCENTILE).values("user_id")
+            ).update(**{layer_field: layers[idx - 1]})
+    return promoted, demoted
+
+def _noop_progress(phase, done, total):
+    pass
+
+def process_season_end(season_id: int, chunk_size: int = SEASON_END_CHUNK_SIZE, progress=None) -> dict:
+    """
+    Schließt eine Season ab:
+      1. Snapshot pro Real-/Cyber-Board (Board = Layer des Users bei Season-Ende)
+         in Chunks nach LayerRankingEntry
+      2. Auf-/Abstieg per PERCENT_RANK() innerhalb jedes Boards als Bulk-UPDATE
+      3. Season deaktivieren und Folgeseason anlegen
+
+    Achtung, geänderte Bedeutung: Früher entschied die Position in einer
+    globalen Rangliste über alle SeasonXp-Einträge (Real und Cyber gemischt,
+    alle Layer). Heute zählt nur die Position unter den Usern desselben Layers
+    derselben Dimension; "Top 10 %" heißt also Top 10 % des eigenen Boards.
+    Gespeichert wird kein Perzentil, sondern nur XP im Snapshot; das von
+    get_rank_window gelieferte percentile ist ebenfalls board-bezogen.
+
+    Es gibt keine lange, alles umfassende Transaktion. Jeder Schritt ist
+    wiederholbar, nach einem Abbruch genügt ein erneuter Aufruf.
+    progress(phase, done, total) wird nach jedem Chunk bzw. Schritt aufgerufen.
+    """
+    progress = progress or _noop_progress
     season = Season.objects.get(id=season_id)
-    sxps   = list(SeasonXp.objects.filter(season=season).select_related("user").order_by("-xp"))
-    total  = len(sxps)
-    if total == 0:
-        return
-
-    # clear old leaderboard entries
-    LayerRankingEntry.objects.filter(season=season).delete()
-
-    for pos, sxp in enumerate(sxps):
-        p = pos / total
-        u = sxp.user
-
-        new_real  = _adjust_layer(u.real_layer,  REAL_LAYERS,  p)
-        new_cyber = _adjust_layer(u.cyber_layer, CYBER_LAYERS, p)
-
-        # build snapshot entry
-        LayerRankingEntry.objects.create(
-            season=season,
-            user=u,
-            real_layer=new_real,
-            cyber_layer=new_cyber,
-            xp=sxp.xp
+    result = {"entries": 0, "promoted": 0, "demoted": 0, "next_season": None}
+
+    for xp_layer_type, layer_field, layers in SEASON_END_DIMENSIONS.values():
+        result["entries"] += _snapshot_dimension(season, xp_layer_type, layer_field, layers, chunk_size, progress)
+
+    with transaction.atomic():
+        for dimension, (_, layer_field, layers) in SEASON_END_DIMENSIONS.items():
+            promoted, demoted = _apply_layer_changes(season, layer_field, layers)
+            result["promoted"] += promoted
+            result["demoted"] += demoted
+            progress(f"layers:{dimension}", promoted + demoted, promoted + demoted)
+
+        # deactivate old and spin up new Season
+        if season.is_active:
+            season.is_active = False
+            season.save(update_fields=["is_active"])
+        result["next_season"], _ = Season.objects.get_or_create(
+            name=f"{season.name} Next",
+            start=season.end,
+            defaults={"end": season.end + timedelta(days=90), "is_active": True},
         )
+    progress("done", 1, 1)
+    return result
 
-        # update user
-        changed = False
-        if new_real != u.real_layer:
-            u.real_layer = new_real
-            changed = True
-        if new_cyber != u.cyber_layer:
-            u.cyber_layer = new_cyber
-            changed = True
-        if changed:
-            u.save(update_fields=["real_layer", "cyber_layer"])
-
-    # deactivate old and spin up new Season
-    season.is_active = False
-    season.save(update_fields=["is_active"])
-    from datetime import timedelta
-    new = Season.objects.create(
-        name=f"{season.name} Next",
-        start=season.end,
-        end=season.end + timedelta(days=90),
-        is_active=True
-    )
+# Rang, PERCENT_RANK und Position aller Einträge eines Boards, gefiltert auf
+# ein Fenster um die Position des Users. Läuft vollständig in der Datenbank.
+_RANK_WINDOW_SQL = """
+WITH ranked AS (
+    SELECT id, season_id, user_id, layer_type, xp,
+           RANK() OVER (ORDER BY xp DESC) AS rank,
+           PERCENT_RANK() OVER (ORDER BY xp DESC) AS percent_rank,
+           ROW_NUMBER() OVER (ORDER BY xp DESC, id) AS position,
+           COUNT(*) OVER () AS total
+    FROM {table}
+    WHERE season_id = %s AND layer_type = %s
+), me AS (
+    SELECT position FROM ranked WHERE user_id = %s
+)
+SELECT ranked.* FROM ranked, me
+WHERE ranked.position BETWEEN me.position - %s AND me.position + %s
+ORDER BY ranked.position
+"""
+
+def _ranking_entry_data(entry):
+    return {
+        'user': str(entry.user),
+        'xp': entry.xp,
+        'rank': entry.rank,
+        'position': entry.position,
+        'percentile': round(100 * (1 - entry.percent_rank), 2),
+    }
+
+def get_rank_window(season_id: int, layer_type: str, user, radius: int = 0):
+    """
+    Gibt den Eintrag des Users und bis zu radius Nachbarn auf dem Board
+    (season, layer_type) zurück, berechnet per RANK()/PERCENT_RANK() OVER.
+    """
+    table = LayerRankingEntry._meta.db_table
+    entries = list(LayerRankingEntry.objects.raw(
+        _RANK_WINDOW_SQL.format(table=table),
+        [season_id, layer_type, user.pk, radius, radius],
+    ))
+    if not entries:
+        return None
+    prefetch_related_objects(entries, 'user')
+
+    me = next(entry for entry in entries if entry.user_id == user.pk)
+    return {
+        'layer': layer_type,
+        'total': me.total,
+        'me': _ranking_entry_data(me),
+        'entries': [_ranking_entry_data(entry) for entry in entries],
+    }
+
+def get_user_rankings(season_id: int, user, radius: int = 0) -> dict:
+    """
+    Rang-Kontext des Users in seinem Real- und Cyber-Board der Season.
+    Eine Query für die Boards des Users, danach eine Window-Query pro Board.
+    """
+    boards = LayerRankingEntry.objects.filter(season_id=season_id, user=user).values_list('layer_type', flat=True)
+    result = {'season': season_id, 'real': None, 'cyber': None}
+    for layer_type in boards:
+        if layer_type in REAL_LAYERS:
+            side = 'real'
+        elif layer_type in CYBER_LAYERS:
+            side = 'cyber'
+        else:
+            continue
+        result[side] = get_rank_window(season_id, layer_type, user, radius)
+    return result
@@ -1,3 +1,308 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from layers.models import Layer, UserLayerProgress
+from seasons.models import Season, SeasonXp
+from seasons.services import active_season_provider
+from xp.models import XpType
+from xp.services import add_xp_to_user
+from .leaderboard import (
+    DatabaseLeaderboard, InMemoryLeaderboardBackend, RedisLeaderboardBackend, SeasonLeaderboard,
+    get_season_leaderboard,
+)
+from .models import LayerRankingEntry
+from .services import process_season_end
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+class InMemoryLeaderboardBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = InMemoryLeaderboardBackend()
+        self.backend.replace('board', [(1, 50), (2, 300), (3, 120), (4, 10)])
+
+    def test_rank_and_range(self):
+        self.assertEqual(self.backend.rank('board', 2), 0)
+        self.assertEqual(self.backend.rank('board', 4), 3)
+        self.assertIsNone(self.backend.rank('board', 99))
+        self.assertEqual(self.backend.range('board', 1, 2), [(3, 120), (1, 50)])
+
+    def test_incr_reorders_and_clamps(self):
+        self.assertEqual(self.backend.incr('board', 4, 500), 510)
+        self.assertEqual(self.backend.rank('board', 4), 0)
+        self.assertEqual(self.backend.incr('board', 1, -80), 0)
+        self.assertEqual(self.backend.incr('board', 5, 20), 20)
+        self.assertEqual(self.backend.size('board'), 5)
+
+    def test_incr_on_missing_key_is_skipped(self):
+        self.assertIsNone(self.backend.incr('cold', 1, 10))
+        self.assertFalse(self.backend.exists('cold'))
+
+
+class SeasonLeaderboardTests(TestCase):
+    def setUp(self):
+        active_season_provider.invalidate()
+        today = timezone.now().date()
+        self.season = Season.objects.create(
+            name='Ranked', start=today - timedelta(days=1), end=today + timedelta(days=30), is_active=True,
+        )
+        XpType.objects.create(key='pushups', display_name='Push-Ups', xp_amount=1, unit='repetition')
+        self.users = [User.objects.create_user(username=f'player{i}') for i in range(10)]
+        for i, user in enumerate(self.users):
+            SeasonXp.objects.create(season=self.season, user=user, layer_type='Real-Life', xp=(i + 1) * 100)
+        self.leaderboard = SeasonLeaderboard(InMemoryLeaderboardBackend())
+
+    def test_cold_start_rebuilds_from_season_xp(self):
+        top = self.leaderboard.top(self.season.pk, 'Real-Life', limit=3)
+        self.assertEqual([entry['user_id'] for entry in top], [u.pk for u in self.users[:-4:-1]])
+        self.assertEqual(top[0], {'rank': 1, 'user_id': self.users[-1].pk, 'xp': 1000})
+
+    def test_rank_and_neighbours(self):
+        me = self.leaderboard.rank_of(self.season.pk, 'Real-Life', self.users[4].pk)
+        self.assertEqual(me, {'rank': 6, 'user_id': self.users[4].pk, 'xp': 500, 'total': 10})
+        around = self.leaderboard.around(self.season.pk, 'Real-Life', self.users[4].pk, radius=2)
+        self.assertEqual([entry['rank'] for entry in around], [4, 5, 6, 7, 8])
+        edge = self.leaderboard.around(self.season.pk, 'Real-Life', self.users[-1].pk, radius=2)
+        self.assertEqual([entry['rank'] for entry in edge], [1, 2, 3])
+
+    def test_xp_grant_updates_board_after_commit(self):
+        board = self.leaderboard
+        self.assertEqual(board.rank_of(self.season.pk, 'Real-Life', self.users[0].pk)['rank'], 10)
+
+        with mock.patch('xp.services.get_season_leaderboard', return_value=board):
+            with self.captureOnCommitCallbacks(execute=True):
+                add_xp_to_user(self.users[0], 'pushups', 2000)
+
+        entry = board.rank_of(self.season.pk, 'Real-Life', self.users[0].pk)
+        self.assertEqual(entry['rank'], 1)
+        self.assertEqual(entry['xp'], 2100)
+
+    def test_database_fallback_matches_sorted_set(self):
+        # Gleichstände: beide Backends sortieren nach aufsteigender User-ID
+        SeasonXp.objects.filter(user__in=self.users[5:8]).update(xp=600)
+        database = DatabaseLeaderboard()
+        for user in (self.users[0], self.users[4], self.users[-1]):
+            self.assertEqual(
+                database.rank_of(self.season.pk, 'Real-Life', user.pk),
+                self.leaderboard.rank_of(self.season.pk, 'Real-Life', user.pk),
+            )
+        self.assertEqual(
+            database.around(self.season.pk, 'Real-Life', self.users[4].pk, radius=2),
+            self.leaderboard.around(self.season.pk, 'Real-Life', self.users[4].pk, radius=2),
+        )
+        self.assertEqual(database.top(self.season.pk, 'Real-Life', 3, 1), self.leaderboard.top(self.season.pk, 'Real-Life', 3, 1))
+        self.assertEqual(
+            [entry['user_id'] for entry in database.top(self.season.pk, 'Real-Life', 3, 2)],
+            [user.pk for user in self.users[5:8]],
+        )
+        self.assertIsNone(database.rank_of(self.season.pk, 'Cyber', self.users[0].pk))
+
+    def test_backend_errors_fall_back_to_database(self):
+        backend = mock.Mock(spec=InMemoryLeaderboardBackend)
+        backend.exists.side_effect = ConnectionError("Redis down")
+        leaderboard = SeasonLeaderboard(backend)
+        with self.assertLogs('rankings.leaderboard', 'ERROR'):
+            entry = leaderboard.rank_of(self.season.pk, 'Real-Life', self.users[4].pk)
+        self.assertEqual(entry['rank'], 6)
+
+    def test_without_redis_rankings_come_from_season_xp(self):
+        self.assertIsInstance(get_season_leaderboard(), DatabaseLeaderboard)
+
+    def test_me_and_around_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(user=self.users[4])
+        kwargs = {'season_id': self.season.pk, 'layer_type': 'Real-Life'}
+
+        response = client.get(reverse('season-ranking-me', kwargs=kwargs))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rank'], 6)
+        self.assertEqual(response.data['user'], 'player4')
+
+        response = client.get(reverse('season-ranking-around', kwargs=kwargs), {'radius': 1})
+        self.assertEqual([entry['rank'] for entry in response.data], [5, 6, 7])
+
+        response = client.get(reverse('season-ranking', kwargs=kwargs), {'top': 2, 'offset': 1})
+        # Format wie bisher (SeasonXpSerializer)
+        self.assertEqual(response.data, [
+            {'user': 'player8', 'xp': 900, 'layer_type': 'Real-Life'},
+            {'user': 'player7', 'xp': 800, 'layer_type': 'Real-Life'},
+        ])
+
+        response = client.get(reverse('season-ranking-me', kwargs={'season_id': self.season.pk, 'layer_type': 'Nope'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(fakeredis, 'fakeredis nicht installiert')
+class RedisLeaderboardBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        self.backend = RedisLeaderboardBackend(self.client, ttl=600)
+
+    def test_grants_during_rebuild_are_kept(self):
+        def load():
+            yield (1, 100)
+            # Grant committet nach dem Snapshot: fehlt in SeasonXp-Zeilen, landet im Delta-Set
+            self.assertIsNone(self.backend.incr('board', 1, 50))
+            self.assertIsNone(self.backend.incr('board', 3, 5))
+            yield (2, 120)
+
+        self.assertTrue(self.backend.rebuild('board', load))
+        self.assertEqual(self.backend.range('board', 0, 10), [(1, 150.0), (2, 120.0), (3, 5.0)])
+        self.assertGreater(self.client.ttl('board'), 0)
+        self.assertEqual(sorted(self.client.keys('board:*')), [])
+
+    def test_concurrent_rebuild_is_rejected(self):
+        def load():
+            # Ein zweiter Prozess findet die Sperre vor und baut nicht parallel auf
+            self.assertFalse(self.backend.rebuild('board', lambda: [(9, 1)]))
+            return [(1, 10)]
+
+        self.assertTrue(self.backend.rebuild('board', load))
+        self.assertEqual(self.backend.range('board', 0, 10), [(1, 10.0)])
+        self.assertEqual(self.backend.incr('board', 1, -20), 0.0)
+
+    def test_ties_order_by_ascending_user_id(self):
+        self.backend.rebuild('board', lambda: [(10, 50), (9, 50), (2, 70), (100, 50)])
+        self.assertEqual([member for member, _ in self.backend.range('board', 0, 10)], [2, 9, 10, 100])
+        self.assertEqual(self.backend.rank('board', 100), 3)
+        self.assertEqual(self.backend.score('board', 9), 50)
+
+
+class RankWindowEndpointTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.season = Season.objects.create(name='Closed', start=today - timedelta(days=90), end=today)
+        self.users = [User.objects.create_user(username=f'ranked{i}') for i in range(8)]
+        # BaseLayer: ranked0 … ranked7 mit absteigender XP, zwei teilen sich Platz 3
+        xps = [800, 700, 600, 600, 400, 300, 200, 100]
+        for user, xp in zip(self.users, xps):
+            LayerRankingEntry.objects.create(season=self.season, user=user, layer_type='BaseLayer', xp=xp)
+        LayerRankingEntry.objects.create(season=self.season, user=self.users[3], layer_type='DeepNetLayer', xp=50)
+        LayerRankingEntry.objects.create(season=self.season, user=self.users[0], layer_type='DeepNetLayer', xp=90)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users[3])
+
+    def test_me_returns_rank_in_both_layers(self):
+        response = self.client.get(reverse('rankings-me'), {'season': self.season.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        real = response.data['real']
+        self.assertEqual((real['layer'], real['rank'], real['total'], real['xp']), ('BaseLayer', 3, 8, 600))
+        self.assertAlmostEqual(real['percentile'], round(100 * (1 - 2 / 7), 2))
+        cyber = response.data['cyber']
+        self.assertEqual((cyber['layer'], cyber['rank'], cyber['percentile']), ('DeepNetLayer', 2, 0.0))
+
+    def test_around_returns_only_neighbours(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('rankings-around'), {'season': self.season.pk, 'radius': 1})
+        entries = response.data['real']['entries']
+        self.assertEqual([entry['user'] for entry in entries], ['ranked2', 'ranked3', 'ranked4'])
+        self.assertEqual([entry['rank'] for entry in entries], [3, 3, 5])
+
+    def test_season_is_required(self):
+        response = self.client.get(reverse('rankings-me'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LeaderboardQueryTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.season = Season.objects.create(name='Board', start=today - timedelta(days=90), end=today)
+        base = Layer.objects.create(code='R1', name='Base', type='real', order=1)
+        emotion = Layer.objects.create(code='R2', name='Emotion', type='real', order=2)
+        surface = Layer.objects.create(code='C1', name='Surface-Web', type='cyber', order=1)
+        for i in range(30):
+            user = User.objects.create_user(username=f'board{i}')
+            LayerRankingEntry.objects.create(season=self.season, user=user, layer_type='BaseLayer', xp=1000 - i)
+            if i % 3:
+                UserLayerProgress.objects.create(user=user, real_layer=emotion if i % 2 else base, cyber_layer=surface)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def _leaderboard(self, top):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('leaderboard'), {'season': self.season.pk, 'real_layer': 'BaseLayer', 'top': top})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(queries)
+
+    def test_query_count_is_independent_of_top(self):
+        small, small_queries = self._leaderboard(5)
+        large, large_queries = self._leaderboard(30)
+        self.assertEqual(len(small), 5)
+        self.assertEqual(len(large), 30)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(large_queries, 1)
+
+    def test_layer_names_come_from_progress(self):
+        entries, _ = self._leaderboard(4)
+        # board0 ohne Fortschritt → Standardwerte, board1 Emotion, board2 Base
+        self.assertEqual([entry['real_layer'] for entry in entries], ['Base', 'Emotion', 'Base', 'Base'])
+        self.assertEqual(entries[1]['cyber_layer'], 'Surface-Web')
+        self.assertEqual(entries[1]['user'], 'board1')
+
+
+class ProcessSeasonEndTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.season = Season.objects.create(name='S1', start=today - timedelta(days=90), end=today, is_active=True)
+        # 10 User auf BaseLayer, 10 auf EmotionLayer, XP absteigend nach Index
+        self.base = [User.objects.create_user(username=f'base{i}') for i in range(10)]
+        self.emotion = [User.objects.create_user(username=f'emo{i}', real_layer='EmotionLayer') for i in range(10)]
+        for i, user in enumerate(self.base + self.emotion):
+            SeasonXp.objects.create(season=self.season, user=user, layer_type='Real-Life', xp=1000 - (i % 10) * 10)
+        SeasonXp.objects.create(season=self.season, user=self.base[0], layer_type='Cyber', xp=5)
+
+    def _layers(self, users):
+        return [User.objects.get(pk=user.pk).real_layer for user in users]
+
+    def test_snapshot_and_layer_changes(self):
+        result = process_season_end(self.season.pk, chunk_size=3)
+
+        self.assertEqual(result['entries'], 21)
+        self.assertEqual(LayerRankingEntry.objects.filter(season=self.season, layer_type='BaseLayer').count(), 10)
+        self.assertEqual(LayerRankingEntry.objects.filter(season=self.season, layer_type='SurfaceWebLayer').count(), 1)
+        # Platz 1 steigt auf, die letzten beiden steigen ab (ab PERCENT_RANK 0.8)
+        self.assertEqual(self._layers(self.base), ['EmotionLayer'] + ['BaseLayer'] * 9)
+        self.assertEqual(self._layers(self.emotion), ['FlowLayer'] + ['EmotionLayer'] * 7 + ['BaseLayer'] * 2)
+        # Einziger Cyber-Teilnehmer steigt auf
+        self.assertEqual(User.objects.get(pk=self.base[0].pk).cyber_layer, 'DeepNetLayer')
+        self.assertEqual((result['promoted'], result['demoted']), (3, 2))
+
+        self.season.refresh_from_db()
+        self.assertFalse(self.season.is_active)
+        self.assertTrue(result['next_season'].is_active)
+        self.assertEqual(result['next_season'].start, self.season.end)
+
+    def test_resume_after_crash(self):
+        calls = []
+
+        def crash_after_first_chunk(phase, done, total):
+            calls.append((phase, done, total))
+            raise RuntimeError('abgebrochen')
+
+        with self.assertRaises(RuntimeError):
+            process_season_end(self.season.pk, chunk_size=4, progress=crash_after_first_chunk)
+        self.assertEqual(calls, [('snapshot', 4, 20)])
+        self.assertEqual(LayerRankingEntry.objects.filter(season=self.season).count(), 4)
+
+        process_season_end(self.season.pk, chunk_size=4)
+        # Ein zweiter Lauf nach Abschluss ändert nichts mehr
+        process_season_end(self.season.pk, chunk_size=4)
+
+        self.assertEqual(LayerRankingEntry.objects.filter(season=self.season).count(), 21)
+        self.assertEqual(self._layers(self.base), ['EmotionLayer'] + ['BaseLayer'] * 9)
+        self.assertEqual(self._layers(self.emotion), ['FlowLayer'] + ['EmotionLayer'] * 7 + ['BaseLayer'] * 2)
+        self.assertEqual(Season.objects.filter(name='S1 Next').count(), 1)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SeasonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seasons'
+
+    def ready(self):
+        from .services import active_season_provider
+        active_season_provider.connect_signals()
@@ -0,0 +1,118 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+# Cache-Backends, die nicht zwischen Prozessen geteilt werden
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """Ob der Default-Cache zwischen den Prozessen geteilt ist (z.B. Redis)"""
+    return settings.CACHES.get('default', {}).get('BACKEND') not in PROCESS_LOCAL_CACHES
+
+
+class VersionedProvider:
+    """
+    Prozessweit gehaltener Wert mit Versions-Key im Django-Cache.
+
+    - build() liefert den Wert; er wird beim ersten get() gebaut und pro
+      Prozess gehalten, spätestens nach ttl Sekunden neu gebaut.
+    - post_save/post_delete auf den Modellen aus get_senders() verwerfen ihn
+      sofort und nach dem Commit erneut; erst dann sehen andere Prozesse den
+      neuen Stand.
+    - Ein Versions-Key im Django-Cache wird bei jeder Änderung neu gesetzt,
+      andere Prozesse erkennen dadurch veraltete Einträge ohne DB-Query.
+      Ohne geteilten Cache (kein REDIS_URL) greift nur die ttl.
+
+    Unterklassen setzen version_key und dispatch_uid und implementieren build().
+    """
+
+    version_key = None
+    dispatch_uid = None
+    senders = ()
+    ttl_setting = 'PROVIDER_CACHE_TTL'
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._entry = None  # (version, value, expires_at)
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, self.ttl_setting, 60)
+
+    def build(self):
+        raise NotImplementedError
+
+    def get(self):
+        version = cache.get(self.version_key)
+        entry = self._entry
+        if entry is None or entry[0] != version or time.monotonic() >= entry[2]:
+            entry = (version, self.build(), time.monotonic() + self.ttl)
+            self._entry = entry
+        return entry[1]
+
+    def invalidate(self):
+        """Leert den lokalen Cache und signalisiert anderen Prozessen eine Änderung"""
+        self._entry = None
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def invalidate_on_commit(self):
+        """Verwirft sofort und nach dem Commit erneut, damit kein Prozess den alten Stand neu lädt"""
+        self.invalidate()
+        transaction.on_commit(self.invalidate)
+
+    def _on_change(self, sender, **kwargs):
+        self.invalidate_on_commit()
+
+    def get_senders(self):
+        return self.senders
+
+    def connect_signals(self):
+        for model in self.get_senders():
+            uid = f"{self.dispatch_uid}:{model._meta.label_lower}"
+            post_save.connect(self._on_change, sender=model, dispatch_uid=f"{uid}:save")
+            post_delete.connect(self._on_change, sender=model, dispatch_uid=f"{uid}:delete")
+
+
+class ActiveSeasonProvider(VersionedProvider):
+    """
+    Prozessweiter Cache der aktiven Seasons (is_active=True) eines Season-Modells.
+
+    Die zurückgegebenen Instanzen werden zwischen Requests geteilt und dürfen
+    nicht verändert werden.
+    """
+
+    dispatch_uid = "active_season_provider"
+    ttl_setting = 'ACTIVE_SEASON_CACHE_TTL'
+
+    def __init__(self, model, ttl=None):
+        super().__init__(ttl)
+        self.model = model
+        self.senders = (model,)
+        self.version_key = f"active_season:{model._meta.label_lower}:version"
+
+    def build(self):
+        queryset = self.model.objects.filter(is_active=True)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return list(queryset)
+
+    def get_seasons(self):
+        """Alle aktiven Seasons in der Reihenfolge von queryset.first()"""
+        return self.get()
+
+    def get_active(self, predicate=None):
+        """Erste aktive Season, optional gefiltert über predicate(season)"""
+        for season in self.get_seasons():
+            if predicate is None or predicate(season):
+                return season
+        return None
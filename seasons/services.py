@@ -0,0 +1,41 @@
+from django.db import connection
+from django.utils import timezone
+
+from .models import Season, SeasonXp
+from .providers import ActiveSeasonProvider
+
+active_season_provider = ActiveSeasonProvider(Season)
+
+
+def get_active_season():
+    """Gibt die als aktiv markierte Season zurück (prozessweit gecacht)"""
+    return active_season_provider.get_active()
+
+
+def get_current_season(today=None):
+    """
+    Gibt die aktive Season zurück, deren Zeitraum das heutige Datum enthält
+    (start <= heute < end). Der Datumsfilter läuft auf dem gecachten Stand.
+    """
+    today = today or timezone.now().date()
+    return active_season_provider.get_active(lambda season: season.start <= today < season.end)
+
+
+def add_season_xp(season, user, layer_type: str, amount: int, floor: int = 0) -> None:
+    """
+    Addiert XP atomar auf den SeasonXp-Eintrag eines Users.
+    Ein einziges INSERT ... ON CONFLICT DO UPDATE ersetzt get_or_create + save,
+    parallele Grants gehen dadurch nicht verloren. Der Wert wird bei floor
+    (Standard 0) begrenzt.
+    """
+    table = connection.ops.quote_name(SeasonXp._meta.db_table)
+    # SQLite kennt GREATEST nicht, dort übernimmt das skalare MAX()
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    sql = (
+        f"INSERT INTO {table} (season_id, user_id, layer_type, xp) "
+        f"VALUES (%s, %s, %s, {greatest}(%s, %s)) "
+        f"ON CONFLICT (season_id, user_id, layer_type) "
+        f"DO UPDATE SET xp = {greatest}({table}.xp + %s, %s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [season.pk, user.pk, layer_type, amount, floor, amount, floor])
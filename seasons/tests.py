@@ -1,3 +1,54 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Season
+from .providers import ActiveSeasonProvider
+from .services import active_season_provider, get_active_season, get_current_season
+
+
+class ActiveSeasonProviderTests(TestCase):
+    def setUp(self):
+        active_season_provider.invalidate()
+        today = timezone.now().date()
+        self.season = Season.objects.create(
+            name='Season 1',
+            start=today - timedelta(days=1),
+            end=today + timedelta(days=30),
+            is_active=True,
+        )
+
+    def test_cached_after_first_lookup(self):
+        self.assertEqual(get_active_season(), self.season)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_season(), self.season)
+            self.assertEqual(get_current_season(), self.season)
+
+    def test_current_season_respects_dates(self):
+        self.assertIsNone(get_current_season(self.season.end))
+        self.assertEqual(get_current_season(self.season.start), self.season)
+
+    def test_invalidated_on_save_and_delete(self):
+        self.assertEqual(get_active_season(), self.season)
+        self.season.is_active = False
+        self.season.save()
+        self.assertIsNone(get_active_season())
+
+        self.season.is_active = True
+        self.season.save()
+        self.assertEqual(get_active_season(), self.season)
+        self.season.delete()
+        self.assertIsNone(get_active_season())
+
+    def test_version_key_invalidates_other_processes(self):
+        # Zweiter Provider simuliert einen anderen Prozess ohne Signal-Anbindung
+        other = ActiveSeasonProvider(Season, ttl=3600)
+        self.assertEqual(other.get_active(), self.season)
+
+        Season.objects.filter(pk=self.season.pk).update(is_active=False)
+        self.assertEqual(other.get_active(), self.season)
 
-# Create your tests here.
+        cache.set(other.version_key, 'changed-elsewhere', None)
+        self.assertIsNone(other.get_active())
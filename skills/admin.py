@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CharacterStats, Skill, UserSkill
+from .models import CharacterStats, Skill, SkillPrerequisite, UserSkill
 
 @admin.register(CharacterStats)
 class CharacterStatsAdmin(admin.ModelAdmin):
@@ -33,9 +33,16 @@ class CharacterStatsAdmin(admin.ModelAdmin):
         }),
     )
 
+class SkillPrerequisiteInline(admin.TabularInline):
+    model = SkillPrerequisite
+    fk_name = 'skill'
+    extra = 0
+    autocomplete_fields = ['prerequisite']
+
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
     list_display = ['name', 'layer', 'tier', 'category', 'required_level', 'is_active']
+    inlines = [SkillPrerequisiteInline]
     list_filter = ['layer', 'tier', 'category', 'is_active', 'created_at']
     search_fields = ['name', 'description']
     
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class SkillsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'skills'
+
+    def ready(self):
+        from . import bitset
+        from .catalogue import skill_catalogue
+        from .eligibility import skill_requirement_index
+        from .graph import skill_graph
+        skill_catalogue.connect_signals()
+        skill_requirement_index.connect_signals()
+        skill_graph.connect_signals()
+        bitset.connect_signals()
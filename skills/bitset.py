@@ -0,0 +1,261 @@
+"""
+Freigeschaltete Skills eines Users als Bitmenge.
+
+Bit n ist gesetzt, wenn der Skill mit Skill.bit_index n aktiv freigeschaltet
+ist. Die Positionen sind dicht, werden beim Anlegen eines Skills einmal
+vergeben und nie wiederverwendet (SkillBitIndexCounter); Lücken in den
+Skill-IDs blähen die Bitmengen also nicht auf. Der SkillBitIndex übersetzt
+zwischen Skill-ID und Position und kommt aus dem gecachten Skill-Graphen.
+
+Die Bitmenge liegt als bytea in UserSkillBits. Bei jeder Änderung an
+UserSkill (post_save/post_delete) wird nur das Bit des betroffenen Skills
+gesetzt bzw. gelöscht; vollständig aus UserSkill neu berechnet wird nur, wenn
+die Zeile noch fehlt, sowie beim Backfill/Reparieren. UserSkill bleibt die
+Quelle der Wahrheit. QuerySet.update() und Raw-SQL auf UserSkill lösen keine
+Signals aus: danach sync_user_skill_bits aufrufen oder alle Bitmengen per
+"manage.py rebuild_skill_bits" neu aufbauen. Ebenso, wenn bei einem
+bestehenden UserSkill der Skill ausgetauscht wird.
+"""
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Skill, UserSkill, UserSkillBits
+
+SKILL_BITS_REBUILD_CHUNK_SIZE = 1000
+
+
+class SkillBitIndex:
+    """Zuordnung Skill-ID ↔ Bit-Position (Skill.bit_index)"""
+
+    __slots__ = ('positions', 'skill_ids')
+
+    def __init__(self, positions=None):
+        self.positions = positions or {}
+        self.skill_ids = {position: skill_id for skill_id, position in self.positions.items()}
+
+
+class SkillBitset:
+    """
+    Menge von Skill-IDs über einem Python-int. Die Bits sind Positionen
+    (Skill.bit_index); index übersetzt Skill-IDs beim Zugriff. Skills ohne
+    Position (z.B. per bulk_create angelegt) sind nie enthalten.
+    """
+
+    __slots__ = ('bits', 'index')
+
+    def __init__(self, bits=0, index=None):
+        self.bits = bits
+        self.index = index if index is not None else SkillBitIndex()
+
+    @classmethod
+    def from_positions(cls, positions, index=None):
+        bits = 0
+        for position in positions:
+            if position is not None:
+                bits |= 1 << position
+        return cls(bits, index)
+
+    @classmethod
+    def from_ids(cls, skill_ids, index):
+        return cls.from_positions((index.positions.get(skill_id) for skill_id in skill_ids), index)
+
+    @classmethod
+    def from_bytes(cls, data, index=None):
+        return cls(int.from_bytes(bytes(data or b''), 'little'), index)
+
+    def to_bytes(self):
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+
+    def __contains__(self, skill_id):
+        position = self.index.positions.get(skill_id)
+        return position is not None and (self.bits >> position) & 1 == 1
+
+    def __iter__(self):
+        bits = self.bits
+        skill_ids = self.index.skill_ids
+        while bits:
+            low = bits & -bits
+            skill_id = skill_ids.get(low.bit_length() - 1)
+            # Position eines inzwischen gelöschten Skills
+            if skill_id is not None:
+                yield skill_id
+            bits ^= low
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __eq__(self, other):
+        return isinstance(other, SkillBitset) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        return f"SkillBitset({sorted(self)})"
+
+    def __or__(self, other):
+        return SkillBitset(self.bits | other.bits, self.index)
+
+    def __and__(self, other):
+        return SkillBitset(self.bits & other.bits, self.index)
+
+    def __sub__(self, other):
+        return SkillBitset(self.bits & ~other.bits, self.index)
+
+    def issubset(self, other):
+        return self.bits & ~other.bits == 0
+
+    def add(self, skill_id):
+        position = self.index.positions.get(skill_id)
+        if position is not None:
+            self.bits |= 1 << position
+
+    def discard(self, skill_id):
+        position = self.index.positions.get(skill_id)
+        if position is not None:
+            self.bits &= ~(1 << position)
+
+
+def _active_positions(user_ids):
+    rows = (
+        UserSkill.objects.filter(user_id__in=user_ids, is_active=True)
+        .values_list('user_id', 'skill__bit_index')
+    )
+    positions = {user_id: [] for user_id in user_ids}
+    for user_id, position in rows:
+        positions[user_id].append(position)
+    return positions
+
+
+def load_user_skill_bits(user, index=None):
+    """
+    Bitmenge der aktiv freigeschalteten Skills eines Users (eine Query).
+    Fehlt die Zeile noch (vor dem Backfill), wird aus UserSkill gelesen.
+    index ist standardmäßig der des gecachten Skill-Graphen.
+    """
+    if index is None:
+        from .graph import skill_graph
+
+        index = skill_graph.get().bit_index
+    data = UserSkillBits.objects.filter(user_id=user.pk).values_list('bits', flat=True).first()
+    if data is None:
+        return SkillBitset.from_positions(_active_positions([user.pk])[user.pk], index)
+    return SkillBitset.from_bytes(data, index)
+
+
+def _upsert_bits(rows):
+    """rows: [(user_id, SkillBitset)] per INSERT ... ON CONFLICT DO UPDATE"""
+    if not rows:
+        return
+    table = connection.ops.quote_name(UserSkillBits._meta.db_table)
+    updated_at = UserSkillBits._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+    values = ", ".join(["(%s, %s, %s)"] * len(rows))
+    params = []
+    for user_id, bitset in rows:
+        params.extend([user_id, bitset.to_bytes(), updated_at])
+    sql = (
+        f"INSERT INTO {table} (user_id, bits, updated_at) VALUES {values} "
+        f"ON CONFLICT (user_id) DO UPDATE SET bits = EXCLUDED.bits, updated_at = EXCLUDED.updated_at"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _skill_positions(skill_ids):
+    """Bit-Positionen der Skills, aus dem gecachten Skill-Graphen oder der DB"""
+    from .graph import skill_graph
+
+    known = skill_graph.get().bit_index.positions
+    positions = {skill_id: known.get(skill_id) for skill_id in skill_ids}
+    missing = [skill_id for skill_id, position in positions.items() if position is None]
+    if missing:
+        # Positionen ändern sich nie, nur eben angelegte Skills fehlen im Graphen
+        positions.update(Skill.objects.filter(pk__in=missing).values_list('pk', 'bit_index'))
+    return [position for position in positions.values() if position is not None]
+
+
+def update_user_skill_bits(user_id, skill_ids, unlocked, create=True):
+    """
+    Setzt (unlocked=True) bzw. löscht die Bits der skill_ids in der Bitmenge
+    eines Users, ohne seine übrigen UserSkills zu lesen. Die Zeile wird dabei
+    gesperrt. Fehlt sie noch, wird sie einmalig per sync_user_skill_bits
+    vollständig berechnet; mit create=False bleibt sie dann aus.
+    """
+    mask = SkillBitset.from_positions(_skill_positions(skill_ids)).bits
+    with transaction.atomic():
+        row = UserSkillBits.objects.select_for_update().filter(user_id=user_id).first()
+        if row is None:
+            return sync_user_skill_bits(user_id) if create else None
+        bitset = SkillBitset.from_bytes(row.bits)
+        bitset.bits = bitset.bits | mask if unlocked else bitset.bits & ~mask
+        row.bits = bitset.to_bytes()
+        row.save(update_fields=['bits', 'updated_at'])
+    return bitset
+
+
+def sync_user_skill_bits(user_id, create=True):
+    """
+    Berechnet die Bitmenge eines Users aus allen UserSkills neu und speichert
+    sie (Reparatur, z.B. nach QuerySet.update()).
+    Die Zeile wird vorher gesperrt; parallele Syncs desselben Users laufen
+    nacheinander und sehen jeweils die UserSkills des anderen.
+    create=False aktualisiert nur eine vorhandene Zeile (beim Löschen, wenn
+    der User selbst gerade per Kaskade entfernt wird).
+    """
+    with transaction.atomic():
+        if create:
+            UserSkillBits.objects.bulk_create([UserSkillBits(user_id=user_id)], ignore_conflicts=True)
+        row = UserSkillBits.objects.select_for_update().filter(user_id=user_id).first()
+        if row is None:
+            return None
+        bitset = SkillBitset.from_positions(_active_positions([user_id])[user_id])
+        row.bits = bitset.to_bytes()
+        row.save(update_fields=['bits', 'updated_at'])
+    return bitset
+
+
+def rebuild_user_skill_bits(chunk_size=SKILL_BITS_REBUILD_CHUNK_SIZE, progress=None):
+    """
+    Baut UserSkillBits für alle User mit UserSkills neu auf und entfernt
+    Zeilen ohne aktive Skills. Gibt die Anzahl geschriebener Zeilen zurück.
+    """
+    UserSkillBits.objects.exclude(
+        user_id__in=UserSkill.objects.filter(is_active=True).values('user_id')
+    ).delete()
+
+    user_ids = (
+        UserSkill.objects.filter(is_active=True)
+        .order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    written = 0
+    last_id = None
+    while True:
+        chunk = user_ids if last_id is None else user_ids.filter(user_id__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        with transaction.atomic():
+            positions = _active_positions(chunk)
+            _upsert_bits([(user_id, SkillBitset.from_positions(positions[user_id])) for user_id in chunk])
+        written += len(chunk)
+        last_id = chunk[-1]
+        if progress:
+            progress(written)
+    return written
+
+
+def _on_user_skill_save(sender, instance, **kwargs):
+    update_user_skill_bits(instance.user_id, [instance.skill_id], instance.is_active)
+
+
+def _on_user_skill_delete(sender, instance, **kwargs):
+    update_user_skill_bits(instance.user_id, [instance.skill_id], False, create=False)
+
+
+def connect_signals():
+    post_save.connect(_on_user_skill_save, sender=UserSkill, dispatch_uid="user_skill_bits:save")
+    post_delete.connect(_on_user_skill_delete, sender=UserSkill, dispatch_uid="user_skill_bits:delete")
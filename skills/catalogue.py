@@ -0,0 +1,145 @@
+"""
+Vorserialisierter Skill-Katalog für die Listen- und Detail-Endpunkte.
+
+Der Katalog ändert sich nur, wenn Admins Skills bearbeiten. Er wird daher
+einmal pro Version gebaut (alle aktiven Skills in allen drei Darstellungen
+plus Indizes pro Filterfeld), im Django-Cache abgelegt und pro Prozess
+gehalten. Gefiltert wird im Speicher über die Indizes. Die Version dient
+zugleich als ETag, der Zeitpunkt der letzten Änderung als Last-Modified.
+
+Ist der Django-Cache nicht zwischen den Workern geteilt (kein REDIS_URL),
+sieht ein Prozess neue Versionen anderer Prozesse nicht. Spätestens nach
+PROVIDER_CACHE_TTL Sekunden baut er den Katalog daher neu und setzt eine neue
+Version, falls sich der Inhalt geändert hat. Mit geteiltem Cache genügt der
+Versions-Key, der Vergleich entfällt.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from seasons.providers import VersionedProvider, cache_is_shared
+from .models import Skill
+
+# Alte Snapshots laufen nach einem Tag aus dem Cache
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Felder, nach denen die Endpunkte filtern können
+CATALOGUE_INDEX_FIELDS = (
+    'layer', 'category', 'tier', 'skill_type', 'effect_type', 'buff_type', 'trigger_condition',
+)
+
+
+class SkillCatalogue:
+    """Unveränderlicher Snapshot aller aktiven Skills einer Katalog-Version"""
+
+    def __init__(self, version, last_modified, entries):
+        # entries: Liste von (skill_id, {darstellung: daten}, {feld: wert}) in Katalog-Reihenfolge
+        self.version = version
+        self.last_modified = last_modified
+        self.entries = entries
+        self.positions = {skill_id: position for position, (skill_id, _, _) in enumerate(entries)}
+        self.indexes = {field: {} for field in CATALOGUE_INDEX_FIELDS}
+        for position, (_, _, values) in enumerate(entries):
+            for field, value in values.items():
+                if value is not None and value != '':
+                    self.indexes[field].setdefault(str(value), []).append(position)
+
+    @classmethod
+    def build(cls, version, last_modified):
+        from .serializers import ActiveSkillSerializer, PassiveSkillSerializer, SkillSerializer
+
+        entries = []
+        for skill in Skill.objects.filter(is_active=True):
+            representations = {'full': dict(SkillSerializer(skill).data)}
+            if skill.skill_type == 'active':
+                representations['active'] = dict(ActiveSkillSerializer(skill).data)
+            elif skill.skill_type == 'passive':
+                representations['passive'] = dict(PassiveSkillSerializer(skill).data)
+            values = {field: getattr(skill, field) for field in CATALOGUE_INDEX_FIELDS}
+            entries.append((skill.pk, representations, values))
+        return cls(version, last_modified, entries)
+
+    def filter(self, representation='full', **criteria):
+        """
+        Skills in Katalog-Reihenfolge, die allen gesetzten Kriterien entsprechen.
+        Leere Kriterien werden ignoriert, Werte werden als String verglichen.
+        """
+        positions = None
+        for field, value in criteria.items():
+            if value in (None, ''):
+                continue
+            matches = self.indexes[field].get(str(value), ())
+            positions = set(matches) if positions is None else positions.intersection(matches)
+        if positions is None:
+            selected = self.entries
+        else:
+            selected = (self.entries[position] for position in sorted(positions))
+        return [entry[1][representation] for entry in selected if representation in entry[1]]
+
+    def get(self, skill_id, representation='full'):
+        position = self.positions.get(skill_id)
+        if position is None:
+            return None
+        return self.entries[position][1].get(representation)
+
+
+class SkillCatalogueProvider(VersionedProvider):
+    """
+    Hält den SkillCatalogue pro Prozess und im Django-Cache.
+
+    Der Versions-Key enthält (token, geändert_am). Prozesse, deren Snapshot
+    nicht zum Token passt, holen den Snapshot aus dem Cache oder bauen ihn
+    neu. Ohne geteilten Cache (shared=False) wird der Snapshot nach ttl
+    Sekunden zusätzlich mit einem Neuaufbau verglichen.
+    """
+
+    version_key = "skill_catalogue:version"
+    dispatch_uid = "skill_catalogue"
+    senders = (Skill,)
+
+    def __init__(self, ttl=None, shared=None):
+        super().__init__(ttl)
+        self.shared = cache_is_shared() if shared is None else shared
+        self._catalogue = None
+        self._checked_until = 0.0
+
+    def _snapshot_key(self, token):
+        return f"skill_catalogue:snapshot:{token}"
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, (uuid.uuid4().hex, timezone.now()), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self):
+        token, changed_at = self._current_version()
+        catalogue = self._catalogue
+        if catalogue is not None and catalogue.version == token:
+            if self.shared or time.monotonic() < self._checked_until:
+                return catalogue
+            if SkillCatalogue.build(token, changed_at).entries == catalogue.entries:
+                self._checked_until = time.monotonic() + self.ttl
+                return catalogue
+            # Änderung aus einem Prozess, dessen Version hier nicht ankam
+            self.invalidate()
+            token, changed_at = self._current_version()
+
+        catalogue = cache.get(self._snapshot_key(token))
+        if catalogue is None:
+            catalogue = SkillCatalogue.build(token, changed_at)
+            cache.set(self._snapshot_key(token), catalogue, SNAPSHOT_TIMEOUT)
+        self._catalogue = catalogue
+        self._checked_until = time.monotonic() + self.ttl
+        return catalogue
+
+    def invalidate(self):
+        self._catalogue = None
+        self._checked_until = 0.0
+        cache.set(self.version_key, (uuid.uuid4().hex, timezone.now()), None)
+
+
+skill_catalogue = SkillCatalogueProvider()
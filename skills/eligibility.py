@@ -0,0 +1,249 @@
+"""
+Mengenbasierte Prüfung der Skill-Voraussetzungen.
+
+Statt pro Skill die XP-Summen abzufragen und Stats nachzuladen, werden die
+Daten eines Users einmal in einen UserSkillContext geladen (XP-Summen je Typ
+aus UserXpTotals, CharacterStats, freigeschaltete Skills). Die Voraussetzungen
+jedes Skills liegen als SkillRequirement vor und werden im Speicher gegen
+diesen Kontext geprüft.
+
+Der SkillRequirementIndex sortiert alle Schwellen pro Stat, XP-Typ und Level,
+damit nach einem Stat-Gewinn nur die tatsächlich betroffenen Skills geprüft
+werden müssen.
+"""
+import sys
+from bisect import bisect_right
+
+from django.contrib.auth import get_user_model
+
+from seasons.providers import VersionedProvider
+from xp.services import get_xp_totals
+from .bitset import SkillBitIndex, SkillBitset, load_user_skill_bits
+from .graph import skill_graph
+from .models import CharacterStats, Skill
+
+# Obergrenze für Skill-IDs, damit (schwelle, _MAX_ID) hinter allen Einträgen einer Schwelle liegt
+_MAX_ID = sys.maxsize
+
+
+class SkillRequirement:
+    """Vorkompilierte Voraussetzungen eines Skills"""
+
+    __slots__ = ('skill_id', 'level', 'xp_type', 'xp_amount', 'stats', 'prerequisites', 'prerequisite_bits', 'unindexed')
+
+    def __init__(self, skill_id, level, xp_type, xp_amount, stats, prerequisites=None, bit_index=None):
+        self.skill_id = skill_id
+        self.level = level
+        self.xp_type = xp_type
+        self.xp_amount = xp_amount
+        self.stats = stats
+        # {skill_id: name} aller direkt und indirekt vorausgesetzten Skills
+        self.prerequisites = prerequisites or {}
+        bit_index = bit_index or SkillBitIndex()
+        self.prerequisite_bits = SkillBitset.from_ids(self.prerequisites, bit_index)
+        # Voraussetzungen ohne Bit-Position gelten als nicht freigeschaltet
+        self.unindexed = tuple(skill_id for skill_id in self.prerequisites if skill_id not in bit_index.positions)
+
+    @classmethod
+    def from_skill(cls, skill, graph=None):
+        needs_xp = bool(skill.required_xp_type) and skill.required_xp_amount > 0
+        graph = graph if graph is not None else skill_graph.get()
+        return cls(
+            skill_id=skill.pk,
+            level=skill.required_level,
+            xp_type=skill.required_xp_type if needs_xp else None,
+            xp_amount=skill.required_xp_amount if needs_xp else 0,
+            stats=tuple((skill.required_stats or {}).items()),
+            prerequisites=graph.prerequisites(skill.pk),
+            bit_index=graph.bit_index,
+        )
+
+    def check(self, context):
+        """
+        Gibt (erfüllt, Meldung) zurück.
+        Reihenfolge und Meldungen entsprechen Skill.check_requirements.
+        Vorausgesetzte Skills werden per Bit-Differenz gegen
+        context.unlocked_ids geprüft.
+        """
+        if context.level < self.level:
+            return False, f"Level {self.level} erforderlich (aktuell: {context.level})"
+
+        if self.xp_type and context.xp_total(self.xp_type) < self.xp_amount:
+            return False, f"{self.xp_amount} {self.xp_type} XP erforderlich"
+
+        if self.stats:
+            stats = context.stats
+            if stats is None:
+                return False, "Character Stats nicht gefunden"
+            for stat_name, required_value in self.stats:
+                current_value = stats.get_stat(stat_name)
+                if current_value < required_value:
+                    return False, f"{stat_name}: {required_value} erforderlich (aktuell: {current_value})"
+
+        if self.prerequisites:
+            missing = [*(self.prerequisite_bits - context.unlocked_ids), *self.unindexed]
+            if missing:
+                names = ", ".join(sorted(self.prerequisites[skill_id] for skill_id in missing))
+                return False, f"Vorausgesetzte Skills fehlen: {names}"
+
+        return True, "Alle Voraussetzungen erfüllt"
+
+
+class UserSkillContext:
+    """Alle für die Skill-Prüfung nötigen Daten eines Users, einmalig geladen"""
+
+    def __init__(self, level, xp_totals, stats, unlocked_ids):
+        self.level = level
+        self.xp_totals = xp_totals
+        self.stats = stats
+        self.unlocked_ids = unlocked_ids
+
+    def xp_total(self, xp_type):
+        return self.xp_totals.get(xp_type) or 0
+
+    @classmethod
+    def load(cls, user, xp_types=(), with_stats=True, with_unlocked=True, for_update=False):
+        """
+        Lädt den Kontext mit höchstens drei Queries:
+        XP-Summen der angefragten Typen aus UserXpTotals, CharacterStats
+        und die freigeschalteten Skills als SkillBitset aus UserSkillBits.
+        for_update sperrt User- und Stats-Zeile bis zum Ende der Transaktion
+        (eine Query mehr für das Level), parallele XP-Grants warten dann.
+        """
+        level = user.level
+        if for_update:
+            level = (
+                get_user_model().objects.select_for_update()
+                .values_list('level', flat=True).get(pk=user.pk)
+            )
+
+        xp_types = set(filter(None, xp_types))
+        xp_totals = get_xp_totals(user, xp_types) if xp_types else {}
+
+        stats = None
+        if with_stats:
+            if for_update:
+                stats = CharacterStats.objects.select_for_update().filter(user=user).first()
+            else:
+                try:
+                    stats = user.character_stats
+                except CharacterStats.DoesNotExist:
+                    stats = None
+
+        unlocked_ids = load_user_skill_bits(user) if with_unlocked else SkillBitset()
+        return cls(level, xp_totals, stats, unlocked_ids)
+
+
+def evaluate_skills(user, skills):
+    """
+    Prüft alle übergebenen Skills mit konstanter Query-Anzahl.
+    Gibt eine Liste von Dicts (skill, can_unlock, message, is_unlocked) zurück.
+    """
+    skills = list(skills)
+    graph = skill_graph.get()
+    requirements = [SkillRequirement.from_skill(skill, graph) for skill in skills]
+    context = UserSkillContext.load(
+        user,
+        xp_types=[requirement.xp_type for requirement in requirements],
+        with_stats=any(requirement.stats for requirement in requirements),
+    )
+
+    results = []
+    for skill, requirement in zip(skills, requirements):
+        can_unlock, message = requirement.check(context)
+        results.append({
+            'skill': skill,
+            'can_unlock': can_unlock,
+            'message': message,
+            'is_unlocked': skill.pk in context.unlocked_ids,
+        })
+    return results
+
+
+def _crossed(entries, old, new):
+    """Skill-IDs mit old < Schwelle <= new aus einer nach Schwelle sortierten Liste"""
+    if new <= old:
+        return []
+    start = bisect_right(entries, (old, _MAX_ID))
+    end = bisect_right(entries, (new, _MAX_ID))
+    return [skill_id for _, skill_id in entries[start:end]]
+
+
+class SkillRequirementIndex:
+    """
+    Kompilierte Voraussetzungen aller aktiven Skills.
+
+    Pro Stat, XP-Typ und für das Level liegt eine nach Schwelle sortierte
+    Liste (schwelle, skill_id). Welche Skills durch eine Änderung von old auf
+    new erreichbar werden, ergibt sich per Binärsuche in O(log S) pro Stat.
+    """
+
+    def __init__(self, requirements):
+        self.requirements = {requirement.skill_id: requirement for requirement in requirements}
+        self.level = sorted((requirement.level, requirement.skill_id) for requirement in requirements)
+        self.stats = {}
+        self.xp = {}
+        for requirement in requirements:
+            for stat_name, required_value in requirement.stats:
+                self.stats.setdefault(stat_name, []).append((required_value, requirement.skill_id))
+            if requirement.xp_type:
+                self.xp.setdefault(requirement.xp_type, []).append((requirement.xp_amount, requirement.skill_id))
+        for entries in (*self.stats.values(), *self.xp.values()):
+            entries.sort()
+
+    @classmethod
+    def build(cls):
+        graph = skill_graph.get()
+        return cls([SkillRequirement.from_skill(skill, graph) for skill in Skill.objects.filter(is_active=True)])
+
+    def candidates(self, stat_changes=None, level_change=None, xp_changes=None):
+        """
+        IDs der Skills, bei denen mindestens eine Schwelle überschritten wurde.
+        Änderungen jeweils als (alt, neu); stat_changes/xp_changes als Dict.
+        """
+        skill_ids = set()
+        for stat_name, (old, new) in (stat_changes or {}).items():
+            skill_ids.update(_crossed(self.stats.get(stat_name, ()), old, new))
+        for xp_type, (old, new) in (xp_changes or {}).items():
+            skill_ids.update(_crossed(self.xp.get(xp_type, ()), old, new))
+        if level_change:
+            skill_ids.update(_crossed(self.level, *level_change))
+        return skill_ids
+
+    def newly_unlockable(self, user, stat_changes=None, level_change=None, xp_changes=None, stats=None):
+        """
+        IDs der Skills, die durch die Änderung freischaltbar geworden und noch
+        nicht freigeschaltet sind. Nur die Kandidaten werden vollständig geprüft.
+        """
+        skill_ids = self.candidates(stat_changes, level_change, xp_changes)
+        if not skill_ids:
+            return []
+        requirements = [self.requirements[skill_id] for skill_id in skill_ids]
+        context = UserSkillContext.load(
+            user,
+            xp_types=[requirement.xp_type for requirement in requirements],
+            with_stats=stats is None,
+        )
+        if stats is not None:
+            context.stats = stats
+        return sorted(
+            requirement.skill_id for requirement in requirements
+            if requirement.skill_id not in context.unlocked_ids and requirement.check(context)[0]
+        )
+
+
+class SkillRequirementIndexProvider(VersionedProvider):
+    """
+    Prozessweiter SkillRequirementIndex, beim ersten Zugriff aufgebaut und
+    bei Änderungen an Skill verworfen.
+    """
+
+    version_key = "skill_requirement_index:version"
+    dispatch_uid = "skill_requirement_index"
+    senders = (Skill,)
+
+    def build(self):
+        return SkillRequirementIndex.build()
+
+
+skill_requirement_index = SkillRequirementIndexProvider()
@@ -0,0 +1,270 @@
+"""
+Skill-Baum: vorausgesetzte Skills als gerichteter azyklischer Graph.
+
+Die direkten Kanten liegen in SkillPrerequisite. Die transitive Hülle
+(SkillClosure) wird pro neuer Kante inkrementell ergänzt; eine topologische
+Sortierung liefert Position/Tiefe pro Skill (Skill.tree_order/tree_depth) und
+nach Löschungen die Hülle neu.
+Zur Laufzeit wird nur noch der gecachte SkillGraph gelesen: "alle
+Voraussetzungen freigeschaltet" ist eine Mengendifferenz zwischen den
+Vorfahren eines Skills und den freigeschalteten Skill-IDs des Users.
+"""
+import heapq
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from seasons.providers import VersionedProvider
+from .bitset import SkillBitIndex
+from .models import Skill, SkillClosure, SkillPrerequisite
+
+
+def topological_order(nodes, edges):
+    """
+    Kahn-Sortierung über (voraussetzung, skill)-Kanten.
+    Bei Gleichstand entscheidet die kleinere ID, die Reihenfolge ist stabil.
+    Gibt (reihenfolge, tiefe) zurück und wirft ValueError bei einem Zyklus.
+    """
+    children = {node: [] for node in nodes}
+    indegree = {node: 0 for node in nodes}
+    for parent, child in edges:
+        children[parent].append(child)
+        indegree[child] += 1
+
+    ready = [node for node, degree in indegree.items() if degree == 0]
+    heapq.heapify(ready)
+    depth = dict.fromkeys(nodes, 0)
+    order = []
+    while ready:
+        node = heapq.heappop(ready)
+        order.append(node)
+        for child in children[node]:
+            depth[child] = max(depth[child], depth[node] + 1)
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                heapq.heappush(ready, child)
+
+    if len(order) != len(indegree):
+        raise ValueError("Skill-Graph enthält einen Zyklus")
+    return order, depth
+
+
+def transitive_closure(order, edges):
+    """
+    {skill_id: {vorfahr_id: kürzeste distanz}} in einem Durchlauf über die
+    topologische Reihenfolge; Vorfahren sind immer schon berechnet.
+    """
+    parents = {}
+    for parent, child in edges:
+        parents.setdefault(child, []).append(parent)
+
+    closure = {}
+    for node in order:
+        ancestors = {}
+        for parent in parents.get(node, ()):
+            ancestors[parent] = 1
+            for ancestor, distance in closure[parent].items():
+                if distance + 1 < ancestors.get(ancestor, distance + 2):
+                    ancestors[ancestor] = distance + 1
+        closure[node] = ancestors
+    return closure
+
+
+def _update_tree_order(skills, edges):
+    """Setzt Skill.tree_order/tree_depth der übergebenen Skills; Rückgabe (reihenfolge, tiefe)"""
+    try:
+        order, depth = topological_order([skill.pk for skill in skills], edges)
+    except ValueError:
+        raise ValidationError("Diese Voraussetzung würde einen Zyklus im Skill-Baum erzeugen.")
+    positions = {skill_id: position for position, skill_id in enumerate(order)}
+    changed = []
+    for skill in skills:
+        if (skill.tree_order, skill.tree_depth) != (positions[skill.pk], depth[skill.pk]):
+            skill.tree_order = positions[skill.pk]
+            skill.tree_depth = depth[skill.pk]
+            changed.append(skill)
+    Skill.objects.bulk_update(changed, ['tree_order', 'tree_depth'])
+    return order, depth
+
+
+@transaction.atomic
+def update_tree_order():
+    """Berechnet nur Skill.tree_order/tree_depth neu, O(Skills + Kanten); die Closure bleibt"""
+    skills = list(Skill.objects.only('id', 'tree_order', 'tree_depth'))
+    edges = list(SkillPrerequisite.objects.values_list('prerequisite_id', 'skill_id'))
+    _update_tree_order(skills, edges)
+
+
+@transaction.atomic
+def rebuild_skill_graph():
+    """
+    Baut SkillClosure sowie Skill.tree_order/tree_depth aus SkillPrerequisite neu auf.
+    Gibt die Anzahl der Closure-Einträge zurück.
+    """
+    skills = list(Skill.objects.only('id', 'tree_order', 'tree_depth'))
+    edges = list(SkillPrerequisite.objects.values_list('prerequisite_id', 'skill_id'))
+    order, _ = _update_tree_order(skills, edges)
+    closure = transitive_closure(order, edges)
+
+    SkillClosure.objects.all().delete()
+    rows = [
+        SkillClosure(ancestor_id=ancestor, descendant_id=descendant, depth=distance)
+        for descendant, ancestors in closure.items()
+        for ancestor, distance in ancestors.items()
+    ]
+    SkillClosure.objects.bulk_create(rows)
+    return len(rows)
+
+
+def add_closure_edge(prerequisite_id, skill_id):
+    """
+    Ergänzt SkillClosure um die Kante prerequisite → skill: jeder Vorfahr von
+    prerequisite (inklusive selbst) wird Vorfahr jedes Nachfahren von skill
+    (inklusive selbst). Kostet O(Vorfahren × Nachfahren) statt eines
+    Neuaufbaus. Wirft ValidationError, wenn die Kante einen Zyklus schließt.
+    Gibt die Anzahl neuer Closure-Einträge zurück.
+    """
+    ancestors = dict(SkillClosure.objects.filter(descendant_id=prerequisite_id).values_list('ancestor_id', 'depth'))
+    ancestors[prerequisite_id] = 0
+    if skill_id in ancestors:
+        raise ValidationError("Diese Voraussetzung würde einen Zyklus im Skill-Baum erzeugen.")
+    descendants = dict(SkillClosure.objects.filter(ancestor_id=skill_id).values_list('descendant_id', 'depth'))
+    descendants[skill_id] = 0
+
+    existing = {
+        (row.ancestor_id, row.descendant_id): row
+        for row in SkillClosure.objects.filter(ancestor_id__in=list(ancestors), descendant_id__in=list(descendants))
+    }
+    created, changed = [], []
+    for ancestor, up in ancestors.items():
+        for descendant, down in descendants.items():
+            distance = up + 1 + down
+            row = existing.get((ancestor, descendant))
+            if row is None:
+                created.append(SkillClosure(ancestor_id=ancestor, descendant_id=descendant, depth=distance))
+            elif distance < row.depth:
+                row.depth = distance
+                changed.append(row)
+    SkillClosure.objects.bulk_create(created)
+    SkillClosure.objects.bulk_update(changed, ['depth'])
+    return len(created)
+
+
+class SkillGraph:
+    """Unveränderlicher Snapshot des Skill-Baums"""
+
+    def __init__(self, names, order, parents, ancestors, bit_index=None):
+        self.names = names
+        self.order = order
+        self.positions = {skill_id: position for position, skill_id in enumerate(order)}
+        self.parents = parents
+        self.ancestors = ancestors
+        self.bit_index = bit_index if bit_index is not None else SkillBitIndex()
+
+    @classmethod
+    def build(cls):
+        names = {}
+        order = []
+        positions = {}
+        for skill_id, name, position in Skill.objects.order_by('tree_order', 'id').values_list('id', 'name', 'bit_index'):
+            names[skill_id] = name
+            order.append(skill_id)
+            if position is not None:
+                positions[skill_id] = position
+        parents = {}
+        for skill_id, prerequisite_id in SkillPrerequisite.objects.values_list('skill_id', 'prerequisite_id'):
+            parents.setdefault(skill_id, []).append(prerequisite_id)
+        ancestors = {}
+        # Deaktivierte Skills sperren den Baum nicht
+        closure = SkillClosure.objects.filter(ancestor__is_active=True)
+        for descendant_id, ancestor_id in closure.values_list('descendant_id', 'ancestor_id'):
+            ancestors.setdefault(descendant_id, set()).add(ancestor_id)
+        return cls(
+            names,
+            order,
+            {skill_id: tuple(sorted(ids)) for skill_id, ids in parents.items()},
+            {skill_id: frozenset(ids) for skill_id, ids in ancestors.items()},
+            SkillBitIndex(positions),
+        )
+
+    def prerequisites(self, skill_id):
+        """Alle direkt und indirekt vorausgesetzten Skills als {id: name}"""
+        return {ancestor: self.names[ancestor] for ancestor in self.ancestors.get(skill_id, ())}
+
+    def missing(self, skill_id, unlocked_ids):
+        """Vorausgesetzte Skill-IDs, die in unlocked_ids fehlen"""
+        return {ancestor for ancestor in self.ancestors.get(skill_id, ()) if ancestor not in unlocked_ids}
+
+    def sort(self, skill_ids):
+        """Skill-IDs in topologischer Reihenfolge (Voraussetzungen zuerst)"""
+        return sorted(skill_ids, key=lambda skill_id: self.positions.get(skill_id, len(self.order)))
+
+
+class SkillGraphProvider(VersionedProvider):
+    """
+    Prozessweiter SkillGraph mit Versions-Key im Django-Cache.
+    Neue Kanten ergänzen die Closure sofort (add_closure_edge). Reihenfolge
+    und Tiefe bzw. nach Löschungen die ganze Closure werden einmal pro
+    Transaktion nach dem Commit neu berechnet; Bulk-Änderungen im Admin
+    kosten so einen Neuaufbau statt einen pro Kante. Jede Änderung verwirft
+    den Graphen sowie den Voraussetzungs-Index.
+    """
+
+    version_key = "skill_graph:version"
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self._pending = None  # None, 'order' oder 'full'
+
+    def build(self):
+        return SkillGraph.build()
+
+    def _invalidate_all(self):
+        from .eligibility import skill_requirement_index
+
+        for provider in (self, skill_requirement_index):
+            provider.invalidate_on_commit()
+
+    def _schedule(self, kind):
+        """Fasst alle Änderungen einer Transaktion zu einem Neuaufbau nach dem Commit zusammen"""
+        if self._pending != 'full':
+            self._pending = kind
+        self._invalidate_all()
+        # Bei jeder Änderung registrieren: nach einem Rollback holt der nächste Commit nach
+        transaction.on_commit(self._run_pending)
+
+    def _run_pending(self):
+        kind, self._pending = self._pending, None
+        if kind is None:
+            return
+        if kind == 'full':
+            rebuild_skill_graph()
+        else:
+            update_tree_order()
+        self._invalidate_all()
+
+    def _on_prerequisite_save(self, sender, instance, created, **kwargs):
+        # Sofort ergänzen: clean() weiterer Kanten derselben Transaktion prüft gegen die Closure
+        add_closure_edge(instance.prerequisite_id, instance.skill_id)
+        # Eine geänderte Kante hinterlässt Einträge des alten Pfads
+        self._schedule('order' if created else 'full')
+
+    def _on_delete(self, sender, **kwargs):
+        # Einträge können über andere Pfade weiter gelten, lokal nicht entfernbar.
+        # Bis zum Neuaufbau ist die Closure höchstens zu groß, Zyklen werden
+        # dann eher zu streng abgewiesen.
+        self._schedule('full')
+
+    def _on_skill_save(self, sender, **kwargs):
+        # Neue Skills haben keine Kanten, nur Namen und Knotenmenge ändern sich
+        self._invalidate_all()
+
+    def connect_signals(self):
+        post_save.connect(self._on_prerequisite_save, sender=SkillPrerequisite, dispatch_uid="skill_graph:save")
+        post_delete.connect(self._on_delete, sender=SkillPrerequisite, dispatch_uid="skill_graph:delete")
+        post_save.connect(self._on_skill_save, sender=Skill, dispatch_uid="skill_graph:skill_save")
+        post_delete.connect(self._on_delete, sender=Skill, dispatch_uid="skill_graph:skill_delete")
+
+
+skill_graph = SkillGraphProvider()
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from skills.models import CharacterStats
+from skills.services import XP_TO_STATS_MAPPING, apply_stat_gains, calculate_stat_gain_millis
+
+
+def legacy_update_character_stats(user, xp_amount, xp_type):
+    """Ursprüngliche Implementierung: get_or_create, setattr-Schleife, volles save()"""
+    stats, _ = CharacterStats.objects.get_or_create(user=user)
+    for stat_name, multiplier in XP_TO_STATS_MAPPING.get(xp_type, {}).items():
+        gain = int(xp_amount * 0.1 * multiplier)
+        if hasattr(stats, stat_name):
+            setattr(stats, stat_name, min(100, getattr(stats, stat_name) + gain))
+    stats.save()
+    return stats
+
+
+def _is_write(sql):
+    return sql.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+
+
+class Command(BaseCommand):
+    help = "Vergleicht Queries und Schreibzugriffe pro XP-Grant beim Stat-Update (alt vs. Upsert). Ändert keine Daten."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grants', type=int, default=200, help='Grants pro Szenario')
+
+    def handle(self, *args, **options):
+        grants = options['grants']
+        # (Beschreibung, XP pro Grant); 0 XP ergibt keinen Gewinn, bei 5 XP rundet
+        # die alte Implementierung auf 0 Punkte ab, der Upsert spart den Rest an
+        scenarios = [('Grant ohne Stat-Gewinn (0 XP)', 0), ('Kleiner Grant (5 XP)', 5), ('Grant mit Stat-Gewinn (100 XP)', 100)]
+
+        self.stdout.write(f"{grants} Physical-Grants pro Szenario\n")
+        for label, xp_amount in scenarios:
+            self.stdout.write(label)
+            for name, update in (
+                ('alt   ', legacy_update_character_stats),
+                ('upsert', lambda user, amount, xp_type: apply_stat_gains(user, calculate_stat_gain_millis(amount, xp_type))),
+            ):
+                queries, writes, elapsed = self._measure(update, xp_amount, grants)
+                self.stdout.write(
+                    f"  {name}: {queries / grants:.1f} Queries, {writes / grants:.1f} Writes pro Grant, "
+                    f"{elapsed / grants * 1e6:.0f} µs pro Grant"
+                )
+
+    def _measure(self, update, xp_amount, grants):
+        User = get_user_model()
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark_stat_updates')
+            update(user, 100, 'Physical')  # Zeile anlegen, gemessen wird der Normalfall
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                for _ in range(grants):
+                    update(user, xp_amount, 'Physical')
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        writes = sum(1 for query in captured.captured_queries if _is_write(query['sql']))
+        return len(captured.captured_queries), writes, elapsed
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from skills.bitset import SKILL_BITS_REBUILD_CHUNK_SIZE, rebuild_user_skill_bits
+
+
+class Command(BaseCommand):
+    help = "Baut die Bitmengen freigeschalteter Skills (UserSkillBits) aus UserSkill neu auf."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=SKILL_BITS_REBUILD_CHUNK_SIZE, help='User pro Transaktion')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_user_skill_bits(
+            chunk_size=options['chunk_size'],
+            progress=lambda written: self.stdout.write(f"{written} User verarbeitet"),
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ Skill-Bits für {written} User neu aufgebaut ({elapsed:.2f}s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from skills.eligibility import skill_requirement_index
+from skills.graph import rebuild_skill_graph, skill_graph
+
+
+class Command(BaseCommand):
+    help = "Baut transitive Hülle (SkillClosure) und topologische Reihenfolge des Skill-Baums neu auf."
+
+    def handle(self, *args, **options):
+        rows = rebuild_skill_graph()
+        skill_graph.invalidate()
+        skill_requirement_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"✅ Skill-Baum neu aufgebaut ({rows} Closure-Einträge)"))
@@ -0,0 +1,88 @@
+# Generated by Django 5.2 on 2026-10-18 06:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0003_alter_skill_damage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='characterstats',
+            name='agility_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='charisma_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='combat_skill_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='cyber_awareness_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='endurance_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='focus_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='hacking_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='intelligence_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='intuition_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='memory_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='programming_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='reaction_time_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='strength_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='tactical_awareness_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='characterstats',
+            name='willpower_remainder',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
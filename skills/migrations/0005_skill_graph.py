@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 06:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0004_characterstats_remainders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='tree_depth',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Längste Kette vorausgesetzter Skills'),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='tree_order',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Topologische Position im Skill-Baum'),
+        ),
+        migrations.CreateModel(
+            name='SkillClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='skills.skill')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='skills.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant'], name='skill_closure_desc_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SkillPrerequisite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('prerequisite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependent_links', to='skills.skill')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_links', to='skills.skill')),
+            ],
+            options={
+                'unique_together': {('skill', 'prerequisite')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 06:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0005_skill_graph'),
+        ('users', '0007_user_avatar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSkillBits',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='skill_bits', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('bits', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
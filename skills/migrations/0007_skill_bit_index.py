@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+def assign_bit_indexes(apps, schema_editor):
+    """Vergibt die Positionen in ID-Reihenfolge; alte Bitmengen (Bit = Skill-ID) verwerfen"""
+    Skill = apps.get_model('skills', 'Skill')
+    SkillBitIndexCounter = apps.get_model('skills', 'SkillBitIndexCounter')
+    UserSkillBits = apps.get_model('skills', 'UserSkillBits')
+    skills = list(Skill.objects.order_by('id').only('id'))
+    for index, skill in enumerate(skills):
+        skill.bit_index = index
+    Skill.objects.bulk_update(skills, ['bit_index'], batch_size=1000)
+    SkillBitIndexCounter.objects.update_or_create(pk=1, defaults={'next_index': len(skills)})
+    # Bis zum nächsten rebuild_skill_bits wird aus UserSkill gelesen
+    UserSkillBits.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0006_userskillbits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillBitIndexCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_index', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='bit_index',
+            field=models.PositiveIntegerField(editable=False, help_text='Position in der Skill-Bitmenge', null=True, unique=True),
+        ),
+        migrations.RunPython(assign_bit_indexes, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -74,6 +74,24 @@ TRIGGER_CONDITION_CHOICES = [
     ('on_combo', 'On Combo'),
 ]
 
+# Alle Stat-Felder von CharacterStats nach Kategorie
+STAT_CATEGORY_FIELDS = {
+    'Body': ['strength', 'endurance', 'agility'],
+    'Mind': ['intelligence', 'focus', 'memory'],
+    'Spirit': ['willpower', 'charisma', 'intuition'],
+    'Combat': ['combat_skill', 'reaction_time', 'tactical_awareness'],
+    'Tech': ['hacking', 'programming', 'cyber_awareness'],
+}
+STAT_FIELDS = [stat for stats in STAT_CATEGORY_FIELDS.values() for stat in stats]
+
+# Wertebereich eines Stats
+STAT_MIN = 1
+STAT_MAX = 100
+
+# Stat-Gewinne werden in Tausendstel-Punkten gerechnet; der Rest unter einem
+# ganzen Punkt wird pro Stat in <stat>_remainder mitgeführt
+STAT_FRACTION_SCALE = 1000
+
 class CharacterStats(models.Model):
     """
     Charakter-Statistiken für jeden User.
@@ -110,6 +128,23 @@ class CharacterStats(models.Model):
     programming = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(100)])
     cyber_awareness = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(100)])
     
+    # Angesparte Bruchteile (Tausendstel) je Stat, siehe STAT_FRACTION_SCALE
+    strength_remainder = models.PositiveSmallIntegerField(default=0)
+    endurance_remainder = models.PositiveSmallIntegerField(default=0)
+    agility_remainder = models.PositiveSmallIntegerField(default=0)
+    intelligence_remainder = models.PositiveSmallIntegerField(default=0)
+    focus_remainder = models.PositiveSmallIntegerField(default=0)
+    memory_remainder = models.PositiveSmallIntegerField(default=0)
+    willpower_remainder = models.PositiveSmallIntegerField(default=0)
+    charisma_remainder = models.PositiveSmallIntegerField(default=0)
+    intuition_remainder = models.PositiveSmallIntegerField(default=0)
+    combat_skill_remainder = models.PositiveSmallIntegerField(default=0)
+    reaction_time_remainder = models.PositiveSmallIntegerField(default=0)
+    tactical_awareness_remainder = models.PositiveSmallIntegerField(default=0)
+    hacking_remainder = models.PositiveSmallIntegerField(default=0)
+    programming_remainder = models.PositiveSmallIntegerField(default=0)
+    cyber_awareness_remainder = models.PositiveSmallIntegerField(default=0)
+    
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -125,14 +160,7 @@ class CharacterStats(models.Model):
     
     def get_category_stats(self, category):
         """Gibt alle Stats einer Kategorie zurück"""
-        category_mapping = {
-            'Body': ['strength', 'endurance', 'agility'],
-            'Mind': ['intelligence', 'focus', 'memory'],
-            'Spirit': ['willpower', 'charisma', 'intuition'],
-            'Combat': ['combat_skill', 'reaction_time', 'tactical_awareness'],
-            'Tech': ['hacking', 'programming', 'cyber_awareness'],
-        }
-        stats = category_mapping.get(category, [])
+        stats = STAT_CATEGORY_FIELDS.get(category, [])
         return {stat: self.get_stat(stat) for stat in stats}
     
     def get_all_stats(self):
@@ -244,12 +272,26 @@ class Skill(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Vorberechnet aus dem Skill-Graph (siehe skills.graph.rebuild_skill_graph)
+    tree_order = models.PositiveIntegerField(default=0, editable=False, help_text="Topologische Position im Skill-Baum")
+    tree_depth = models.PositiveIntegerField(default=0, editable=False, help_text="Längste Kette vorausgesetzter Skills")
+    
+    # Dichte Bit-Position in UserSkillBits, einmal vergeben und nie wiederverwendet
+    bit_index = models.PositiveIntegerField(unique=True, null=True, editable=False, help_text="Position in der Skill-Bitmenge")
+    
     class Meta:
         ordering = ['skill_type', 'tier', 'name']
     
     def __str__(self):
         return f"{self.name} ({self.get_skill_type_display()}, {self.layer})"
     
+    def save(self, *args, **kwargs):
+        if self.bit_index is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            self.bit_index = SkillBitIndexCounter.allocate()
+            super().save(*args, **kwargs)
+    
     def clean(self):
         """Validiert die Skill-Konfiguration basierend auf dem Skill-Typ"""
         from django.core.exceptions import ValidationError
@@ -301,31 +343,38 @@ class Skill(models.Model):
         """
         Prüft, ob ein User die Voraussetzungen für diesen Skill erfüllt.
         """
-        # Level-Check
-        if user.level < self.required_level:
-            return False, f"Level {self.required_level} erforderlich (aktuell: {user.level})"
+        from .eligibility import SkillRequirement, UserSkillContext
         
-        # XP-Typ-Check
-        if self.required_xp_type and self.required_xp_amount > 0:
-            total_xp_in_type = user.xp_events.filter(
-                source__startswith=self.required_xp_type.lower()
-            ).aggregate(total=models.Sum('amount'))['total'] or 0
-            
-            if total_xp_in_type < self.required_xp_amount:
-                return False, f"{self.required_xp_amount} {self.required_xp_type} XP erforderlich"
-        
-        # Stat-Check
-        if self.required_stats:
-            try:
-                stats = user.character_stats
-                for stat_name, required_value in self.required_stats.items():
-                    current_value = stats.get_stat(stat_name)
-                    if current_value < required_value:
-                        return False, f"{stat_name}: {required_value} erforderlich (aktuell: {current_value})"
-            except CharacterStats.DoesNotExist:
-                return False, "Character Stats nicht gefunden"
-        
-        return True, "Alle Voraussetzungen erfüllt"
+        requirement = SkillRequirement.from_skill(self)
+        context = UserSkillContext.load(
+            user,
+            xp_types=[requirement.xp_type],
+            with_stats=bool(requirement.stats),
+            with_unlocked=bool(requirement.prerequisites),
+        )
+        return requirement.check(context)
+
+class SkillBitIndexCounter(models.Model):
+    """
+    Nächste freie Skill.bit_index (eine Zeile). Positionen gelöschter Skills
+    werden nicht erneut vergeben; die Bitmengen bleiben so durch die Zahl der
+    je angelegten Skills begrenzt, unabhängig von Lücken in den Skill-IDs.
+    """
+    next_index = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Nächste Skill-Bit-Position: {self.next_index}"
+    
+    @classmethod
+    def allocate(cls):
+        """Vergibt die nächste Position; parallele Aufrufe warten auf die Zeilensperre"""
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+            counter = cls.objects.select_for_update().get(pk=1)
+            index = counter.next_index
+            counter.next_index = index + 1
+            counter.save(update_fields=['next_index'])
+        return index
 
 class UserSkill(models.Model):
     """
@@ -351,3 +400,91 @@ class UserSkill(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.skill.name}"
+
+class UserSkillBits(models.Model):
+    """
+    Aktiv freigeschaltete Skills eines Users als Bitmenge (Bit n = Skill.bit_index n).
+    Abgeleitet aus UserSkill, siehe skills.bitset.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='skill_bits'
+    )
+    bits = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - Skill-Bits"
+
+class SkillPrerequisite(models.Model):
+    """
+    Kante im Skill-Baum: prerequisite muss freigeschaltet sein, bevor skill
+    freigeschaltet werden kann. Zyklen werden beim Speichern abgewiesen;
+    INSERT und Ergänzung der Closure (post_save) laufen in einer Transaktion.
+    """
+    skill = models.ForeignKey(
+        Skill,
+        on_delete=models.CASCADE,
+        related_name='prerequisite_links'
+    )
+    prerequisite = models.ForeignKey(
+        Skill,
+        on_delete=models.CASCADE,
+        related_name='dependent_links'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['skill', 'prerequisite']
+    
+    def __str__(self):
+        return f"{self.prerequisite.name} → {self.skill.name}"
+    
+    def clean(self):
+        """Weist Kanten ab, die einen Zyklus erzeugen würden"""
+        from django.core.exceptions import ValidationError
+        
+        if self.skill_id == self.prerequisite_id:
+            raise ValidationError("Ein Skill kann nicht sich selbst voraussetzen.")
+        # Zyklus, wenn skill bereits (transitiv) Voraussetzung von prerequisite ist
+        if SkillClosure.objects.filter(ancestor_id=self.skill_id, descendant_id=self.prerequisite_id).exists():
+            raise ValidationError("Diese Voraussetzung würde einen Zyklus im Skill-Baum erzeugen.")
+    
+    @classmethod
+    def lock_graph(cls):
+        """
+        Serialisiert Änderungen am Skill-Graphen bis zum Ende der Transaktion.
+        Zwei parallele Kanten, die erst zusammen einen Zyklus bilden, werden so
+        nacheinander gegen die jeweils aktuelle Closure geprüft. Lesende Zugriffe
+        bleiben möglich; SQLite serialisiert Schreibzugriffe ohnehin.
+        """
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.lock_graph()
+            self.clean()
+            super().save(*args, **kwargs)
+
+class SkillClosure(models.Model):
+    """
+    Transitive Hülle des Skill-Graphen: ancestor ist direkt oder indirekt
+    Voraussetzung von descendant, depth ist die kürzeste Distanz.
+    Neue Kanten werden inkrementell ergänzt, nach Löschungen wird sie neu
+    aufgebaut (siehe skills.graph).
+    """
+    ancestor = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    descendant = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    depth = models.PositiveIntegerField()
+    
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+        indexes = [models.Index(fields=['descendant'], name='skill_closure_desc_idx')]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} → {self.descendant_id} ({self.depth})"
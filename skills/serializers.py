@@ -97,9 +97,23 @@ class AvailableSkillSerializer(serializers.Serializer):
     message = serializers.CharField()
     is_unlocked = serializers.BooleanField()
 
+class SkillTreeNodeSerializer(AvailableSkillSerializer):
+    """Serializer für einen Knoten im Skill-Baum"""
+    depth = serializers.IntegerField()
+    prerequisites = serializers.ListField(child=serializers.IntegerField())
+
 class UnlockSkillSerializer(serializers.Serializer):
     """Serializer für Skill-Freischaltung"""
-    skill_id = serializers.IntegerField(help_text="ID des freizuschaltenden Skills")
+    skill_id = serializers.IntegerField(required=False, help_text="ID des freizuschaltenden Skills")
+    skill_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=100,
+        help_text="IDs mehrerer freizuschaltender Skills"
+    )
+
+    def validate(self, attrs):
+        if 'skill_id' not in attrs and 'skill_ids' not in attrs:
+            raise serializers.ValidationError("skill_id oder skill_ids erforderlich")
+        return attrs
 
 class StatsOverviewSerializer(serializers.Serializer):
     """Serializer für Stats-Übersicht"""
@@ -1,6 +1,10 @@
-from django.db import transaction
-from django.db.models import Sum
-from .models import CharacterStats, Skill, UserSkill
+from django.db import connection, transaction
+from django.utils import timezone
+from .bitset import update_user_skill_bits
+from .eligibility import SkillRequirement, UserSkillContext, evaluate_skills, skill_requirement_index
+from .graph import skill_graph
+from .models import CharacterStats, Skill, UserSkill, STAT_FIELDS, STAT_FRACTION_SCALE, STAT_MIN, STAT_MAX
+from .signals import skills_unlockable, skills_unlocked
 
 # XP-Typ zu Stat-Mapping
 XP_TO_STATS_MAPPING = {
@@ -37,6 +41,8 @@ def get_or_create_character_stats(user):
 def calculate_stat_gain(xp_amount, xp_type):
     """
     Berechnet Stat-Gewinn basierend auf XP-Menge und XP-Typ.
+    Ergebnis in ganzen Stat-Punkten (abgerundet); die Stat-Updates rechnen
+    mit calculate_stat_gain_millis.
     """
     if xp_type not in XP_TO_STATS_MAPPING:
         return {}
@@ -52,23 +58,150 @@ def calculate_stat_gain(xp_amount, xp_type):
     
     return stat_gains
 
-@transaction.atomic
+def calculate_stat_gain_millis(xp_amount, xp_type):
+    """
+    Wie calculate_stat_gain, aber in Tausendstel-Punkten (STAT_FRACTION_SCALE),
+    damit auch kleine Grants nicht auf 0 abgerundet werden.
+    """
+    mapping = XP_TO_STATS_MAPPING.get(xp_type, {})
+    base_stat_gain = xp_amount * 0.1
+    return {
+        stat_name: round(base_stat_gain * multiplier * STAT_FRACTION_SCALE)
+        for stat_name, multiplier in mapping.items()
+    }
+
 def update_character_stats_from_xp(user, xp_amount, xp_type):
     """
     Aktualisiert CharacterStats basierend auf neuem XP.
+    Gibt die neuen Werte der geänderten Stats zurück (leer, wenn kein Gewinn).
     """
-    stats = get_or_create_character_stats(user)
-    stat_gains = calculate_stat_gain(xp_amount, xp_type)
-    
-    # Stats erhöhen (mit Max-Wert von 100)
-    for stat_name, gain in stat_gains.items():
-        if hasattr(stats, stat_name):
-            current_value = getattr(stats, stat_name)
-            new_value = min(100, current_value + gain)
-            setattr(stats, stat_name, new_value)
-    
-    stats.save()
-    return stats
+    stat_gains = calculate_stat_gain_millis(xp_amount, xp_type)
+    return apply_stat_gains(user, stat_gains)
+
+def update_character_stats_from_xp_batch(user, xp_entries):
+    """
+    Aktualisiert CharacterStats für mehrere XP-Einträge mit einem einzigen Upsert.
+    xp_entries: Iterable aus (xp_amount, xp_type)-Tupeln.
+    Die Gewinne werden pro Eintrag berechnet, damit das Ergebnis dem
+    einzelnen Aufruf von update_character_stats_from_xp entspricht.
+    """
+    stat_gains = {}
+    for xp_amount, xp_type in xp_entries:
+        for stat_name, gain in calculate_stat_gain_millis(xp_amount, xp_type).items():
+            stat_gains[stat_name] = stat_gains.get(stat_name, 0) + gain
+    return apply_stat_gains(user, stat_gains)
+
+def _carry(value, remainder, gain):
+    """
+    Addiert einen Gewinn in Tausendstel auf (Punkte, Rest).
+    Begrenzt auf STAT_MIN bis STAT_MAX; am Maximum verfällt der Rest.
+    """
+    total = max(value * STAT_FRACTION_SCALE + remainder + gain, STAT_MIN * STAT_FRACTION_SCALE)
+    if total >= STAT_MAX * STAT_FRACTION_SCALE:
+        return STAT_MAX, 0
+    return total // STAT_FRACTION_SCALE, total % STAT_FRACTION_SCALE
+
+def _stat_upsert_sql(stat_names):
+    """
+    INSERT ... ON CONFLICT DO UPDATE für die betroffenen Stat-Spalten samt Rest,
+    in SQL dieselbe Rechnung wie _carry. Neue Zeilen starten bei den
+    Feld-Defaults; RETURNING liefert die neuen Werte und Reste.
+    """
+    quote = connection.ops.quote_name
+    table = quote(CharacterStats._meta.db_table)
+    # SQLite kennt GREATEST/LEAST nicht, dort übernehmen die skalaren MAX()/MIN()
+    greatest, least = ('GREATEST', 'LEAST') if connection.vendor == 'postgresql' else ('MAX', 'MIN')
+    scale = STAT_FRACTION_SCALE
+
+    columns = [quote(name) for name in STAT_FIELDS] + [quote(f'{name}_remainder') for name in STAT_FIELDS]
+    assignments = []
+    for name in stat_names:
+        value, remainder = quote(name), quote(f'{name}_remainder')
+        total = f"{greatest}({table}.{value} * {scale} + {table}.{remainder} + %s, {STAT_MIN * scale})"
+        assignments.append(f"{value} = {least}({total} / {scale}, {STAT_MAX})")
+        assignments.append(
+            f"{remainder} = CASE WHEN {total} >= {STAT_MAX * scale} THEN 0 ELSE {total} %% {scale} END"
+        )
+    returning = [quote(name) for name in stat_names] + [quote(f'{name}_remainder') for name in stat_names]
+    return (
+        f"INSERT INTO {table} (user_id, {', '.join(columns)}, updated_at) "
+        f"VALUES (%s, {', '.join(['%s'] * len(columns))}, %s) "
+        f"ON CONFLICT (user_id) DO UPDATE SET {', '.join(assignments)}, updated_at = EXCLUDED.updated_at "
+        f"RETURNING {', '.join(returning)}"
+    )
+
+def apply_stat_gains(user, stat_gains):
+    """
+    Addiert Stat-Gewinne (in Tausendstel) atomar auf die CharacterStats eines Users.
+    Bruchteile unter einem Punkt werden pro Stat als Rest mitgeführt, viele
+    kleine Grants ergeben daher dieselben Stats wie ein aggregierter.
+    Ohne Gewinn wird nichts geschrieben. Sonst legt ein einziges
+    INSERT ... ON CONFLICT DO UPDATE die Zeile bei Bedarf an und setzt nur die
+    betroffenen Spalten.
+    Gibt die neuen Werte der geänderten Stats als Dict zurück.
+    """
+    gains = {
+        stat_name: gain
+        for stat_name, gain in stat_gains.items()
+        if stat_name in STAT_FIELDS and gain
+    }
+    if not gains:
+        return {}
+
+    stat_names = sorted(gains)
+    inserted_values = []
+    inserted_remainders = []
+    for name in STAT_FIELDS:
+        value = CharacterStats._meta.get_field(name).get_default()
+        remainder = 0
+        if name in gains:
+            value, remainder = _carry(value, remainder, gains[name])
+        inserted_values.append(value)
+        inserted_remainders.append(remainder)
+    # Pro Stat steht der Gewinn einmal in der Wert- und zweimal in der Rest-Zuweisung
+    update_params = [gain for name in stat_names for gain in (gains[name],) * 3]
+    params = [user.pk, *inserted_values, *inserted_remainders, timezone.now(), *update_params]
+    with connection.cursor() as cursor:
+        cursor.execute(_stat_upsert_sql(stat_names), params)
+        row = cursor.fetchone()
+    new_values = dict(zip(stat_names, row[:len(stat_names)]))
+    new_remainders = dict(zip(stat_names, row[len(stat_names):]))
+
+    # Bereits am User gecachte Stats nachziehen, damit Folgeprüfungen aktuelle Werte sehen
+    cached = None
+    if type(user).character_stats.is_cached(user):
+        try:
+            cached = user.character_stats
+        except CharacterStats.DoesNotExist:
+            cached = None
+    if cached is not None:
+        for stat_name in stat_names:
+            setattr(cached, stat_name, new_values[stat_name])
+            setattr(cached, f'{stat_name}_remainder', new_remainders[stat_name])
+
+    # Alte Werte aus neuem Stand und Gewinn; am Maximum ist das eine untere
+    # Schranke, eine dort liegende Schwelle kann erneut gemeldet werden
+    stat_changes = {}
+    for stat_name in stat_names:
+        new_total = new_values[stat_name] * STAT_FRACTION_SCALE + new_remainders[stat_name]
+        old_total = max(new_total - gains[stat_name], STAT_MIN * STAT_FRACTION_SCALE)
+        stat_changes[stat_name] = (old_total // STAT_FRACTION_SCALE, new_values[stat_name])
+    notify_unlockable_skills(user, stat_changes)
+    return new_values
+
+def notify_unlockable_skills(user, stat_changes):
+    """
+    Sucht per SkillRequirementIndex die Skills, die durch die Stat-Änderungen
+    ({stat: (alt, neu)}) freischaltbar geworden sind, und sendet nach dem
+    Commit skills_unlockable. Gibt die gefundenen Skill-IDs zurück.
+    """
+    stat_changes = {stat_name: change for stat_name, change in stat_changes.items() if change[1] > change[0]}
+    if not stat_changes:
+        return []
+    skill_ids = skill_requirement_index.get().newly_unlockable(user, stat_changes=stat_changes)
+    if skill_ids:
+        transaction.on_commit(lambda: skills_unlockable.send(sender=Skill, user=user, skill_ids=skill_ids))
+    return skill_ids
 
 def get_user_stats(user):
     """
@@ -82,23 +215,35 @@ def get_user_stats(user):
         stats = get_or_create_character_stats(user)
         return stats.get_all_stats()
 
-def get_available_skills(user):
+def get_available_skills(user, layer=None, category=None, skill_type=None):
     """
     Gibt alle verfügbaren Skills für einen User zurück.
+    Die Voraussetzungen werden gesammelt gegen einmal geladene User-Daten
+    geprüft, die Anzahl der Queries hängt nicht von der Skill-Anzahl ab.
     """
     skills = Skill.objects.filter(is_active=True)
-    available_skills = []
-    
-    for skill in skills:
-        can_unlock, message = skill.check_requirements(user)
-        available_skills.append({
-            'skill': skill,
-            'can_unlock': can_unlock,
-            'message': message,
-            'is_unlocked': UserSkill.objects.filter(user=user, skill=skill, is_active=True).exists()
-        })
-    
-    return available_skills
+    if layer:
+        skills = skills.filter(layer=layer)
+    if category:
+        skills = skills.filter(category=category)
+    if skill_type:
+        skills = skills.filter(skill_type=skill_type)
+    return evaluate_skills(user, skills)
+
+def get_skill_tree(user, layer=None):
+    """
+    Alle aktiven Skills in topologischer Reihenfolge mit Tiefe, direkten
+    Voraussetzungen und Freischalt-Status.
+    """
+    skills = Skill.objects.filter(is_active=True).order_by('tree_order', 'id')
+    if layer:
+        skills = skills.filter(layer=layer)
+    graph = skill_graph.get()
+    entries = evaluate_skills(user, skills)
+    for entry in entries:
+        entry['depth'] = entry['skill'].tree_depth
+        entry['prerequisites'] = list(graph.parents.get(entry['skill'].pk, ()))
+    return entries
 
 def get_user_skills(user):
     """
@@ -107,32 +252,104 @@ def get_user_skills(user):
     return UserSkill.objects.filter(user=user, is_active=True).select_related('skill')
 
 @transaction.atomic
+def _insert_user_skills(user, skill_ids):
+    """
+    Legt UserSkills per INSERT ... ON CONFLICT DO NOTHING an.
+    Gibt die IDs der Skills zurück, deren Zeile tatsächlich eingefügt wurde.
+    """
+    if not skill_ids:
+        return set()
+    table = connection.ops.quote_name(UserSkill._meta.db_table)
+    unlocked_at = UserSkill._meta.get_field('unlocked_at').get_db_prep_value(timezone.now(), connection)
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(skill_ids))
+    params = []
+    for skill_id in skill_ids:
+        params.extend([user.pk, skill_id, unlocked_at, True])
+    sql = (
+        f"INSERT INTO {table} (user_id, skill_id, unlocked_at, is_active) VALUES {values} "
+        f"ON CONFLICT (user_id, skill_id) DO NOTHING RETURNING skill_id"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+def unlock_skills(user, skill_ids):
+    """
+    Schaltet mehrere Skills für einen User frei.
+    Die Voraussetzungen werden gegen einen gesperrten Stand des Users geprüft,
+    eingefügt wird per ON CONFLICT DO NOTHING. Doppelte oder parallele
+    Anfragen schalten jeden Skill höchstens einmal frei; skills_unlocked wird
+    nur für tatsächlich eingefügte Zeilen gesendet.
+    Gibt pro angefragter ID ein Dict (skill_id, success, message) zurück.
+    """
+    skill_ids = list(dict.fromkeys(skill_ids))
+    with transaction.atomic():
+        skills = Skill.objects.filter(is_active=True).in_bulk(skill_ids)
+        graph = skill_graph.get()
+        requirements = {skill_id: SkillRequirement.from_skill(skill, graph) for skill_id, skill in skills.items()}
+        context = UserSkillContext.load(
+            user,
+            xp_types=[requirement.xp_type for requirement in requirements.values()],
+            with_stats=any(requirement.stats for requirement in requirements.values()),
+            for_update=True,
+        )
+
+        messages = {}
+        to_insert = []
+        # Voraussetzungen zuerst, damit ein Skill und seine Vorgänger in
+        # einer Anfrage freigeschaltet werden können
+        for skill_id in graph.sort(skill_ids):
+            if skill_id not in skills:
+                messages[skill_id] = (False, "Skill nicht gefunden")
+            elif skill_id in context.unlocked_ids:
+                messages[skill_id] = (False, "Skill bereits freigeschaltet")
+            else:
+                can_unlock, message = requirements[skill_id].check(context)
+                if can_unlock:
+                    to_insert.append(skill_id)
+                    context.unlocked_ids.add(skill_id)
+                else:
+                    messages[skill_id] = (False, message)
+
+        inserted = _insert_user_skills(user, to_insert)
+        for skill_id in to_insert:
+            if skill_id in inserted:
+                messages[skill_id] = (True, f"Skill '{skills[skill_id].name}' erfolgreich freigeschaltet!")
+            else:
+                # Parallel freigeschaltet (oder deaktivierter Eintrag vorhanden)
+                messages[skill_id] = (False, "Skill bereits freigeschaltet")
+
+        if inserted:
+            # Der Raw-INSERT löst kein post_save aus
+            update_user_skill_bits(user.pk, inserted, True)
+            skills_unlocked.send(sender=UserSkill, user=user, skill_ids=sorted(inserted))
+
+    return [
+        {'skill_id': skill_id, 'success': messages[skill_id][0], 'message': messages[skill_id][1]}
+        for skill_id in skill_ids
+    ]
+
 def unlock_skill(user, skill_id):
     """
     Versucht einen Skill für einen User freizuschalten.
     """
-    try:
-        skill = Skill.objects.get(id=skill_id, is_active=True)
-    except Skill.DoesNotExist:
-        return False, "Skill nicht gefunden"
-    
-    # Prüfe ob bereits freigeschaltet
-    if UserSkill.objects.filter(user=user, skill=skill, is_active=True).exists():
-        return False, "Skill bereits freigeschaltet"
-    
-    # Prüfe Voraussetzungen
-    can_unlock, message = skill.check_requirements(user)
-    if not can_unlock:
-        return False, message
-    
-    # Skill freischalten
-    UserSkill.objects.create(user=user, skill=skill)
-    return True, f"Skill '{skill.name}' erfolgreich freigeschaltet!"
+    result = unlock_skills(user, [skill_id])[0]
+    return result['success'], result['message']
 
-def get_skill_progress(user, skill):
+def get_skill_progress(user, skill, context=None):
     """
     Gibt den Fortschritt für einen Skill zurück.
+    context: optionaler UserSkillContext, sonst wird er für diesen Skill geladen.
     """
+    if context is None:
+        requirement = SkillRequirement.from_skill(skill)
+        context = UserSkillContext.load(
+            user,
+            xp_types=[requirement.xp_type],
+            with_stats=bool(requirement.stats),
+            with_unlocked=False,
+        )
+
     progress = {
         'skill': skill,
         'requirements_met': {},
@@ -140,18 +357,16 @@ def get_skill_progress(user, skill):
     }
     
     # Level-Progress
-    level_progress = min(100, (user.level / skill.required_level) * 100)
+    level_progress = min(100, (context.level / skill.required_level) * 100)
     progress['requirements_met']['level'] = {
-        'current': user.level,
+        'current': context.level,
         'required': skill.required_level,
         'progress': level_progress
     }
     
     # XP-Typ-Progress
     if skill.required_xp_type and skill.required_xp_amount > 0:
-        total_xp_in_type = user.xp_events.filter(
-            source__startswith=skill.required_xp_type.lower()
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_xp_in_type = context.xp_total(skill.required_xp_type)
         
         xp_progress = min(100, (total_xp_in_type / skill.required_xp_amount) * 100)
         progress['requirements_met']['xp'] = {
@@ -162,8 +377,10 @@ def get_skill_progress(user, skill):
     
     # Stat-Progress
     if skill.required_stats:
-        try:
-            stats = user.character_stats
+        stats = context.stats
+        if stats is None:
+            progress['requirements_met']['stats'] = {}
+        else:
             stat_progress = {}
             for stat_name, required_value in skill.required_stats.items():
                 current_value = stats.get_stat(stat_name)
@@ -174,8 +391,6 @@ def get_skill_progress(user, skill):
                     'progress': stat_progress_value
                 }
             progress['requirements_met']['stats'] = stat_progress
-        except CharacterStats.DoesNotExist:
-            progress['requirements_met']['stats'] = {}
     
     # Gesamtfortschritt berechnen
     total_progress = 0
@@ -192,4 +407,31 @@ def get_skill_progress(user, skill):
     if count > 0:
         progress['overall_progress'] = total_progress / count
     
-    return progress 
\ No newline at end of file
+    return progress
+
+def get_skills_progress(user, skills):
+    """
+    Fortschritt, Freischaltbarkeit und Status für mehrere Skills.
+    Alle Skills werden gegen einen einmal geladenen UserSkillContext
+    ausgewertet, die Anzahl der Queries hängt nicht von der Skill-Anzahl ab.
+    """
+    skills = list(skills)
+    graph = skill_graph.get()
+    requirements = [SkillRequirement.from_skill(skill, graph) for skill in skills]
+    context = UserSkillContext.load(
+        user,
+        xp_types=[requirement.xp_type for requirement in requirements],
+        with_stats=any(requirement.stats for requirement in requirements),
+    )
+
+    results = []
+    for skill, requirement in zip(skills, requirements):
+        progress = get_skill_progress(user, skill, context)
+        can_unlock, message = requirement.check(context)
+        progress.update({
+            'can_unlock': can_unlock,
+            'message': message,
+            'is_unlocked': skill.pk in context.unlocked_ids,
+        })
+        results.append(progress)
+    return results
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Wird nach dem Commit gesendet, wenn durch einen Stat-Gewinn neue Skills
+# freischaltbar geworden sind. Argumente: user, skill_ids
+skills_unlockable = Signal()
+
+# Wird innerhalb der Transaktion gesendet, sobald UserSkills tatsächlich
+# eingefügt wurden (nicht bei Konflikten). Argumente: user, skill_ids
+skills_unlocked = Signal()
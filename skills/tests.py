@@ -1,3 +1,541 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from xp.models import UserXpTotals, XpType
+from xp.services import add_xp_to_user
+from .bitset import SkillBitIndex, SkillBitset, load_user_skill_bits, rebuild_user_skill_bits
+from .catalogue import SkillCatalogueProvider, skill_catalogue
+from .eligibility import SkillRequirement, SkillRequirementIndex
+from .graph import rebuild_skill_graph, skill_graph
+from .models import CharacterStats, Skill, SkillClosure, SkillPrerequisite, UserSkill, UserSkillBits, STAT_FIELDS
+from .services import (
+    calculate_stat_gain, calculate_stat_gain_millis, get_available_skills, unlock_skill, unlock_skills, update_character_stats_from_xp, update_character_stats_from_xp_batch,
+)
+from .signals import skills_unlockable, skills_unlocked
+
+User = get_user_model()
+
+
+def make_skill(name, **kwargs):
+    defaults = {'description': name, 'layer': 'Real', 'skill_type': 'passive', 'buff_type': 'aura', 'buff_value': '+5'}
+    defaults.update(kwargs)
+    return Skill.objects.create(name=name, **defaults)
+
+
+class SkillEligibilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='skiller', level=5)
+        CharacterStats.objects.create(user=self.user, strength=12, hacking=3)
+        UserXpTotals.objects.create(user=self.user, xp_type='Physical', xp=150)
+        UserXpTotals.objects.create(user=self.user, xp_type='Cyber', xp=80)
+
+        self.open_skill = make_skill('Open')
+        self.level_skill = make_skill('Veteran', required_level=10)
+        self.physical_skill = make_skill('Athlete', required_xp_type='Physical', required_xp_amount=150)
+        self.cyber_skill = make_skill('Netrunner', required_xp_type='Cyber', required_xp_amount=100)
+        self.stat_skill = make_skill('Brute', required_stats={'strength': 10, 'hacking': 5})
+        UserSkill.objects.create(user=self.user, skill=self.open_skill)
+
+    def test_payload_matches_check_requirements(self):
+        results = {entry['skill'].name: entry for entry in get_available_skills(self.user)}
+        self.assertEqual(
+            {name: (entry['can_unlock'], entry['message']) for name, entry in results.items()},
+            {
+                'Open': (True, 'Alle Voraussetzungen erfüllt'),
+                'Veteran': (False, 'Level 10 erforderlich (aktuell: 5)'),
+                'Athlete': (True, 'Alle Voraussetzungen erfüllt'),
+                'Netrunner': (False, '100 Cyber XP erforderlich'),
+                'Brute': (False, 'hacking: 5 erforderlich (aktuell: 3)'),
+            },
+        )
+        self.assertEqual([name for name, entry in results.items() if entry['is_unlocked']], ['Open'])
+        for skill in Skill.objects.all():
+            self.assertEqual(skill.check_requirements(self.user), (results[skill.name]['can_unlock'], results[skill.name]['message']))
+
+    def test_missing_character_stats(self):
+        user = User.objects.create_user(username='nostats', level=5)
+        CharacterStats.objects.filter(user=user).delete()
+        user = User.objects.get(pk=user.pk)
+        results = {entry['skill'].name: entry['message'] for entry in get_available_skills(user)}
+        self.assertEqual(results['Brute'], 'Character Stats nicht gefunden')
+
+    def test_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        def count_queries():
+            self.user.refresh_from_db()
+            skill_graph.get()  # prozessweit gecacht, wird nur nach Änderungen neu gebaut
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse('skills:available-skills'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(response.data), len(queries)
+
+        few = count_queries()
+        for i in range(30):
+            make_skill(f'Extra {i}', required_xp_type='Mental', required_xp_amount=i, required_stats={'focus': i})
+        many = count_queries()
+        self.assertEqual((few[0], many[0]), (5, 35))
+        self.assertEqual(few[1], many[1])
+        self.assertLessEqual(many[1], 4)
+
+    def test_filters_are_applied(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        make_skill('Cyber Passive', layer='Cyber')
+        response = client.get(reverse('skills:available-skills'), {'layer': 'Cyber'})
+        self.assertEqual([entry['skill']['name'] for entry in response.data], ['Cyber Passive'])
+
+
+class SkillRequirementIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SkillRequirementIndex([
+            SkillRequirement(1, level=1, xp_type=None, xp_amount=0, stats=(('strength', 10),)),
+            SkillRequirement(2, level=1, xp_type=None, xp_amount=0, stats=(('strength', 20), ('focus', 5))),
+            SkillRequirement(3, level=1, xp_type=None, xp_amount=0, stats=(('strength', 10),)),
+            SkillRequirement(4, level=8, xp_type='Physical', xp_amount=500, stats=()),
+        ])
+
+    def test_candidates_are_thresholds_in_range(self):
+        self.assertEqual(self.index.candidates({'strength': (5, 9)}), set())
+        self.assertEqual(self.index.candidates({'strength': (9, 10)}), {1, 3})
+        self.assertEqual(self.index.candidates({'strength': (10, 25)}), {2})
+        self.assertEqual(self.index.candidates({'strength': (1, 100), 'focus': (4, 5)}), {1, 2, 3})
+        self.assertEqual(self.index.candidates({'strength': (12, 8)}), set())
+        self.assertEqual(self.index.candidates(level_change=(7, 8)), {4})
+        self.assertEqual(self.index.candidates(xp_changes={'Physical': (100, 499)}), set())
+
+
+class SkillUnlockNotificationTests(TestCase):
+    def setUp(self):
+        XpType.objects.create(key='pushups', display_name='Push-Ups', xp_amount=5, unit='repetition', xp_type='Physical')
+        self.user = User.objects.create_user(username='notified')
+        # 100 Push-Ups = 500 XP → +20 Endurance
+        self.reachable = make_skill('Marathon', required_stats={'endurance': 15})
+        self.too_high = make_skill('Ironman', required_stats={'endurance': 50})
+        self.other_stat = make_skill('Brain', required_stats={'focus': 2})
+        self.received = []
+        skills_unlockable.connect(self._receiver)
+        self.addCleanup(skills_unlockable.disconnect, self._receiver)
+
+    def _receiver(self, sender, user, skill_ids, **kwargs):
+        self.received.append((user.pk, skill_ids))
+
+    def test_stat_gain_sends_newly_unlockable_skills(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            add_xp_to_user(self.user, 'pushups', 100)
+        self.assertEqual(self.received, [(self.user.pk, [self.reachable.pk])])
+
+        # Weitere Gewinne überschreiten keine neue Schwelle → keine Meldung
+        self.received.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            add_xp_to_user(self.user, 'pushups', 5)
+        self.assertEqual(self.received, [])
+
+    def test_index_is_rebuilt_when_skills_change(self):
+        self.reachable.required_stats = {'endurance': 30}
+        self.reachable.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            add_xp_to_user(self.user, 'pushups', 100)
+        self.assertEqual(self.received, [])
+
+
+class StatUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats')
+
+    def test_stat_gain_units(self):
+        # Ganze Punkte wie bisher, Tausendstel getrennt
+        self.assertEqual(calculate_stat_gain(100, 'Physical'), {'strength': 3, 'endurance': 4, 'agility': 3})
+        self.assertEqual(calculate_stat_gain(15, 'Physical')['strength'], 0)
+        self.assertEqual(calculate_stat_gain_millis(15, 'Physical')['strength'], 450)
+        self.assertEqual(calculate_stat_gain_millis(15, 'Unbekannt'), {})
+
+    def test_zero_gain_skips_all_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(update_character_stats_from_xp(self.user, 0, 'Physical'), {})
+            self.assertEqual(update_character_stats_from_xp(self.user, 100, 'Unknown'), {})
+        self.assertFalse(CharacterStats.objects.filter(user=self.user).exists())
+
+    def test_small_grants_carry_remainder(self):
+        single = User.objects.create_user(username='small_grants')
+        for _ in range(10):
+            # 5 XP * 0.1 * 0.3 = 0.15 Punkte Strength pro Grant
+            update_character_stats_from_xp(single, 5, 'Physical')
+        update_character_stats_from_xp_batch(self.user, [(50, 'Physical')])
+
+        small = CharacterStats.objects.get(user=single)
+        aggregated = CharacterStats.objects.get(user=self.user)
+        self.assertEqual((small.strength, small.strength_remainder), (2, 500))
+        self.assertEqual((small.endurance, small.endurance_remainder), (3, 0))
+        for stat_name in STAT_FIELDS:
+            self.assertEqual(
+                (getattr(small, stat_name), getattr(small, f'{stat_name}_remainder')),
+                (getattr(aggregated, stat_name), getattr(aggregated, f'{stat_name}_remainder')),
+                stat_name,
+            )
+
+    def test_remainder_is_dropped_at_maximum(self):
+        CharacterStats.objects.create(user=self.user, strength=99, strength_remainder=900)
+        update_character_stats_from_xp(self.user, 100, 'Physical')
+        stats = CharacterStats.objects.get(user=self.user)
+        self.assertEqual((stats.strength, stats.strength_remainder), (100, 0))
+        update_character_stats_from_xp(self.user, -5, 'Physical')
+        stats.refresh_from_db()
+        self.assertEqual((stats.strength, stats.strength_remainder), (99, 850))
+
+    def test_single_upsert_creates_and_updates(self):
+        with self.assertNumQueries(1):
+            new_values = update_character_stats_from_xp(self.user, 100, 'Physical')
+        self.assertEqual(new_values, {'strength': 4, 'endurance': 5, 'agility': 4})
+
+        CharacterStats.objects.filter(user=self.user).update(focus=50, strength=98)
+        with self.assertNumQueries(1):
+            update_character_stats_from_xp(self.user, 100, 'Physical')
+        stats = CharacterStats.objects.get(user=self.user)
+        self.assertEqual((stats.strength, stats.endurance, stats.agility, stats.focus), (100, 9, 7, 50))
+
+    def test_cached_stats_are_refreshed(self):
+        CharacterStats.objects.create(user=self.user)
+        cached = self.user.character_stats
+        update_character_stats_from_xp(self.user, 100, 'Mental')
+        self.assertEqual((cached.intelligence, cached.focus, cached.memory), (5, 4, 4))
+
+
+class SkillCatalogueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='catalogue')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.fireball = make_skill(
+            'Fireball', skill_type='active', buff_type=None, buff_value=None,
+            range=10, damage=30, effect_type='burn', layer='Cyber', tier=2,
+        )
+        self.shield = make_skill('Shield Aura', buff_type='shield', trigger_condition='on_low_hp', tier=2)
+        self.aura = make_skill('Calm Aura', category='Utility')
+        make_skill('Retired', is_active=False)
+
+    def test_lists_and_filters_from_catalogue(self):
+        skill_catalogue.get()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('skills:skill-list'), {'tier': 2})
+        self.assertEqual([skill['name'] for skill in response.data], ['Fireball', 'Shield Aura'])
+
+        response = self.client.get(reverse('skills:active-skills'), {'effect_type': 'burn', 'layer': 'Cyber'})
+        self.assertEqual([skill['name'] for skill in response.data], ['Fireball'])
+        self.assertEqual(response.data[0]['damage'], 30)
+
+        response = self.client.get(reverse('skills:passive-skills'), {'trigger_condition': 'on_low_hp'})
+        self.assertEqual([skill['name'] for skill in response.data], ['Shield Aura'])
+        response = self.client.get(reverse('skills:passive-skills'), {'buff_type': 'heal'})
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(reverse('skills:skill-detail', args=[self.aura.pk]))
+        self.assertEqual(response.data['category'], 'Utility')
+        response = self.client.get(reverse('skills:skill-detail', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_requests(self):
+        response = self.client.get(reverse('skills:skill-list'))
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(reverse('skills:skill-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # Änderungen am Katalog erzeugen eine neue Version
+        self.aura.description = 'Beruhigt alle Verbündeten'
+        self.aura.save()
+        response = self.client.get(reverse('skills:skill-detail', args=[self.aura.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['description'], 'Beruhigt alle Verbündeten')
+
+    def test_changes_without_shared_cache_expire_after_ttl(self):
+        provider = SkillCatalogueProvider(ttl=0, shared=False)
+        catalogue = provider.get()
+        self.assertIs(provider.get(), catalogue)
+
+        # Änderung ohne Signal, wie aus einem Worker mit eigenem Cache
+        Skill.objects.filter(pk=self.aura.pk).update(category='Support')
+        changed = provider.get()
+        self.assertNotEqual(changed.version, catalogue.version)
+        self.assertEqual(changed.get(self.aura.pk)['category'], 'Support')
+
+    def test_shared_cache_trusts_the_version_key(self):
+        provider = SkillCatalogueProvider(ttl=0, shared=True)
+        catalogue = provider.get()
+        Skill.objects.filter(pk=self.aura.pk).update(category='Support')
+        # Kein Neuaufbau zum Vergleich, nur der Versions-Key wird gelesen
+        with self.assertNumQueries(0):
+            self.assertIs(provider.get(), catalogue)
+        provider.invalidate()
+        self.assertEqual(provider.get().get(self.aura.pk)['category'], 'Support')
+
+
+class SkillsProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='progress', level=5)
+        CharacterStats.objects.filter(user=self.user).delete()
+        CharacterStats.objects.create(user=self.user, strength=12, hacking=3)
+        UserXpTotals.objects.create(user=self.user, xp_type='Physical', xp=75)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.skills = [
+            make_skill('Open'),
+            make_skill('Veteran', required_level=10),
+            make_skill('Athlete', required_xp_type='Physical', required_xp_amount=150),
+            make_skill('Brute', required_stats={'strength': 10, 'hacking': 5}),
+        ]
+        make_skill('Retired', is_active=False)
+        UserSkill.objects.create(user=self.user, skill=self.skills[0])
+
+    def test_matches_single_skill_endpoint(self):
+        response = self.client.get(reverse('skills:skills-progress'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['skill']['name'] for entry in response.data], ['Open', 'Veteran', 'Athlete', 'Brute'])
+        for skill, entry in zip(self.skills, response.data):
+            single = self.client.get(reverse('skills:skill-progress', args=[skill.pk]))
+            self.assertEqual(entry, single.data)
+
+        athlete = response.data[2]
+        self.assertEqual(athlete['requirements_met']['xp'], {'current': 75, 'required': 150, 'progress': 50.0})
+        self.assertEqual(athlete['message'], '150 Physical XP erforderlich')
+        self.assertTrue(response.data[0]['is_unlocked'])
+
+    def test_query_count_independent_of_skill_count(self):
+        url = reverse('skills:skills-progress')
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url, {'ids': str(self.skills[0].pk)})
+        self.assertEqual(len(response.data), 1)
+        ids = ','.join(str(skill.pk) for skill in self.skills) + ',999999'
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {'ids': ids})
+        self.assertEqual(len(response.data), 4)
+        self.assertLessEqual(len(many), len(few) + 2)
+
+    def test_invalid_ids(self):
+        response = self.client.get(reverse('skills:skills-progress'), {'ids': '1,abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UnlockSkillsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='unlocker', level=5)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.open_skill = make_skill('Open')
+        self.second_skill = make_skill('Second')
+        self.level_skill = make_skill('Veteran', required_level=10)
+        self.received = []
+        skills_unlocked.connect(self._receive)
+        self.addCleanup(skills_unlocked.disconnect, self._receive)
+
+    def _receive(self, sender, user, skill_ids, **kwargs):
+        self.received.append(skill_ids)
+
+    def test_unlock_twice_inserts_once(self):
+        self.assertEqual(unlock_skill(self.user, self.open_skill.pk), (True, "Skill 'Open' erfolgreich freigeschaltet!"))
+        self.assertEqual(unlock_skill(self.user, self.open_skill.pk), (False, "Skill bereits freigeschaltet"))
+        self.assertEqual(UserSkill.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.received, [[self.open_skill.pk]])
+
+    def test_conflicting_row_is_not_reported(self):
+        # Eintrag, den die Vorabprüfung nicht sieht (z.B. deaktiviert oder parallel angelegt)
+        UserSkill.objects.create(user=self.user, skill=self.open_skill, is_active=False)
+        self.assertEqual(unlock_skill(self.user, self.open_skill.pk), (False, "Skill bereits freigeschaltet"))
+        self.assertEqual(self.received, [])
+
+    def test_unlock_many(self):
+        response = self.client.post(
+            reverse('skills:unlock-skill'),
+            {'skill_ids': [self.open_skill.pk, self.level_skill.pk, 999999, self.second_skill.pk, self.open_skill.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unlocked'], 2)
+        self.assertEqual(
+            [(result['skill_id'], result['success'], result['message']) for result in response.data['results']],
+            [
+                (self.open_skill.pk, True, "Skill 'Open' erfolgreich freigeschaltet!"),
+                (self.level_skill.pk, False, 'Level 10 erforderlich (aktuell: 5)'),
+                (999999, False, 'Skill nicht gefunden'),
+                (self.second_skill.pk, True, "Skill 'Second' erfolgreich freigeschaltet!"),
+            ],
+        )
+        self.assertEqual(self.received, [sorted([self.open_skill.pk, self.second_skill.pk])])
+
+        response = self.client.post(reverse('skills:unlock-skill'), {'skill_id': self.open_skill.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'Skill bereits freigeschaltet')
+        response = self.client.post(reverse('skills:unlock-skill'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SkillGraphTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='treewalker', level=5)
+        self.root = make_skill('Root')
+        self.branch = make_skill('Branch')
+        self.leaf = make_skill('Leaf')
+        self.other = make_skill('Other')
+        with self.captureOnCommitCallbacks(execute=True):
+            SkillPrerequisite.objects.create(skill=self.leaf, prerequisite=self.branch)
+            SkillPrerequisite.objects.create(skill=self.branch, prerequisite=self.root)
+
+    def test_closure_and_order(self):
+        self.assertEqual(
+            set(SkillClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')),
+            {
+                (self.root.pk, self.branch.pk, 1),
+                (self.branch.pk, self.leaf.pk, 1),
+                (self.root.pk, self.leaf.pk, 2),
+            },
+        )
+        skills = {skill.pk: skill for skill in Skill.objects.all()}
+        self.assertLess(skills[self.root.pk].tree_order, skills[self.branch.pk].tree_order)
+        self.assertLess(skills[self.branch.pk].tree_order, skills[self.leaf.pk].tree_order)
+        self.assertEqual(skills[self.leaf.pk].tree_depth, 2)
+        self.assertEqual(skill_graph.get().missing(self.leaf.pk, {self.root.pk}), {self.branch.pk})
+
+    def test_cycles_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            SkillPrerequisite.objects.create(skill=self.root, prerequisite=self.leaf)
+        with self.assertRaises(ValidationError):
+            SkillPrerequisite.objects.create(skill=self.other, prerequisite=self.other)
+        self.assertEqual(SkillPrerequisite.objects.count(), 2)
+
+    def test_new_edge_extends_closure_in_place(self):
+        before = set(SkillClosure.objects.values_list('pk', 'ancestor_id', 'descendant_id'))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            SkillPrerequisite.objects.create(skill=self.root, prerequisite=self.other)
+            # Zyklus über die eben ergänzte Closure, noch vor dem Commit
+            with self.assertRaises(ValidationError):
+                SkillPrerequisite.objects.create(skill=self.other, prerequisite=self.leaf)
+        self.assertTrue(callbacks)
+        rows = set(SkillClosure.objects.values_list('pk', 'ancestor_id', 'descendant_id'))
+        self.assertLessEqual(before, rows)
+        self.assertEqual(
+            {(a, d, depth) for a, d, depth in SkillClosure.objects.filter(ancestor=self.other).values_list(
+                'ancestor_id', 'descendant_id', 'depth')},
+            {(self.other.pk, self.root.pk, 1), (self.other.pk, self.branch.pk, 2), (self.other.pk, self.leaf.pk, 3)},
+        )
+        self.assertEqual(Skill.objects.get(pk=self.leaf.pk).tree_depth, 3)
+
+    def test_rebuild_rejects_cycles(self):
+        # bulk_create umgeht clean() und die Signale
+        SkillPrerequisite.objects.bulk_create([SkillPrerequisite(skill=self.root, prerequisite=self.leaf)])
+        with self.assertRaises(ValidationError):
+            rebuild_skill_graph()
+
+    def test_prerequisites_gate_unlocking(self):
+        results = {entry['skill'].name: entry['message'] for entry in get_available_skills(self.user)}
+        self.assertEqual(results['Leaf'], 'Vorausgesetzte Skills fehlen: Branch, Root')
+        self.assertEqual(unlock_skill(self.user, self.leaf.pk), (False, 'Vorausgesetzte Skills fehlen: Branch, Root'))
+
+        # Vorgänger und Skill in einer Anfrage, unabhängig von der Reihenfolge
+        results = unlock_skills(self.user, [self.leaf.pk, self.branch.pk, self.root.pk])
+        self.assertTrue(all(result['success'] for result in results))
+
+    def test_tree_endpoint(self):
+        UserSkill.objects.create(user=self.user, skill=self.root)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse('skills:skill-tree'))
+        nodes = {node['skill']['name']: node for node in response.data}
+        self.assertLess(
+            [node['skill']['name'] for node in response.data].index('Root'),
+            [node['skill']['name'] for node in response.data].index('Leaf'),
+        )
+        self.assertEqual((nodes['Leaf']['depth'], nodes['Leaf']['prerequisites']), (2, [self.branch.pk]))
+        self.assertTrue(nodes['Branch']['can_unlock'])
+        self.assertEqual(nodes['Leaf']['message'], 'Vorausgesetzte Skills fehlen: Branch')
+
+    def test_deleting_a_skill_rebuilds_closure(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.delete()
+        self.assertFalse(SkillClosure.objects.exists())
+        self.assertEqual(skill_graph.get().missing(self.leaf.pk, set()), frozenset())
+
+
+class SkillBitsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bits')
+        self.skills = [make_skill(f'Bit {i}') for i in range(3)]
+
+    def bits(self):
+        return load_user_skill_bits(self.user)
+
+    def test_set_algebra(self):
+        index = SkillBitIndex({1: 0, 5: 1, 7: 2, 130: 3})
+        a = SkillBitset.from_ids([1, 5, 130], index)
+        b = SkillBitset.from_ids([5, 7], index)
+        self.assertEqual(sorted(a | b), [1, 5, 7, 130])
+        self.assertEqual(sorted(a & b), [5])
+        self.assertEqual(sorted(a - b), [1, 130])
+        self.assertIn(130, a)
+        self.assertNotIn(129, a)
+        self.assertEqual(SkillBitset.from_bytes(a.to_bytes(), index), a)
+        self.assertEqual(len(a), 3)
+        self.assertTrue(SkillBitset.from_ids([5], index).issubset(b))
+        # Die Größe hängt von den Positionen ab, nicht von den Skill-IDs
+        self.assertEqual(len(a.to_bytes()), 1)
+
+    def test_bit_index_is_dense_and_never_reused(self):
+        indexes = [skill.bit_index for skill in self.skills]
+        self.assertEqual(indexes, list(range(indexes[0], indexes[0] + 3)))
+        self.skills[2].delete()
+        self.assertEqual(make_skill('Bit 3').bit_index, indexes[2] + 1)
+        self.skills[0].save()
+        self.skills[0].refresh_from_db()
+        self.assertEqual(self.skills[0].bit_index, indexes[0])
+
+    def test_kept_in_sync_with_user_skills(self):
+        first, second, third = self.skills
+        user_skill = UserSkill.objects.create(user=self.user, skill=first)
+        unlock_skill(self.user, second.pk)
+        self.assertEqual(sorted(self.bits()), sorted([first.pk, second.pk]))
+
+        user_skill.is_active = False
+        user_skill.save()
+        self.assertEqual(sorted(self.bits()), [second.pk])
+
+        UserSkill.objects.filter(user=self.user).delete()
+        self.assertEqual(sorted(self.bits()), [])
+
+    def test_changes_update_single_bit_without_reading_user_skills(self):
+        first, second, third = self.skills
+        UserSkill.objects.create(user=self.user, skill=first)
+        table = connection.ops.quote_name(UserSkill._meta.db_table)
+        with CaptureQueriesContext(connection) as queries:
+            UserSkill.objects.create(user=self.user, skill=second)
+            UserSkill.objects.filter(user=self.user, skill=first).get().delete()
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM {table}' in query['sql']]
+        # Nur das get() oben liest UserSkill, die Bit-Updates nicht
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(sorted(self.bits()), [second.pk])
+
+    def test_rebuild_and_fallback(self):
+        UserSkill.objects.create(user=self.user, skill=self.skills[0])
+        UserSkillBits.objects.all().delete()
+        # Ohne Zeile wird aus UserSkill gelesen
+        self.assertEqual(sorted(self.bits()), [self.skills[0].pk])
+
+        UserSkill.objects.filter(user=self.user).update(skill=self.skills[2])  # ohne Signals
+        self.assertEqual(rebuild_user_skill_bits(chunk_size=1), 1)
+        self.assertEqual(sorted(self.bits()), [self.skills[2].pk])
+        with self.assertNumQueries(1):
+            self.assertIn(self.skills[2].pk, load_user_skill_bits(self.user))
+
+    def test_deleting_user_removes_bits(self):
+        UserSkill.objects.create(user=self.user, skill=self.skills[0])
+        self.user.delete()
+        self.assertFalse(UserSkillBits.objects.exists())
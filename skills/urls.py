@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     StatsOverviewView, AvailableSkillsView, UserSkillsView,
-    SkillProgressView, UnlockSkillView, SkillListView,
+    SkillProgressView, SkillsProgressView, SkillTreeView, UnlockSkillView, SkillListView,
     ActiveSkillsView, PassiveSkillsView, SkillDetailView, SkillCreateView,
     UserActiveSkillsView, UserPassiveSkillsView
 )
@@ -15,8 +15,10 @@ urlpatterns = [
     # Skills - Allgemein
     path('', SkillListView.as_view(), name='skill-list'),
     path('available/', AvailableSkillsView.as_view(), name='available-skills'),
+    path('tree/', SkillTreeView.as_view(), name='skill-tree'),
     path('unlocked/', UserSkillsView.as_view(), name='user-skills'),
     path('unlock/', UnlockSkillView.as_view(), name='unlock-skill'),
+    path('progress/', SkillsProgressView.as_view(), name='skills-progress'),
     path('<int:skill_id>/progress/', SkillProgressView.as_view(), name='skill-progress'),
     path('<int:pk>/', SkillDetailView.as_view(), name='skill-detail'),
     path('create/', SkillCreateView.as_view(), name='skill-create'),
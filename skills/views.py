@@ -1,17 +1,21 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from .models import Skill, UserSkill
+from .catalogue import skill_catalogue
+from .models import Skill
 from .serializers import (
     SkillSerializer, UserSkillSerializer, SkillProgressSerializer,
     AvailableSkillSerializer, UnlockSkillSerializer, StatsOverviewSerializer,
-    ActiveSkillSerializer, PassiveSkillSerializer, SkillCreateSerializer
+    ActiveSkillSerializer, PassiveSkillSerializer, SkillCreateSerializer, SkillTreeNodeSerializer
 )
 from .services import (
-    get_user_stats, get_available_skills, get_user_skills,
-    unlock_skill, get_skill_progress
+    get_user_stats, get_available_skills, get_user_skills, get_skill_tree,
+    unlock_skill, unlock_skills, get_skills_progress
 )
 
 class StatsOverviewView(generics.GenericAPIView):
@@ -34,26 +38,29 @@ class AvailableSkillsView(generics.GenericAPIView):
     serializer_class = AvailableSkillSerializer
 
     def get(self, request, *args, **kwargs):
-        available_skills = get_available_skills(request.user)
-        
-        # Filter nach Layer falls angegeben
-        layer = request.query_params.get('layer')
-        if layer:
-            available_skills = [skill for skill in available_skills if skill['skill'].layer == layer]
-        
-        # Filter nach Kategorie falls angegeben
-        category = request.query_params.get('category')
-        if category:
-            available_skills = [skill for skill in available_skills if skill['skill'].category == category]
-        
-        # Filter nach Skill-Typ falls angegeben
-        skill_type = request.query_params.get('skill_type')
-        if skill_type:
-            available_skills = [skill for skill in available_skills if skill['skill'].skill_type == skill_type]
+        # Filter nach Layer, Kategorie und Skill-Typ falls angegeben
+        available_skills = get_available_skills(
+            request.user,
+            layer=request.query_params.get('layer'),
+            category=request.query_params.get('category'),
+            skill_type=request.query_params.get('skill_type'),
+        )
         
         serializer = self.get_serializer(available_skills, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class SkillTreeView(generics.GenericAPIView):
+    """
+    GET /api/v1/skills/tree/?layer=Real → Skill-Baum in topologischer Reihenfolge
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = SkillTreeNodeSerializer
+
+    def get(self, request, *args, **kwargs):
+        tree = get_skill_tree(request.user, layer=request.query_params.get('layer'))
+        serializer = self.get_serializer(tree, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 class UserSkillsView(generics.ListAPIView):
     """
     GET /api/v1/skills/unlocked/ → Alle freigeschalteten Skills des Users
@@ -73,24 +80,41 @@ class SkillProgressView(generics.GenericAPIView):
 
     def get(self, request, skill_id, *args, **kwargs):
         skill = get_object_or_404(Skill, id=skill_id, is_active=True)
-        progress = get_skill_progress(request.user, skill)
-        
-        # Prüfe ob Skill freigeschaltet werden kann
-        can_unlock, message = skill.check_requirements(request.user)
-        is_unlocked = UserSkill.objects.filter(user=request.user, skill=skill, is_active=True).exists()
-        
-        progress.update({
-            'can_unlock': can_unlock,
-            'message': message,
-            'is_unlocked': is_unlocked
-        })
+        progress = get_skills_progress(request.user, [skill])[0]
         
         serializer = self.get_serializer(progress)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class SkillsProgressView(generics.GenericAPIView):
+    """
+    GET /api/v1/skills/progress/?ids=1,2,3 → Fortschritt für mehrere Skills
+    Ohne ids werden alle aktiven Skills zurückgegeben. Unbekannte oder
+    inaktive IDs werden ausgelassen.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = SkillProgressSerializer
+
+    def get(self, request, *args, **kwargs):
+        skills = Skill.objects.filter(is_active=True).order_by('id')
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                skill_ids = {int(value) for value in ids.split(',') if value.strip()}
+            except ValueError:
+                return Response(
+                    {'error': 'ids muss eine kommagetrennte Liste von Skill-IDs sein'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            skills = skills.filter(id__in=skill_ids)
+
+        progress = get_skills_progress(request.user, skills)
+        serializer = self.get_serializer(progress, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 class UnlockSkillView(generics.GenericAPIView):
     """
     POST /api/v1/skills/unlock/ → Skill freischalten
+    Body: {"skill_id": 1} oder {"skill_ids": [1, 2, 3]}
     """
     permission_classes = [IsAuthenticated]
     serializer_class = UnlockSkillSerializer
@@ -99,6 +123,16 @@ class UnlockSkillView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
+        skill_ids = serializer.validated_data.get('skill_ids')
+        if skill_ids:
+            results = unlock_skills(request.user, skill_ids)
+            unlocked = sum(1 for result in results if result['success'])
+            return Response({
+                'success': unlocked > 0,
+                'unlocked': unlocked,
+                'results': results
+            }, status=status.HTTP_200_OK if unlocked else status.HTTP_400_BAD_REQUEST)
+
         skill_id = serializer.validated_data['skill_id']
         success, message = unlock_skill(request.user, skill_id)
         
@@ -113,101 +147,67 @@ class UnlockSkillView(generics.GenericAPIView):
                 'message': message
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class SkillListView(generics.ListAPIView):
+class SkillCatalogueMixin:
+    """
+    Beantwortet GET-Requests aus dem gecachten SkillCatalogue.
+    Setzt ETag/Last-Modified und antwortet bei unveränderter Version mit 304.
+    """
+    catalogue_representation = 'full'
+    catalogue_filters = ()
+
+    def catalogue_response(self, request, build):
+        catalogue = skill_catalogue.get()
+        etag = quote_etag(catalogue.version)
+        last_modified = int(catalogue.last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(build(catalogue), status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Filter aus den Query-Parametern, ausgewertet über die Katalog-Indizes
+        criteria = {field: request.query_params.get(field) for field in self.catalogue_filters}
+        return self.catalogue_response(
+            request,
+            lambda catalogue: catalogue.filter(self.catalogue_representation, **criteria),
+        )
+
+class SkillListView(SkillCatalogueMixin, generics.ListAPIView):
     """
     GET /api/v1/skills/ → Liste aller Skills (Admin/Übersicht)
+    Filter: layer, category, tier, skill_type
     """
     permission_classes = [IsAuthenticated]
     serializer_class = SkillSerializer
     queryset = Skill.objects.filter(is_active=True)
+    catalogue_filters = ('layer', 'category', 'tier', 'skill_type')
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter nach Layer
-        layer = self.request.query_params.get('layer')
-        if layer:
-            queryset = queryset.filter(layer=layer)
-        
-        # Filter nach Kategorie
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Filter nach Tier
-        tier = self.request.query_params.get('tier')
-        if tier:
-            queryset = queryset.filter(tier=tier)
-        
-        # Filter nach Skill-Typ
-        skill_type = self.request.query_params.get('skill_type')
-        if skill_type:
-            queryset = queryset.filter(skill_type=skill_type)
-        
-        return queryset
-
-class ActiveSkillsView(generics.ListAPIView):
+class ActiveSkillsView(SkillCatalogueMixin, generics.ListAPIView):
     """
     GET /api/v1/skills/active/ → Liste aller aktiven Skills
+    Filter: layer, category, effect_type
     """
     permission_classes = [IsAuthenticated]
     serializer_class = ActiveSkillSerializer
     queryset = Skill.objects.filter(is_active=True, skill_type='active')
+    catalogue_representation = 'active'
+    catalogue_filters = ('layer', 'category', 'effect_type')
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter nach Layer
-        layer = self.request.query_params.get('layer')
-        if layer:
-            queryset = queryset.filter(layer=layer)
-        
-        # Filter nach Kategorie
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Filter nach Effekt-Typ
-        effect_type = self.request.query_params.get('effect_type')
-        if effect_type:
-            queryset = queryset.filter(effect_type=effect_type)
-        
-        return queryset
-
-class PassiveSkillsView(generics.ListAPIView):
+class PassiveSkillsView(SkillCatalogueMixin, generics.ListAPIView):
     """
     GET /api/v1/skills/passive/ → Liste aller passiven Skills
+    Filter: layer, category, buff_type, trigger_condition
     """
     permission_classes = [IsAuthenticated]
     serializer_class = PassiveSkillSerializer
     queryset = Skill.objects.filter(is_active=True, skill_type='passive')
+    catalogue_representation = 'passive'
+    catalogue_filters = ('layer', 'category', 'buff_type', 'trigger_condition')
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter nach Layer
-        layer = self.request.query_params.get('layer')
-        if layer:
-            queryset = queryset.filter(layer=layer)
-        
-        # Filter nach Kategorie
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Filter nach Buff-Typ
-        buff_type = self.request.query_params.get('buff_type')
-        if buff_type:
-            queryset = queryset.filter(buff_type=buff_type)
-        
-        # Filter nach Trigger-Bedingung
-        trigger_condition = self.request.query_params.get('trigger_condition')
-        if trigger_condition:
-            queryset = queryset.filter(trigger_condition=trigger_condition)
-        
-        return queryset
-
-class SkillDetailView(generics.RetrieveAPIView):
+class SkillDetailView(SkillCatalogueMixin, generics.RetrieveAPIView):
     """
     GET /api/v1/skills/{skill_id}/ → Detailansicht eines Skills
     """
@@ -215,6 +215,14 @@ class SkillDetailView(generics.RetrieveAPIView):
     serializer_class = SkillSerializer
     queryset = Skill.objects.filter(is_active=True)
 
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        def build(catalogue):
+            data = catalogue.get(int(pk))
+            if data is None:
+                raise Http404
+            return data
+        return self.catalogue_response(request, build)
+
 class SkillCreateView(generics.CreateAPIView):
     """
     POST /api/v1/skills/create/ → Neuen Skill erstellen (Admin)
@@ -137,6 +137,42 @@ DATABASES = {
     )
 }
 
+# ─── Caching ─────────────────────────────────────────────────────────────────
+# Versions-Keys der prozessweiten Provider (Skill-Katalog, Skill-Graph,
+# Voraussetzungs-Index, aktive Missionen, aktive Season) und die
+# Mission-Statistiken müssen für alle Worker sichtbar sein: mit REDIS_URL
+# daher Redis. Ohne Redis ist der Cache prozesslokal, die Provider laden dann
+# spätestens nach PROVIDER_CACHE_TTL Sekunden neu.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Sekunden, nach denen ein Prozess Katalog, Graph und Indizes spätestens neu lädt
+PROVIDER_CACHE_TTL = int(os.getenv("PROVIDER_CACHE_TTL", "60"))
+
+# Sekunden, die ein Prozess die aktive Season lokal cached (siehe seasons.providers)
+ACTIVE_SEASON_CACHE_TTL = int(os.getenv("ACTIVE_SEASON_CACHE_TTL", "60"))
+
+# Sekunden, die Mission-Statistiken pro User gecacht werden; Abschlüsse und neue
+# Fortschritte verwerfen den Eintrag vorher (siehe missions.services)
+MISSION_STATISTICS_CACHE_TTL = int(os.getenv("MISSION_STATISTICS_CACHE_TTL", "300"))
+
+# Redis für Season-Leaderboards (Sorted Sets); ohne URL wird direkt aus SeasonXp gelesen
+LEADERBOARD_REDIS_URL = os.getenv("REDIS_URL")
+
+# Sekunden, nach denen ein Leaderboard-Set verfällt und aus SeasonXp neu aufgebaut wird
+LEADERBOARD_TTL = int(os.getenv("LEADERBOARD_TTL", "3600"))
+
 # ─── Custom user model ───────────────────────────────────────────────────────
 AUTH_USER_MODEL = "users.User"
 
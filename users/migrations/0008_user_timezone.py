@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timezone',
+            field=models.CharField(db_index=True, default='UTC', help_text='IANA-Zeitzone des Users (z.B. Europe/Berlin), bestimmt den lokalen Missions-Reset', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='mission_period_floor',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Kleinste zulässige Daily-/Weekly-Periode nach einem Zeitzonen-Wechsel'),
+        ),
+    ]
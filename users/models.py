@@ -112,6 +112,21 @@ class User(AbstractUser):
         help_text='Optional: Hochgeladenes Avatar-Bild (PNG/JPG)'
     )
 
+    # Zeitzone für den Reset von Daily-/Weekly-Missionen
+    timezone = models.CharField(
+        max_length=64,
+        default='UTC',
+        db_index=True,
+        help_text='IANA-Zeitzone des Users (z.B. Europe/Berlin), bestimmt den lokalen Missions-Reset',
+    )
+    # Beim Zeitzonen-Wechsel laufende Perioden, siehe missions.periods
+    mission_period_floor = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Kleinste zulässige Daily-/Weekly-Periode nach einem Zeitzonen-Wechsel',
+    )
+
     # No additional required fields; superuser will use username
     REQUIRED_FIELDS = []
     USERNAME_FIELD = 'username'
@@ -1,4 +1,7 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import serializers
+from missions.periods import change_user_timezone
 from .models import User
 from rest_framework_simplejwt.tokens import RefreshToken
 from dj_rest_auth.registration.serializers import SocialLoginSerializer
@@ -44,6 +47,18 @@ class UserSerializer(serializers.ModelSerializer):
             missing.append("avatar_url")
         return missing
 
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Unbekannte Zeitzone.")
+        return value
+
+    def update(self, instance, validated_data):
+        if "timezone" in validated_data:
+            change_user_timezone(instance, validated_data.pop("timezone"))
+        return super().update(instance, validated_data)
+
     class Meta:
         model = User
         fields = [
@@ -60,6 +75,7 @@ class UserSerializer(serializers.ModelSerializer):
             "faction_id",
             "origin",
             "origin_id",
+            "timezone",
             "missing_onboarding_fields",
             "is_staff",
             "date_joined",
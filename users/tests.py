@@ -42,6 +42,14 @@ class UserSerializerTests(TestCase):
         self.assertIn('is_staff', serializer.data)
         self.assertFalse(serializer.data['is_staff'])
 
+    def test_timezone_validation(self):
+        user = User.objects.create_user(username='tzuser')
+        serializer = UserSerializer(user, data={'timezone': 'Europe/Berlin'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer = UserSerializer(user, data={'timezone': 'Mars/Olympus'}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('timezone', serializer.errors)
+
 class AvatarS3EndpointsTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='avataruser', password='testpass')
@@ -0,0 +1,73 @@
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+
+
+class LevelCurve:
+    """
+    Level-Kurve xp_for_level(n) = int(base * n ** exponent).
+    Die Level-Schwellen werden einmal vorberechnet und bei Bedarf erweitert,
+    level_from_xp ist damit eine Binärsuche statt einer Schleife über alle Level.
+    """
+
+    def __init__(self, base=100, exponent=1.5, initial_levels=1000):
+        self.base = base
+        self.exponent = exponent
+        self._lock = threading.Lock()
+        # _thresholds[i] == xp_for_level(i + 1)
+        self._thresholds = self._build([], initial_levels)
+
+    def _formula(self, n: int) -> int:
+        return int(self.base * n ** self.exponent)
+
+    def _build(self, thresholds: list, levels: int) -> list:
+        """Gibt eine neue, um die fehlenden Level erweiterte Schwellen-Liste zurück"""
+        extended = list(thresholds)
+        for n in range(len(extended) + 1, levels + 1):
+            value = self._formula(n)
+            if extended and value <= extended[-1]:
+                raise ValueError(f"Level-Kurve ist bei Level {n} nicht streng monoton")
+            extended.append(value)
+        return extended
+
+    def _ensure_covers(self, total_xp: int) -> list:
+        """Erweitert die Tabelle, bis die letzte Schwelle über total_xp liegt"""
+        with self._lock:
+            thresholds = self._thresholds
+            if thresholds[-1] > total_xp:
+                return thresholds
+            # Schätzung über die Umkehrfunktion, mindestens Verdopplung
+            estimate = int((total_xp / self.base) ** (1 / self.exponent)) + 2
+            levels = max(2 * len(thresholds), estimate)
+            while True:
+                thresholds = self._build(thresholds, levels)
+                if thresholds[-1] > total_xp:
+                    break
+                levels *= 2
+            # Atomarer Austausch, lesende Threads sehen immer eine vollständige Liste
+            self._thresholds = thresholds
+            return thresholds
+
+    @property
+    def max_cached_level(self) -> int:
+        return len(self._thresholds)
+
+    def xp_for_level(self, n: int) -> int:
+        """Gesamt-XP, die für Level n benötigt werden"""
+        thresholds = self._thresholds
+        if 1 <= n <= len(thresholds):
+            return thresholds[n - 1]
+        return self._formula(n)
+
+    def level_from_xp(self, total_xp: int) -> int:
+        """Höchstes Level, dessen Schwelle total_xp erreicht (mindestens 1)"""
+        thresholds = self._thresholds
+        if total_xp >= thresholds[-1]:
+            thresholds = self._ensure_covers(total_xp)
+        return max(1, bisect_right(thresholds, total_xp))
+
+
+@lru_cache(maxsize=None)
+def get_level_curve(base=100, exponent=1.5) -> LevelCurve:
+    """Gibt eine gecachte LevelCurve pro Parametersatz zurück"""
+    return LevelCurve(base=base, exponent=exponent)
@@ -0,0 +1,45 @@
+import random
+import timeit
+from django.core.management.base import BaseCommand
+
+from xp.levels import LevelCurve
+
+
+def legacy_xp_for_level(n: int) -> int:
+    return int(100 * n ** 1.5)
+
+
+def legacy_level_from_xp(total_xp: int) -> int:
+    """Ursprüngliche Schleifen-Implementierung aus xp.services"""
+    lvl = 1
+    while legacy_xp_for_level(lvl + 1) <= total_xp:
+        lvl += 1
+    return lvl
+
+
+class Command(BaseCommand):
+    help = "Vergleicht die Level-Berechnung der LevelCurve mit der alten Schleife."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200, help='Anzahl zufälliger XP-Werte')
+        parser.add_argument('--max-xp', type=int, default=10**9, help='Maximaler XP-Wert der Stichprobe')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        totals = [rng.randint(0, options['max_xp']) for _ in range(options['samples'])]
+        curve = LevelCurve()
+
+        mismatches = [t for t in totals if curve.level_from_xp(t) != legacy_level_from_xp(t)]
+        if mismatches:
+            self.stderr.write(self.style.ERROR(f"❌ Abweichungen bei {len(mismatches)} Werten, z. B. {mismatches[:5]}"))
+            return
+
+        loop_time = timeit.timeit(lambda: [legacy_level_from_xp(t) for t in totals], number=1)
+        curve_time = timeit.timeit(lambda: [curve.level_from_xp(t) for t in totals], number=1)
+
+        self.stdout.write(f"Samples: {len(totals)} (0 – {options['max_xp']} XP)")
+        self.stdout.write(f"Schleife:   {loop_time * 1000:.2f} ms ({loop_time / len(totals) * 1e6:.1f} µs/Aufruf)")
+        self.stdout.write(f"LevelCurve: {curve_time * 1000:.2f} ms ({curve_time / len(totals) * 1e6:.1f} µs/Aufruf)")
+        if curve_time > 0:
+            self.stdout.write(self.style.SUCCESS(f"✅ Faktor {loop_time / curve_time:.0f}x schneller"))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from xp.services import XP_TOTALS_REBUILD_CHUNK_SIZE, rebuild_xp_totals
+
+
+class Command(BaseCommand):
+    help = "Baut die XP-Summen pro User und XP-Typ (UserXpTotals) aus allen XpEvents neu auf."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=XP_TOTALS_REBUILD_CHUNK_SIZE, help='User pro Transaktion')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users, written = rebuild_xp_totals(
+            chunk_size=options['chunk_size'],
+            progress=lambda users, written: self.stdout.write(f"{users} User verarbeitet, {written} Summen geschrieben"),
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ {written} Summen für {users} User neu aufgebaut ({elapsed:.2f}s)"))
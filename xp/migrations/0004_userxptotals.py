@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 06:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xp', '0003_xptype_xp_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserXpTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('xp_type', models.CharField(choices=[('Physical', 'Physical'), ('Mental', 'Mental'), ('Cyber', 'Cyber'), ('Ultra', 'Ultra')], max_length=20)),
+                ('xp', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User XP Totals',
+                'verbose_name_plural': 'User XP Totals',
+                'unique_together': {('user', 'xp_type')},
+            },
+        ),
+    ]
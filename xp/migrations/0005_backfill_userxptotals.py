@@ -0,0 +1,47 @@
+from django.db import migrations, transaction
+from django.db.models import Max, Min
+
+# User-IDs pro Transaktion (wie XP_TOTALS_REBUILD_CHUNK_SIZE)
+CHUNK_SIZE = 1000
+
+
+def backfill_xp_totals(apps, schema_editor):
+    """
+    Füllt UserXpTotals aus XpEvent, chunkweise per INSERT ... SELECT ... GROUP BY.
+    Vorhandene Zeilen der Chunk-User werden ersetzt; entspricht rebuild_xp_totals.
+    """
+    XpEvent = apps.get_model('xp', 'XpEvent')
+    XpType = apps.get_model('xp', 'XpType')
+    UserXpTotals = apps.get_model('xp', 'UserXpTotals')
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    bounds = XpEvent.objects.aggregate(low=Min('user_id'), high=Max('user_id'))
+    if bounds['low'] is None:
+        return
+    sql = (
+        f"INSERT INTO {quote(UserXpTotals._meta.db_table)} (user_id, xp_type, xp) "
+        f"SELECT e.user_id, t.xp_type, SUM(e.amount) "
+        f"FROM {quote(XpEvent._meta.db_table)} e "
+        f"JOIN {quote(XpType._meta.db_table)} t ON t.{quote('key')} = e.source "
+        f"WHERE e.user_id BETWEEN %s AND %s AND t.xp_type IS NOT NULL "
+        f"GROUP BY e.user_id, t.xp_type"
+    )
+    for low in range(bounds['low'], bounds['high'] + 1, CHUNK_SIZE):
+        high = low + CHUNK_SIZE - 1
+        with transaction.atomic(using=schema_editor.connection.alias):
+            UserXpTotals.objects.filter(user_id__gte=low, user_id__lte=high).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [low, high])
+
+
+class Migration(migrations.Migration):
+    # Jeder Chunk läuft in einer eigenen Transaktion
+    atomic = False
+
+    dependencies = [
+        ('xp', '0004_userxptotals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_xp_totals, migrations.RunPython.noop),
+    ]
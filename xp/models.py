@@ -73,3 +73,25 @@ class XpEvent(models.Model):
 
     def __str__(self):
         return f"{self.user}: {self.amount} XP via {self.source} at {self.timestamp}"
+
+class UserXpTotals(models.Model):
+    """
+    Laufende XP-Summe pro User und XP-Typ.
+    Wird bei jedem XP-Grant über XpType.xp_type fortgeschrieben und lässt
+    sich mit rebuild_xp_totals aus XpEvent neu aufbauen.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='xp_totals'
+    )
+    xp_type = models.CharField(max_length=20, choices=XP_TYPE_CHOICES)
+    xp = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'xp_type')
+        verbose_name = "User XP Totals"
+        verbose_name_plural = "User XP Totals"
+
+    def __str__(self):
+        return f"{self.user} [{self.xp_type}]: {self.xp} XP"
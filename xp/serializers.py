@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import XpType, XpEvent
+from .models import XpType, XpEvent, LAYER_TYPE_CHOICES
+
+MAX_XP_BATCH_SIZE = 500
 
 class XpTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,3 +17,18 @@ class AddXpSerializer(serializers.Serializer):
     key = serializers.CharField(help_text='XpType.key, z.B. "pushups"')
     amount_units = serializers.FloatField(help_text='Einheiten der Aktivität, z.B. 20 (Reps) oder 15 (Minuten)')
     metadata = serializers.JSONField(required=False, help_text='Optional rohe Nutzereingabe o.ä.')
+
+class AddXpBatchItemSerializer(AddXpSerializer):
+    layer_type = serializers.ChoiceField(
+        choices=LAYER_TYPE_CHOICES,
+        required=False,
+        help_text='Layer der Aktivität (Standard: Real-Life)'
+    )
+
+class AddXpBatchSerializer(serializers.Serializer):
+    items = AddXpBatchItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=MAX_XP_BATCH_SIZE,
+        help_text=f'Bis zu {MAX_XP_BATCH_SIZE} Aktivitäten pro Request'
+    )
@@ -1,17 +1,22 @@
-from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
-from .models import XpEvent, XpType
-from seasons.models import Season, SeasonXp
+from .models import UserXpTotals, XpEvent, XpType
+from .levels import get_level_curve
+from rankings.leaderboard import get_season_leaderboard
+from seasons.services import add_season_xp, get_current_season
+
+LEVEL_CURVE = get_level_curve()
+XP_TOTALS_REBUILD_CHUNK_SIZE = 1000
 
 def xp_for_level(n: int) -> int:
-    return int(100 * n ** 1.5)
+    return LEVEL_CURVE.xp_for_level(n)
 
 def level_from_xp(total_xp: int) -> int:
-    lvl = 1
-    while xp_for_level(lvl + 1) <= total_xp:
-        lvl += 1
-    return lvl
+    return LEVEL_CURVE.level_from_xp(total_xp)
 
 def get_xp_stats(user) -> dict:
     total = user.xp
@@ -28,6 +33,98 @@ def get_xp_stats(user) -> dict:
         'xp_to_next': xp_to_next,
     }
 
+def _apply_user_xp(user, amount: int, floor: int = 0) -> bool:
+    """
+    Addiert XP atomar per UPDATE ... SET xp = GREATEST(xp + amount, floor)
+    und zieht das Level nach. Aktualisiert user.xp/user.level im Speicher.
+    Gibt zurück, ob der User dabei aufgestiegen ist.
+    Muss innerhalb einer Transaktion laufen: das UPDATE sperrt die Zeile bis
+    zum Commit, die folgenden Statements sehen daher einen stabilen Stand.
+    """
+    User = get_user_model()
+    rows = User.objects.filter(pk=user.pk)
+    rows.update(xp=Greatest(F('xp') + amount, floor))
+    # level ist hier noch der Stand vor diesem Grant
+    new_xp, old_level = rows.values_list('xp', 'level').get()
+
+    new_level = level_from_xp(new_xp)
+    if new_level != old_level:
+        rows.filter(xp=new_xp).update(level=new_level)
+
+    user.xp = new_xp
+    user.level = new_level
+    return new_level > old_level
+
+def add_xp_totals(user, gains: dict) -> None:
+    """
+    Addiert XP pro XP-Typ atomar auf die UserXpTotals eines Users.
+    gains: {xp_type: amount}. Ein INSERT ... ON CONFLICT DO UPDATE für alle Typen.
+    """
+    gains = {xp_type: amount for xp_type, amount in gains.items() if xp_type}
+    if not gains:
+        return
+    table = connection.ops.quote_name(UserXpTotals._meta.db_table)
+    values = ", ".join(["(%s, %s, %s)"] * len(gains))
+    sql = (
+        f"INSERT INTO {table} (user_id, xp_type, xp) VALUES {values} "
+        f"ON CONFLICT (user_id, xp_type) DO UPDATE SET xp = {table}.xp + EXCLUDED.xp"
+    )
+    params = []
+    for xp_type, amount in sorted(gains.items()):
+        params.extend([user.pk, xp_type, amount])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+def get_xp_totals(user, xp_types=None) -> dict:
+    """XP-Summen des Users pro XP-Typ als {xp_type: xp}, fehlende Typen fehlen im Dict"""
+    rows = UserXpTotals.objects.filter(user=user)
+    if xp_types is not None:
+        rows = rows.filter(xp_type__in=list(xp_types))
+    return dict(rows.values_list('xp_type', 'xp'))
+
+def _rebuild_xp_totals_chunk(user_ids) -> int:
+    User = get_user_model()
+    # Sperrt die User-Zeilen wie ein laufender Grant (_apply_user_xp),
+    # parallele Grants für diese User warten bis zum Ende des Chunks
+    list(User.objects.select_for_update().filter(pk__in=user_ids).values_list('pk', flat=True))
+    totals = (
+        XpEvent.objects
+        .filter(user_id__in=user_ids)
+        .annotate(xp_type=Subquery(XpType.objects.filter(key=OuterRef('source')).values('xp_type')[:1]))
+        .filter(xp_type__isnull=False)
+        .values('user_id', 'xp_type')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    rows = [UserXpTotals(user_id=row['user_id'], xp_type=row['xp_type'], xp=row['total']) for row in totals]
+    UserXpTotals.objects.filter(user_id__in=user_ids).delete()
+    UserXpTotals.objects.bulk_create(rows)
+    return len(rows)
+
+def rebuild_xp_totals(chunk_size: int = XP_TOTALS_REBUILD_CHUNK_SIZE, progress=None) -> tuple:
+    """
+    Baut UserXpTotals aus XpEvent neu auf, jeweils chunk_size User pro Transaktion.
+    Events, deren source keinem XpType entspricht, werden nicht gezählt.
+    Gibt (verarbeitete User, geschriebene Zeilen) zurück.
+    """
+    User = get_user_model()
+    users = 0
+    written = 0
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            break
+        with transaction.atomic():
+            written += _rebuild_xp_totals_chunk(user_ids)
+        users += len(user_ids)
+        last_id = user_ids[-1]
+        if progress:
+            progress(users, written)
+    return users, written
+
 @transaction.atomic
 def add_xp_to_user(user, type_key: str, amount_units: float, layer_type: str = "Real-Life", metadata: dict = None) -> dict:
     xp_type = XpType.objects.get(key=type_key)
@@ -41,11 +138,8 @@ def add_xp_to_user(user, type_key: str, amount_units: float, layer_type: str = "
         metadata=metadata or {}
     )
 
-    user.xp = max(0, user.xp + real_xp)
-    new_level = level_from_xp(user.xp)
-    leveled_up = new_level > user.level
-    user.level = new_level
-    user.save(update_fields=['xp', 'level'])
+    leveled_up = _apply_user_xp(user, real_xp)
+    add_xp_totals(user, {xp_type.xp_type: real_xp})
 
     # Character Stats aktualisieren (Skills-System)
     try:
@@ -55,18 +149,11 @@ def add_xp_to_user(user, type_key: str, amount_units: float, layer_type: str = "
         # Skills-App nicht verfügbar, ignoriere
         pass
 
-    today = timezone.now().date()
-    season = Season.objects.filter(is_active=True, start__lte=today, end__gt=today).first()
+    season = get_current_season()
 
     if season:
-        sxp, _ = SeasonXp.objects.get_or_create(
-            season=season,
-            user=user,
-            layer_type=layer_type,
-            defaults={'xp': 0}
-        )
-        sxp.xp += real_xp
-        sxp.save(update_fields=['xp'])
+        add_season_xp(season, user, layer_type, real_xp)
+        get_season_leaderboard().record_xp_on_commit(season.pk, layer_type, user.pk, real_xp)
 
     stats = get_xp_stats(user)
     stats.update({
@@ -74,3 +161,91 @@ def add_xp_to_user(user, type_key: str, amount_units: float, layer_type: str = "
         'awarded_xp': real_xp,
     })
     return stats
+
+@transaction.atomic
+def add_xp_batch(user, items, layer_type: str = "Real-Life") -> dict:
+    """
+    Vergibt XP für mehrere Aktivitäten in einer Transaktion.
+    items: Liste von dicts mit 'key', 'amount_units' und optional
+    'layer_type' und 'metadata'.
+    Alle XpEvents werden mit einem bulk_create angelegt, User, CharacterStats
+    und SeasonXp erhalten jeweils ein aggregiertes Update.
+    """
+    keys = {item['key'] for item in items}
+    xp_types = XpType.objects.in_bulk(keys, field_name='key')
+    missing = keys - xp_types.keys()
+    if missing:
+        raise XpType.DoesNotExist(f"Unbekannte XpTypes: {', '.join(sorted(missing))}")
+
+    now = timezone.now()
+    events = []
+    awarded = []
+    stat_entries = []
+    type_gains = {}
+    season_gains = {}
+    season_floors = {}
+    running_total = 0
+    clamp_floor = 0
+    for item in items:
+        xp_type = xp_types[item['key']]
+        real_xp = int(item['amount_units'] * xp_type.xp_amount)
+        item_layer = item.get('layer_type') or layer_type
+
+        events.append(XpEvent(
+            user=user,
+            amount=real_xp,
+            source=xp_type.key,
+            layer_type=item_layer,
+            metadata=item.get('metadata') or {},
+            timestamp=now,
+        ))
+        awarded.append({'key': xp_type.key, 'layer_type': item_layer, 'awarded_xp': real_xp})
+        stat_entries.append((real_xp, xp_type.xp_type))
+        type_gains[xp_type.xp_type] = type_gains.get(xp_type.xp_type, 0) + real_xp
+        season_gains[item_layer] = season_gains.get(item_layer, 0) + real_xp
+        running_total += real_xp
+        # Der Einzelpfad begrenzt nach jedem Event auf 0. Mit den Präfixsummen S_k
+        # gilt dann xp_neu = max(xp + S_n, max_k(S_n - S_k)); das Maximum wird
+        # laufend mitgeführt, damit ein einziges UPDATE genügt.
+        clamp_floor = max(clamp_floor + real_xp, 0)
+        season_floors[item_layer] = max(season_floors.get(item_layer, 0) + real_xp, 0)
+
+    XpEvent.objects.bulk_create(events)
+
+    leveled_up = _apply_user_xp(user, running_total, floor=clamp_floor)
+    add_xp_totals(user, type_gains)
+
+    # Character Stats aktualisieren (Skills-System)
+    try:
+        from skills.services import update_character_stats_from_xp_batch
+        update_character_stats_from_xp_batch(user, stat_entries)
+    except ImportError:
+        # Skills-App nicht verfügbar, ignoriere
+        pass
+
+    season = get_current_season()
+
+    if season:
+        for item_layer, gained_xp in season_gains.items():
+            add_season_xp(season, user, item_layer, gained_xp, floor=season_floors[item_layer])
+            get_season_leaderboard().record_xp_on_commit(
+                season.pk, item_layer, user.pk, gained_xp, floor=season_floors[item_layer]
+            )
+
+    # bulk_create löst kein post_save aus → Missionen einmal aggregiert aktualisieren
+    gained_total = sum(entry['awarded_xp'] for entry in awarded if entry['awarded_xp'] > 0)
+    if gained_total:
+        try:
+            from missions.services import update_mission_progress_for_activity
+            update_mission_progress_for_activity(user, 'xp_gained', gained_total)
+        except ImportError:
+            # Missions-App nicht verfügbar, ignoriere
+            pass
+
+    stats = get_xp_stats(user)
+    stats.update({
+        'leveled_up': leveled_up,
+        'awarded_xp': sum(entry['awarded_xp'] for entry in awarded),
+        'items': awarded,
+    })
+    return stats